@@ -0,0 +1,155 @@
+"""
+Async read endpoints.
+
+DRF views are synchronous: under ASGI Django runs each one on a single
+shared thread, and under WSGI a view runs its queries one after another.
+``AsyncAPIView`` is a small async counterpart of ``APIView`` for GET-only
+JSON endpoints. It authenticates with the DRF authentication classes,
+answers 401s and other ``APIException``s the way DRF does, and renders
+with ``FastJSONRenderer``.
+
+The ORM is synchronous too. ``run_sync`` runs a blocking call on a pool of
+``ASYNC_QUERY_THREADS`` worker threads, so each call uses that thread's own
+database connection, and ``gather`` runs independent calls concurrently.
+The pool size bounds the extra connections a process opens. Connections
+are checked against ``CONN_MAX_AGE`` before and after each call, like
+request threads are at request start and finish.
+
+The views also work under WSGI (Django runs them in a per-request event
+loop), but only an ASGI server lets one process serve other requests
+while they wait, e.g. ``gunicorn -k uvicorn.workers.UvicornWorker
+commerce_project.asgi:application``.
+
+``paginate`` runs the page count and the page query concurrently for page
+numbers, with the same response shape as ``HybridPagination``; keyset
+pages (``?paginate=cursor``) go through ``HybridPagination`` itself.
+"""
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .pagination import HybridPagination
+from .renderers import FastJSONRenderer
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def query_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'ASYNC_QUERY_THREADS', 16), thread_name_prefix='async-query'
+                )
+    return _executor
+
+
+def _call_with_connection_hygiene(function, *args):
+    close_old_connections()
+    try:
+        return function(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_sync(function, *args):
+    """Run a blocking (ORM) call in a worker thread with its own connection"""
+    call = sync_to_async(_call_with_connection_hygiene, thread_sensitive=False, executor=query_executor())
+    return await call(function, *args)
+
+
+async def gather(*functions):
+    """Run independent zero-argument blocking calls concurrently; results in order"""
+    return await asyncio.gather(*(run_sync(function) for function in functions))
+
+
+class AsyncAPIView(View):
+    """GET-only JSON view that runs natively under ASGI"""
+    http_method_names = ['get', 'options']
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    renderer = FastJSONRenderer()
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.drf_request = Request(
+            request, authenticators=[authentication() for authentication in self.authentication_classes]
+        )
+        try:
+            user = await run_sync(lambda: self.drf_request.user)
+            if not user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+        except Http404:
+            return self.handle_exception(exceptions.NotFound())
+
+    def handle_exception(self, exc):
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        status = exc.status_code
+        header = None
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            authenticators = self.drf_request.authenticators
+            header = authenticators[0].authenticate_header(self.drf_request) if authenticators else None
+            # As in DRF: without a scheme to challenge with, the answer is 403
+            status = 401 if header else 403
+        response = self.render(data, status=status)
+        if header:
+            response['WWW-Authenticate'] = header
+        return response
+
+    def render(self, data, status=200):
+        return HttpResponse(self.renderer.render(data), status=status, content_type=self.renderer.media_type)
+
+    async def paginate(self, queryset, serialize):
+        """
+        Paginated body for ``queryset``; ``serialize`` turns the page's rows
+        into their JSON-ready representation
+        """
+        paginator = HybridPagination()
+        request = self.drf_request
+        if paginator.use_cursor(request) and paginator.supports_cursor(queryset):
+            rows = await run_sync(paginator.paginate_queryset, queryset, request)
+            return paginator.get_paginated_response(serialize(rows)).data
+
+        page_size = paginator.get_page_size(request)
+        try:
+            number = int(request.query_params.get(paginator.page_query_param, 1))
+            if number < 1:
+                raise ValueError
+        except ValueError:
+            raise exceptions.NotFound('Invalid page.')
+        offset = (number - 1) * page_size
+        count, rows = await gather(queryset.count, lambda: list(queryset[offset:offset + page_size]))
+        if number > 1 and offset >= count:
+            raise exceptions.NotFound('Invalid page.')
+
+        url = request.build_absolute_uri()
+        next_link = None
+        if offset + page_size < count:
+            next_link = replace_query_param(url, paginator.page_query_param, number + 1)
+        if number == 1:
+            previous_link = None
+        elif number == 2:
+            previous_link = remove_query_param(url, paginator.page_query_param)
+        else:
+            previous_link = replace_query_param(url, paginator.page_query_param, number - 1)
+        return OrderedDict([
+            ('count', count),
+            ('next', next_link),
+            ('previous', previous_link),
+            ('results', serialize(rows)),
+        ])
@@ -0,0 +1,265 @@
+"""
+Per-request performance metrics.
+
+``MetricsMiddleware`` measures every request: total time, SQL query count,
+time spent in the database and time spent rendering the response body
+(``phase('render')``, recorded by ``FastJSONRenderer``). What is left is
+reported as ``app`` (view code, serializers, middleware). The numbers go
+out two ways:
+
+* a ``Server-Timing`` header on the response, appended to any phases the
+  view reported itself (e.g. invoice create);
+* in-process histograms labelled by route (URL name), method and status
+  class, served in Prometheus text format at ``/metrics``.
+  ``METRICS_TENANT_LABELS = True`` adds the tenant (``organization_id``)
+  too; it is off by default because every tenant multiplies the series.
+
+SQL is observed through ``observe_queries``: every connection gets one
+dispatcher in its execute wrappers when it connects, and the dispatcher
+calls the wrappers registered in the current context. Context variables
+follow a request into ``sync_to_async`` worker threads, so queries fanned
+out by the async views (``commerce_project.async_api``) on their own
+connections are counted against the request that issued them. Both
+middleware classes here run natively under WSGI and ASGI.
+
+The per-request cost is a few ``perf_counter`` calls, one wrapper call per
+SQL query and one locked histogram update per request. Histograms live in
+the worker process, so with several workers each one must be scraped on
+its own (or run one metrics scrape target per worker).
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+# The tenant comes last and only with METRICS_TENANT_LABELS
+LABELS = ('route', 'method', 'status', 'tenant')
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+_sql_wrappers = contextvars.ContextVar('sql_wrappers', default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+    wrappers = _sql_wrappers.get()
+    for wrapper in reversed(wrappers):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def _install_dispatcher(connection, **kwargs):
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+
+connection_created.connect(_install_dispatcher)
+for _connection in connections.all(initialized_only=True):
+    _install_dispatcher(_connection)
+
+
+@contextmanager
+def observe_queries(wrapper):
+    """
+    Pass every query run in this context through ``wrapper`` (same signature
+    as a Django execute wrapper), on any connection and in any thread the
+    context is copied to
+    """
+    token = _sql_wrappers.set(_sql_wrappers.get() + (wrapper,))
+    try:
+        yield
+    finally:
+        _sql_wrappers.reset(token)
+
+
+class RequestMetrics:
+    """Accumulates one request's numbers; also the SQL execute wrapper"""
+    __slots__ = ('queries', 'db_time', 'phases', 'lock')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.phases = {}
+        # Async views run a request's queries in several threads at once
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.db_time += elapsed
+                self.queries += 1
+
+
+@contextmanager
+def phase(name):
+    """Time a block as part of the current request's metrics (no-op outside one)"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.phases[name] = metrics.phases.get(name, 0.0) + time.perf_counter() - started
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(snapshot):
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(LABELS, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return '\n'.join(lines)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Total time to produce the response.', DURATION_BUCKETS
+)
+DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Time spent executing SQL per request.', DURATION_BUCKETS
+)
+RENDER_DURATION = Histogram(
+    'http_request_render_duration_seconds', 'Time spent rendering the response body.', DURATION_BUCKETS
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL queries executed per request.', QUERY_BUCKETS
+)
+HISTOGRAMS = (REQUEST_DURATION, DB_DURATION, RENDER_DURATION, DB_QUERIES)
+
+
+def _labels(request, response):
+    match = getattr(request, 'resolver_match', None)
+    route = (match.view_name or match.route) if match else 'unmatched'
+    labels = (route, request.method, f'{response.status_code // 100}xx')
+    if not getattr(settings, 'METRICS_TENANT_LABELS', False):
+        # Series render without the tenant label at all (see Histogram.render)
+        return labels
+    tenant = ''
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        tenant = getattr(user, 'organization_id', '') or ''
+    return labels + (tenant,)
+
+
+def _server_timing(metrics, total):
+    # db is summed over queries, so concurrent ones can add up to more than total
+    render = metrics.phases.get('render', 0.0)
+    app = max(total - metrics.db_time - render, 0.0)
+    return (
+        f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries", '
+        f'render;dur={render * 1000:.2f}, app;dur={app * 1000:.2f}, total;dur={total * 1000:.2f}'
+    )
+
+
+class MetricsMiddleware:
+    """Records per-request timings; keep it first in ``MIDDLEWARE``"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with observe_queries(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._record(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with observe_queries(metrics):
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._record(request, response, metrics, time.perf_counter() - started)
+
+    def _record(self, request, response, metrics, total):
+        timing = _server_timing(metrics, total)
+        existing = response.get('Server-Timing')
+        response['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+        labels = _labels(request, response)
+        REQUEST_DURATION.observe(labels, total)
+        DB_DURATION.observe(labels, metrics.db_time)
+        RENDER_DURATION.observe(labels, metrics.phases.get('render', 0.0))
+        DB_QUERIES.observe(labels, metrics.queries)
+        return response
+
+
+def render_metrics():
+    return '\n'.join(histogram.render() for histogram in HISTOGRAMS) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; needs ``Authorization: Bearer $METRICS_TOKEN``"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token and not settings.DEBUG:
+        raise Http404
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,167 @@
+"""
+API pagination.
+
+Clients choose the page style per request:
+
+* ``?page=N`` (default) - DRF page numbers with an exact ``count``. Every
+  page costs a ``COUNT(*)`` plus an ``OFFSET`` scan.
+* ``?paginate=cursor`` or ``?cursor=...`` - keyset pagination on
+  ``(created_at, id)``. Each page is an index range scan that costs the same
+  however deep it is. ``count`` is left out unless asked for with
+  ``?count=exact`` or ``?count=approx``. On PostgreSQL ``approx`` reads the
+  planner's row estimate instead of counting.
+
+Keyset pages are always ordered newest first, so any other ordering on the
+queryset (such as search ranking) is replaced in cursor mode. Models without
+a ``created_at`` column always get page numbers.
+"""
+import base64
+import json
+import uuid
+from collections import OrderedDict
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """Planner row estimate on PostgreSQL, exact count elsewhere"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over ``(created_at, id)``, newest first"""
+    page_size = PageNumberPagination.page_size
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = self.get_count(queryset, request)
+
+        position = self.decode_cursor(request)
+        self.reverse = bool(position and position[2])
+        if position is None:
+            queryset = queryset.order_by('-created_at', '-id')
+        elif self.reverse:
+            created_at, pk = position[0], position[1]
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            ).order_by('created_at', 'id')
+        else:
+            created_at, pk = position[0], position[1]
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            ).order_by('-created_at', '-id')
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode in ('exact', 'true', '1'):
+            return queryset.count()
+        if mode == 'approx':
+            return estimate_count(queryset)
+        return None
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            created_at = parse_datetime(data['t'])
+            if created_at is None:
+                raise ValueError
+            return created_at, uuid.UUID(data['id']), bool(data.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, row, reverse):
+        data = {'t': row.created_at.isoformat(), 'id': str(row.pk)}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        body = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.count is not None:
+            body['count'] = self.count
+        body['results'] = data
+        return Response(body)
+
+
+class HybridPagination(PageNumberPagination):
+    """Page numbers by default; keyset pages when the client asks for them"""
+    mode_query_param = 'paginate'
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def supports_cursor(self, queryset):
+        field_names = {field.name for field in queryset.model._meta.get_fields()}
+        return 'created_at' in field_names
+
+    def paginate_queryset(self, queryset, request, view=None):
+        use_cursor = self.use_cursor(request) and self.supports_cursor(queryset)
+        self.keyset = KeysetPagination() if use_cursor else None
+        if self.keyset is not None:
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
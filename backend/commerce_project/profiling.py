@@ -0,0 +1,248 @@
+"""
+On-demand request profiling for staff and an always-on slow-query log.
+
+``ProfilingMiddleware`` does two things:
+
+* Every SQL statement slower than ``SLOW_QUERY_MS`` is logged on the
+  ``commerce_project.slow_sql`` logger (level WARNING) together with the
+  route, method, path and tenant of the request that issued it. Parameters
+  are left out so customer data does not end up in the logs. A negative
+  threshold turns the log off.
+* A staff user can profile one request by sending ``X-Profile: stacks`` (or
+  ``?profile=stacks``; ``1`` means the same). A sampler thread records the
+  request thread's call stack every ``PROFILE_SAMPLE_INTERVAL_MS`` and the
+  counts are written in collapsed-stack format (``a;b;c 12`` per line),
+  which ``flamegraph.pl``, speedscope and inferno read as is.
+  ``X-Profile: cprofile`` runs the request under ``cProfile`` instead and
+  writes a ``pstats`` dump (``snakeviz``, ``flameprof``). Reports are stored
+  in ``PROFILE_DIR`` and named in the ``X-Profile-Report`` response header;
+  add ``X-Profile-Output: inline`` (or ``?profile_output=inline``) to get the
+  report back as the response body instead of the view's response.
+
+The API authenticates inside DRF, after middleware has run, so the staff
+check authenticates the request itself with the configured DRF
+authentication classes, and only when a profile was asked for. Anyone else
+sending the flag gets the normal response, unprofiled.
+
+Profiling is WSGI-only. Both profilers follow the thread that called the
+middleware, which under WSGI also runs the view. Under ASGI that thread is
+the event loop, and sync views run on worker threads, so a profile would
+show the loop idling. There the request is served unprofiled and
+``X-Profile-Report`` says so. Run a WSGI server (``gunicorn
+commerce_project.wsgi``) to profile.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import nullcontext
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+
+from .metrics import observe_queries
+
+logger = logging.getLogger('commerce_project.slow_sql')
+profile_logger = logging.getLogger('commerce_project.profiling')
+
+MODES = {'1': 'stacks', 'true': 'stacks', 'stacks': 'stacks', 'cprofile': 'cprofile'}
+REPORT_HEADER = 'X-Profile-Report'
+ASGI_UNAVAILABLE = 'unavailable: profiling runs under WSGI only'
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name or match.route) if match else 'unmatched'
+
+
+def _tenant(request):
+    # DRF copies the authenticated user onto the underlying HttpRequest
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return getattr(user, 'organization_id', '') or ''
+    return ''
+
+
+class SlowQueryLog:
+    """SQL execute wrapper that logs statements above the threshold"""
+    __slots__ = ('request', 'threshold')
+
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.threshold:
+                request = self.request
+                logger.warning(
+                    'slow query %.1fms route=%s method=%s path=%s tenant=%s db=%s sql=%s',
+                    elapsed * 1000, _route(request), request.method, request.path,
+                    _tenant(request) or '-', context['connection'].alias, sql[:2000],
+                )
+
+
+class StackSampler:
+    """Counts the call stacks of one thread, sampled from a background thread"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._labels = {}
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.counts[self._stack(frame)] += 1
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in sorted(sys.path, key=len, reverse=True):
+                if prefix and filename.startswith(prefix + os.sep):
+                    filename = filename[len(prefix) + 1:]
+                    break
+            label = self._labels[code] = f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ':')
+        return label
+
+    def _stack(self, frame):
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return ';'.join(labels)
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.counts.most_common())
+
+
+def _staff_user(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user if user.is_staff else None
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(request)
+        except (APIException, AttributeError):
+            # Rejected credentials, or a class that needs the DRF request
+            continue
+        if result is not None:
+            return result[0] if result[0].is_staff else None
+    return None
+
+
+def _requested_mode(request):
+    value = request.headers.get('X-Profile') or request.GET.get('profile')
+    return MODES.get(value.lower()) if value else None
+
+
+def _wants_inline(request):
+    return (request.headers.get('X-Profile-Output') or request.GET.get('profile_output')) == 'inline'
+
+
+def _report_name(request, extension):
+    route = ''.join(char if char.isalnum() or char in '-_' else '-' for char in _route(request))
+    return f"{timezone.now():%Y%m%dT%H%M%S}-{route}-{uuid.uuid4().hex[:8]}.{extension}"
+
+
+def _slow_query_log(request):
+    threshold = getattr(settings, 'SLOW_QUERY_MS', 200)
+    if threshold < 0:
+        return nullcontext()
+    return observe_queries(SlowQueryLog(request, threshold / 1000))
+
+
+class ProfilingMiddleware:
+    """Slow-query log for every request; sampling/cProfile runs for staff on demand (WSGI only)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        mode = _requested_mode(request)
+        if mode is not None and _staff_user(request) is None:
+            mode = None
+
+        with _slow_query_log(request):
+            if mode is None:
+                return self.get_response(request)
+            return self._profile(request, mode)
+
+    async def __acall__(self, request):
+        # The profilers follow one thread, and an async request hops between
+        # the event loop and worker threads: profile through the WSGI server
+        with _slow_query_log(request):
+            response = await self.get_response(request)
+        if _requested_mode(request) is not None:
+            response[REPORT_HEADER] = ASGI_UNAVAILABLE
+        return response
+
+    def _profile(self, request, mode):
+        started = time.perf_counter()
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+            elapsed = time.perf_counter() - started
+            name = _report_name(request, 'prof')
+            profiler.dump_stats(self._path(name))
+            if _wants_inline(request):
+                stream = io.StringIO()
+                pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(60)
+                response = HttpResponse(stream.getvalue(), content_type='text/plain; charset=utf-8')
+        else:
+            interval = getattr(settings, 'PROFILE_SAMPLE_INTERVAL_MS', 5) / 1000
+            with StackSampler(threading.get_ident(), interval) as sampler:
+                response = self.get_response(request)
+            elapsed = time.perf_counter() - started
+            report = sampler.collapsed()
+            name = _report_name(request, 'collapsed')
+            with open(self._path(name), 'w', encoding='utf-8') as handle:
+                handle.write(report)
+            if _wants_inline(request):
+                response = HttpResponse(report, content_type='text/plain; charset=utf-8')
+
+        response[REPORT_HEADER] = name
+        profile_logger.info(
+            'profiled %s %s (%s) in %.1fms -> %s', request.method, request.path, mode, elapsed * 1000, name
+        )
+        return response
+
+    def _path(self, name):
+        directory = getattr(settings, 'PROFILE_DIR', None) or os.path.join(settings.BASE_DIR, 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, name)
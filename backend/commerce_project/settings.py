@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 load_dotenv()
 
@@ -32,15 +33,20 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    'commerce_project.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise subclass that does not serialize requests under ASGI
+    'commerce_project.staticfiles.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # After authentication: needs request.user for the staff check and tenant
+    'commerce_project.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'commerce_project.urls'
@@ -101,6 +107,9 @@ CORS_ALLOWED_ORIGINS = os.environ.get(
 if os.environ.get('CORS_ALLOW_ALL_ORIGINS', 'False') == 'True':
     CORS_ALLOW_ALL_ORIGINS = True
 
+# Browsers must be allowed to send the Idempotency-Key header cross-origin
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
 CSRF_TRUSTED_ORIGINS = os.environ.get(
     'CSRF_TRUSTED_ORIGINS',
     'https://bill-alpha-eight.vercel.app'
@@ -120,6 +129,8 @@ if not DEBUG:
     SECURE_HSTS_INCLUDE_SUBDOMAINS = True
     SECURE_HSTS_PRELOAD = True
     SECURE_SSL_REDIRECT = os.environ.get('SECURE_SSL_REDIRECT', 'True') == 'True'
+    # Prometheus scrapes the worker directly over plain HTTP
+    SECURE_REDIRECT_EXEMPT = [r'^metrics$']
     SESSION_COOKIE_SECURE = True
     CSRF_COOKIE_SECURE = True
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -128,9 +139,13 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'commerce_project.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'commerce_project.pagination.HybridPagination',
     'PAGE_SIZE': 10,
 }
 
@@ -138,4 +153,104 @@ from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_OBTAIN_SERIALIZER': 'users.authentication.ClaimsTokenObtainPairSerializer',
 }
+
+# Invoice numbers: how many numbers each worker process reserves per DB round-trip.
+# 1 keeps numbers strictly sequential; larger blocks trade ordering for throughput.
+INVOICE_NUMBER_BLOCK_SIZE = int(os.environ.get('INVOICE_NUMBER_BLOCK_SIZE', '1'))
+
+# Invoice stats: 'live' aggregates Order on every request, 'counters' reads the
+# per-organization InvoiceCounters row maintained by the invoice endpoints.
+INVOICE_STATS_SOURCE = os.environ.get('INVOICE_STATS_SOURCE', 'live')
+
+# Shared cache (core/versions.py): per-process caches of the catalog, prices,
+# tax tables and permissions learn about writes made by other processes only
+# through it. REDIS_URL points it at Redis; without one each process gets its
+# own in-memory cache, which core/checks.py warns about unless one process
+# serves everything (DEBUG, or CACHE_SINGLE_PROCESS=True).
+REDIS_URL = os.environ.get('REDIS_URL', '')
+CACHE_SINGLE_PROCESS = DEBUG or os.environ.get('CACHE_SINGLE_PROCESS', 'False') == 'True'
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# Per-process LRU of scanned barcode/SKU lookups (entries across all organizations).
+PRODUCT_LOOKUP_CACHE_SIZE = int(os.environ.get('PRODUCT_LOOKUP_CACHE_SIZE', '10000'))
+
+# Idempotency-Key handling for invoice create/payment (core/idempotency.py):
+# how long stored responses are replayed, how long a duplicate waits for the
+# request in flight, and after how long an unfinished claim is taken over.
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '10'))
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', '60'))
+
+# Per-process LRU of compiled RBAC permission sets, one entry per (user, branch),
+# each recompiled at the latest RBAC_CACHE_TTL seconds after it was built.
+RBAC_CACHE_SIZE = int(os.environ.get('RBAC_CACHE_SIZE', '10000'))
+RBAC_CACHE_TTL = int(os.environ.get('RBAC_CACHE_TTL', '300'))
+
+# Seconds a user's auth version, and the record used for tokens whose claims
+# are out of date, are cached for (see users/authentication.py).
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', '300'))
+
+# Per-request metrics (commerce_project/metrics.py): Server-Timing headers and
+# Prometheus histograms at /metrics. The endpoint needs METRICS_TOKEN as a bearer
+# token (it is only open without one when DEBUG is on). Tenant labels give every
+# tenant its own series; only turn them on for a small number of tenants.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_TENANT_LABELS = os.environ.get('METRICS_TENANT_LABELS', 'False') == 'True'
+
+# Slow-query log and on-demand profiling (commerce_project/profiling.py). SQL
+# slower than SLOW_QUERY_MS is logged with its route and tenant (negative turns
+# it off); staff profile a request with the X-Profile header and the reports
+# are written to PROFILE_DIR. Profiling needs a WSGI server; under ASGI requests
+# are served unprofiled.
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', str(BASE_DIR / 'profiles'))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+
+# Worker threads per process that run the queries of the async endpoints
+# (commerce_project/async_api.py); each one keeps its own database connection.
+ASYNC_QUERY_THREADS = int(os.environ.get('ASYNC_QUERY_THREADS', '16'))
+
+# Outgoing mail (invoice emails are sent by the run_jobs worker).
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'False') == 'True'
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'webmaster@localhost')
+
+# Background jobs (core/jobs.py, manage.py run_jobs): attempts before a job is
+# marked failed, the retry backoff (doubling from the base, capped), and after
+# how long a job still marked running is assumed abandoned by its worker.
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '5'))
+JOB_RETRY_BASE_SECONDS = int(os.environ.get('JOB_RETRY_BASE_SECONDS', '10'))
+JOB_RETRY_MAX_SECONDS = int(os.environ.get('JOB_RETRY_MAX_SECONDS', '3600'))
+JOB_LOCK_SECONDS = int(os.environ.get('JOB_LOCK_SECONDS', '600'))
+
+# Rendered invoice PDF/HTML documents (orders/rendering.py), stored by content
+# hash; safe to delete, documents are rendered again on demand.
+INVOICE_RENDER_DIR = os.environ.get('INVOICE_RENDER_DIR', str(BASE_DIR / 'invoice_renders'))
+
+# Tax engine (products/tax.py): the GST rate for invoice lines whose product
+# and HSN code have no rate, and how many organizations' compiled rate tables
+# each process keeps.
+DEFAULT_TAX_RATE = os.environ.get('DEFAULT_TAX_RATE', '18')
+TAX_RATE_TABLE_CACHE_SIZE = int(os.environ.get('TAX_RATE_TABLE_CACHE_SIZE', '100'))
+
+# Currency of every amount (core/money.py keeps amounts as integer minor
+# units of it: paise for INR).
+CURRENCY = os.environ.get('CURRENCY', 'INR')
+
+# Invoice line prices (products.pricing): 'client' keeps the unit_price sent,
+# 'catalog' charges catalog lines the product's price from the catalog
+INVOICE_PRICING = os.environ.get('INVOICE_PRICING', 'client')
+PRODUCT_PRICE_CACHE_SIZE = int(os.environ.get('PRODUCT_PRICE_CACHE_SIZE', '50000'))
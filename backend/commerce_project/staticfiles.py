@@ -0,0 +1,39 @@
+"""
+WhiteNoise middleware that also runs natively under ASGI.
+
+The stock ``WhiteNoiseMiddleware`` is sync-only. Under ASGI Django runs a
+sync-only middleware on its single shared sync thread, and that thread then
+waits there for the whole rest of the request, async views included, so
+every request in the process goes through one at a time. This subclass
+checks for a static file without leaving the event loop and only moves to a
+thread to serve one.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # Looks at the filesystem on every request (DEBUG)
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
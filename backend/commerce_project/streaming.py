@@ -0,0 +1,10 @@
+"""
+Helpers for streamed (``StreamingHttpResponse``) downloads.
+"""
+
+
+class Echo:
+    """File-like object whose write() hands back the line for streaming"""
+
+    def write(self, value):
+        return value
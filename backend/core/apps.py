@@ -0,0 +1,31 @@
+from django.apps import AppConfig
+from django.core.checks import register
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+
+def _definitions_changed(sender, **kwargs):
+    from .rbac import invalidate_all
+    invalidate_all()
+
+
+def _assignment_changed(sender, instance, **kwargs):
+    from .rbac import invalidate_user
+    invalidate_user(instance.user_id)
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+
+    def ready(self):
+        from .checks import shared_cache_check
+        from .models import Permission, Role, RolePermission, UserRole
+
+        register(shared_cache_check)
+
+        # Keep the compiled RBAC permission sets (core.rbac) in step with writes
+        for model in (Permission, Role, RolePermission):
+            post_save.connect(_definitions_changed, sender=model, dispatch_uid=f'rbac-{model.__name__}-save')
+            post_delete.connect(_definitions_changed, sender=model, dispatch_uid=f'rbac-{model.__name__}-delete')
+        m2m_changed.connect(_definitions_changed, sender=Role.permissions.through, dispatch_uid='rbac-role-permissions')
+        post_save.connect(_assignment_changed, sender=UserRole, dispatch_uid='rbac-userrole-save')
+        post_delete.connect(_assignment_changed, sender=UserRole, dispatch_uid='rbac-userrole-delete')
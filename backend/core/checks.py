@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Warning
+
+# Backends whose entries other processes cannot see
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def shared_cache_check(app_configs, **kwargs):
+    """Cache invalidation (core.versions) reaches other processes only through a shared cache"""
+    if settings.CACHE_SINGLE_PROCESS:
+        return []
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f'The default cache ({backend}) is not shared between processes, so writes in one '
+        'process would leave stale catalog, price, tax and permission caches in the others.',
+        hint='Set REDIS_URL, or CACHE_SINGLE_PROCESS=True if one process serves every request.',
+        id='core.W001',
+    )]
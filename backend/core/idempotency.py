@@ -0,0 +1,191 @@
+"""
+Idempotency keys for retried POST requests.
+
+A client sends ``Idempotency-Key: <unique value>`` with a write it may
+retry. Keys are scoped per user. The first request with a key claims it
+and runs the view; the response (status code and body) is stored against
+the key. Views that write call ``store_response`` inside their transaction,
+so the response is kept exactly when the writes it describes commit. Later
+requests with the same key and the same payload get the
+stored response back with ``Idempotent-Replayed: true`` and never reach the
+view, so nothing is written twice and a replay costs one indexed SELECT.
+
+* A duplicate that arrives while the first request is still running
+  polls until that request finishes (``IDEMPOTENCY_WAIT_SECONDS``), then
+  replays its response; if it is still running, the duplicate gets 409.
+* Reusing a key for a different method, path or body gets 422.
+* Exceptions raised by the view (validation errors included) and 5xx
+  responses release the key, so the client can retry for real.
+* A claim whose request died without finishing is taken over after
+  ``IDEMPOTENCY_LOCK_SECONDS``. Keys expire after
+  ``IDEMPOTENCY_KEY_TTL_HOURS``; ``purge_idempotency_keys`` deletes them.
+
+Requests without the header behave exactly as before.
+"""
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+# The claimed key of the request being handled, until its response is stored
+_CLAIM = '_idempotency_claim'
+
+
+def _ttl():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+
+def _lock_timeout():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_SECONDS', 60))
+
+
+def _wait_timeout():
+    return getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 10)
+
+
+def fingerprint(request):
+    """Hash of what the request asks for, so a key cannot be reused for something else"""
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    payload = f"{request.method}\n{request.path}\n{body}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _is_abandoned(record, now):
+    if record.expires_at <= now:
+        return True
+    return record.status == 'in_progress' and record.locked_at <= now - _lock_timeout()
+
+
+def _acquire(user, key, request_fingerprint):
+    """Return (record, owned); ``owned`` means this request must run the view"""
+    while True:
+        now = timezone.now()
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None:
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user=user,
+                        key=key,
+                        request_fingerprint=request_fingerprint,
+                        locked_at=now,
+                        expires_at=now + _ttl(),
+                    )
+                return record, True
+            except IntegrityError:
+                # A concurrent duplicate claimed it first
+                continue
+        if _is_abandoned(record, now):
+            # Compare-and-set on locked_at so only one request takes it over
+            taken = IdempotencyKey.objects.filter(
+                pk=record.pk, locked_at=record.locked_at
+            ).update(
+                status='in_progress',
+                request_fingerprint=request_fingerprint,
+                response_status=None,
+                response_body=None,
+                locked_at=now,
+                expires_at=now + _ttl(),
+            )
+            if taken:
+                record.locked_at = now
+                return record, True
+            continue
+        return record, False
+
+
+def _complete(record, response):
+    IdempotencyKey.objects.filter(pk=record.pk, locked_at=record.locked_at).update(
+        status='completed',
+        response_status=response.status_code,
+        response_body=getattr(response, 'data', None),
+    )
+
+
+def store_response(request, response):
+    """
+    Store ``response`` against the request's key, if it has one. Call inside
+    the view's transaction; the decorator stores the response itself, after
+    the view returns, for views that do not.
+    """
+    record = getattr(request, _CLAIM, None)
+    if record is not None and response.status_code < 500:
+        _complete(record, response)
+        setattr(request, _CLAIM, None)
+
+
+def _release(record):
+    IdempotencyKey.objects.filter(pk=record.pk, locked_at=record.locked_at).delete()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response[REPLAY_HEADER] = 'true'
+    return response
+
+
+def idempotent(view_method):
+    """Make a DRF view method honour the ``Idempotency-Key`` header"""
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'detail': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        request_fingerprint = fingerprint(request)
+        deadline = time.monotonic() + _wait_timeout()
+        while True:
+            record, owned = _acquire(request.user, key, request_fingerprint)
+            if owned:
+                break
+            if record.request_fingerprint != request_fingerprint:
+                return Response(
+                    {'detail': f'{HEADER} was already used for a different request.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record.status == 'completed':
+                return _replay(record)
+            if time.monotonic() >= deadline:
+                return Response(
+                    {'detail': f'A request with this {HEADER} is still in progress.'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            time.sleep(POLL_INTERVAL)
+
+        setattr(request, _CLAIM, record)
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            _release(record)
+            raise
+        if response.status_code >= 500:
+            _release(record)
+        elif getattr(request, _CLAIM, None) is record:
+            _complete(record, response)
+        return response
+
+    return wrapper
+
+
+def purge_expired(now=None):
+    """Delete expired keys; returns how many were removed"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
@@ -0,0 +1,157 @@
+"""
+Database-backed background jobs.
+
+Work that should not hold up a request (mailing an invoice, rendering a
+PDF) is written to the ``core_job`` table with ``enqueue`` and run by
+``manage.py run_jobs``. There is no broker: the queue is the database the
+app already uses. A job enqueued inside a transaction becomes visible to
+workers only when that transaction commits, and vanishes with it on
+rollback.
+
+Handlers are plain functions registered under a name with ``@register``
+in an app's ``jobs.py`` module. They are called with the job's payload as
+keyword arguments, so payloads must be JSON.
+
+Workers claim due jobs in batches, highest ``priority`` first and then
+oldest ``run_at``. On PostgreSQL the claim query uses ``SELECT ... FOR
+UPDATE SKIP LOCKED``, so concurrent workers skip each other's rows instead
+of waiting on them. Every claim is also stamped with a token and read back
+by that token, so a batch is never handed out twice on backends that
+ignore row locks (SQLite serializes writers instead).
+
+A handler that raises is retried after an exponential backoff with jitter
+(``JOB_RETRY_BASE_SECONDS`` doubling per attempt, capped at
+``JOB_RETRY_MAX_SECONDS``) until it has run ``max_attempts`` times; then
+the job is marked ``failed`` with the last traceback. Jobs left
+``running`` by a worker that died are put back in the queue once their
+claim is older than ``JOB_LOCK_SECONDS``.
+"""
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+
+_registry = {}
+
+
+def register(name):
+    """Register the decorated function as the handler for jobs called ``name``"""
+    def decorator(function):
+        _registry[name] = function
+        return function
+    return decorator
+
+
+def autodiscover():
+    """Import every installed app's ``jobs`` module so its handlers register"""
+    autodiscover_modules('jobs')
+
+
+def handler_for(name):
+    return _registry.get(name)
+
+
+def enqueue(name, payload=None, *, priority=PRIORITY_NORMAL, organization_id='', delay=None, max_attempts=None):
+    """Queue a job; it runs after the current transaction (if any) commits"""
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        organization_id=organization_id or '',
+        priority=priority,
+        run_at=timezone.now() + (delay or timedelta()),
+        max_attempts=max_attempts or getattr(settings, 'JOB_MAX_ATTEMPTS', 5),
+    )
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts``: exponential, capped, with up to 25% jitter"""
+    base = getattr(settings, 'JOB_RETRY_BASE_SECONDS', 10)
+    cap = getattr(settings, 'JOB_RETRY_MAX_SECONDS', 3600)
+    delay = min(base * 2 ** max(attempts - 1, 0), cap)
+    return timedelta(seconds=delay * (1 + random.random() / 4))
+
+
+def claim(worker_id, limit):
+    """Mark up to ``limit`` due jobs as running for ``worker_id`` and return them"""
+    now = timezone.now()
+    token = f'{worker_id}:{uuid.uuid4().hex[:12]}'
+    with transaction.atomic():
+        due = Job.objects.filter(status='queued', run_at__lte=now).order_by('-priority', 'run_at')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        Job.objects.filter(id__in=ids, status='queued').update(
+            status='running', locked_at=now, locked_by=token, attempts=F('attempts') + 1
+        )
+    return list(Job.objects.filter(locked_by=token, status='running').order_by('-priority', 'run_at'))
+
+
+def _finish(job, **fields):
+    # Only the worker holding the claim may settle the job
+    return Job.objects.filter(id=job.id, locked_by=job.locked_by, status='running').update(**fields)
+
+
+def execute(job):
+    """Run a claimed job's handler and record the outcome; returns the new status"""
+    handler = handler_for(job.name)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job {job.name!r}')
+        handler(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts and handler is not None:
+            _finish(job, status='queued', run_at=timezone.now() + backoff(job.attempts),
+                    locked_at=None, locked_by='', last_error=error)
+            logger.warning('job %s (%s) failed on attempt %s, retrying', job.id, job.name, job.attempts)
+            return 'queued'
+        _finish(job, status='failed', finished_at=timezone.now(), last_error=error)
+        logger.error('job %s (%s) failed after %s attempts', job.id, job.name, job.attempts)
+        return 'failed'
+    _finish(job, status='succeeded', finished_at=timezone.now(), last_error='')
+    return 'succeeded'
+
+
+def execute_by_id(job_id):
+    """``execute`` for a job claimed in another process (process pools)"""
+    job = Job.objects.filter(id=job_id, status='running').first()
+    if job is None:
+        return None
+    return execute(job)
+
+
+def requeue_stale(now=None):
+    """Return jobs whose worker stopped reporting to the queue; returns how many"""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=getattr(settings, 'JOB_LOCK_SECONDS', 600))
+    stale = Job.objects.filter(status='running', locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, last_error='Worker stopped while running the job'
+    )
+    requeued = stale.update(status='queued', run_at=now, locked_at=None, locked_by='')
+    return failed + requeued
+
+
+def purge_finished(older_than):
+    """Delete succeeded and failed jobs finished before ``older_than``"""
+    deleted, _ = Job.objects.filter(
+        status__in=('succeeded', 'failed'), finished_at__lt=older_than
+    ).delete()
+    return deleted
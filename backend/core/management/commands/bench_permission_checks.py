@@ -0,0 +1,96 @@
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from core.models import Branch, Distributor, Permission, Role, RolePermission, UserRole
+from core.rbac import grants, permission_cache
+from users.permissions import HasPermission
+
+User = get_user_model()
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Measure per-request permission-check overhead: compiled RBAC sets vs the naive join'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=5000, help='Permission checks per scenario')
+        parser.add_argument('--permissions', type=int, default=120, help='Permission codes to seed')
+        parser.add_argument('--roles', type=int, default=4, help='Roles assigned to the user')
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        distributor = Distributor.objects.create(name=f'Bench {tag}', slug=f'bench-{tag}', contact_email='bench@bench.local')
+        branch = Branch.objects.create(distributor=distributor, name='Main', code='MAIN')
+        user = User.objects.create_user(
+            email=f'bench-{tag}@bench.local',
+            password=None,
+            organization_id=f'bench-{tag}',
+            role='cashier',
+            current_branch=branch,
+            distributor=distributor,
+        )
+        permissions = Permission.objects.bulk_create([
+            Permission(code=f'bench-{tag}.perm{n}', name=f'Perm {n}', module='bench', action=f'perm{n}')
+            for n in range(options['permissions'])
+        ])
+        try:
+            per_role = len(permissions) // options['roles']
+            for n in range(options['roles']):
+                role = Role.objects.create(distributor=distributor, name=f'Role {n}')
+                RolePermission.objects.bulk_create([
+                    RolePermission(role=role, permission=permission)
+                    for permission in permissions[n * per_role:(n + 1) * per_role]
+                ])
+                UserRole.objects.create(user=user, role=role, branch=branch, is_primary=n == 0)
+            codes = [permission.code for permission in permissions]
+            required = [codes[(n * 7) % len(codes)] for n in range(options['checks'])]
+
+            def naive(code):
+                return grants(user.pk, user.current_branch_id).filter(permission__code=code).exists()
+
+            view = APIView()
+            request = view.initialize_request(APIRequestFactory().get('/'))
+            request.user = user
+            check = HasPermission()
+
+            def via_drf(code):
+                view.required_permission = code
+                return check.has_permission(request, view)
+
+            self._report('naive join', [self._time(naive, code) for code in required])
+            permission_cache.clear()
+            self._report('compiled, cold', [self._time(self._cold, via_drf, code) for code in required[:200]])
+            self._report('compiled, warm', [self._time(via_drf, code) for code in required])
+        finally:
+            Role.objects.filter(distributor=distributor).delete()
+            Permission.objects.filter(code__startswith=f'bench-{tag}.').delete()
+            user.delete()
+            distributor.delete()
+
+    def _cold(self, func, code):
+        permission_cache.clear()
+        return func(code)
+
+    def _time(self, func, *args):
+        started = time.perf_counter()
+        allowed = func(*args)
+        elapsed = (time.perf_counter() - started) * 1000
+        if not allowed:
+            raise CommandError('Permission check unexpectedly denied')
+        return elapsed
+
+    def _report(self, label, samples):
+        self.stdout.write(
+            f"{label:>16}: p50={statistics.median(samples):.4f}ms "
+            f"p99={_percentile(samples, 99):.4f}ms n={len(samples)}"
+        )
@@ -0,0 +1,311 @@
+import io
+import json
+import statistics
+import time
+from itertools import count
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+
+from commerce_project.metrics import observe_queries
+
+from orders.models import Order
+from orders.search import sqlite_fts_available
+from orders.sync import sync_invoices
+from products.catalog import lookup_cache
+from products.models import Category, Product
+from products.pricing import price_cache
+from products.tax import rate_tables
+from core.rbac import permission_cache
+from users.authentication import ClaimsTokenObtainPairSerializer
+
+User = get_user_model()
+
+PASSWORD = 'Budget-pass-123'
+
+# Tenant sizes every endpoint runs against; query counts must not differ between them
+TENANTS = {
+    'small': {'products': 5, 'invoices': 3, 'items': 2, 'staff': 1},
+    'large': {'products': 300, 'invoices': 120, 'items': 25, 'staff': 15},
+}
+
+_sequence = count(1)
+
+
+def _unique(prefix):
+    return f'{prefix}-{next(_sequence)}'
+
+
+def _invoice_payload(ctx, lines=1):
+    return {
+        'items': [
+            {'product_id': ctx['product_ids'][n % len(ctx['product_ids'])], 'product_name': 'Item',
+             'quantity': 1, 'unit_price': '10.00'}
+            for n in range(lines)
+        ],
+        'payments': [{'amount': '5.00', 'method': 'cash'}],
+    }
+
+
+def _import_file(ctx):
+    upload = io.BytesIO(
+        f"sku,name,base_price\n{ctx['tenant']}-new-{next(_sequence)},Imported,12.50\n"
+        f"{ctx['skus'][0]},Renamed,11.00\n".encode()
+    )
+    upload.name = 'products.csv'
+    return {'file': upload}
+
+
+# (name, method, path, payload factory, request format, query budget)
+# Paths and payloads are filled in from the seeded tenant (see _seed).
+ENDPOINTS = [
+    ('auth.login', 'post', '/api/auth/login/', lambda ctx: {'email': ctx['email'], 'password': PASSWORD}, 'json', 1),
+    ('auth.refresh', 'post', '/api/auth/token/refresh/', lambda ctx: {'refresh': ctx['refresh']}, 'json', 1),
+    ('auth.me', 'get', '/api/auth/me/', None, None, 1),
+    ('auth.me.update', 'patch', '/api/auth/me/', lambda ctx: {'first_name': _unique('Owner')}, 'json', 2),
+    ('auth.staff', 'get', '/api/auth/staff/', None, None, 1),
+    ('auth.add_staff', 'post', '/api/auth/add-staff/', lambda ctx: {
+        'email': f"{_unique(ctx['tenant'])}@budget.local", 'password': PASSWORD, 'role': 'cashier'
+    }, 'json', 2),
+
+    ('products.categories', 'get', '/api/products/categories/', None, None, 2),
+    ('products.categories.create', 'post', '/api/products/categories/', lambda ctx: {'name': _unique('Category')}, 'json', 1),
+    ('products.hsn_rates', 'get', '/api/products/hsn-rates/', None, None, 2),
+    ('products.hsn_rates.create', 'post', '/api/products/hsn-rates/', lambda ctx: {
+        'hsn_code': _unique('HSN'), 'rate': '12.00'
+    }, 'json', 2),
+    ('products.list', 'get', '/api/products/list/', None, None, 2),
+    ('products.list.cursor', 'get', '/api/products/list/?paginate=cursor', None, None, 1),
+    ('products.list.async', 'get', '/api/products/list/async/', None, None, 2),
+    ('products.retrieve', 'get', '/api/products/list/{product_id}/', None, None, 1),
+    ('products.create', 'post', '/api/products/list/', lambda ctx: {
+        'name': 'Budget product', 'sku': _unique(f"{ctx['tenant']}-new"), 'base_price': '9.99'
+    }, 'json', 2),
+    ('products.update', 'patch', '/api/products/list/{product_id}/', lambda ctx: {'name': _unique('Renamed')}, 'json', 2),
+    ('products.movements', 'get', '/api/products/list/{product_id}/movements/', None, None, 3),
+    ('products.movements.adjust', 'post', '/api/products/list/{product_id}/movements/',
+     lambda ctx: {'kind': 'adjustment', 'quantity': -1, 'note': 'budget'}, 'json', 4),
+    ('products.delete', 'delete', '/api/products/list/{spare_product_id}/', None, None, 5),
+    ('products.lookup', 'get', '/api/products/list/lookup/?code={barcode}', None, None, 1),
+    ('products.lookup.batch', 'post', '/api/products/list/lookup/', lambda ctx: {'codes': ctx['barcodes']}, 'json', 1),
+    ('products.import', 'post', '/api/products/list/import/', _import_file, 'multipart', 4),
+    ('products.export', 'get', '/api/products/list/export/?file_format=csv', None, None, 1),
+
+    ('orders.create', 'post', '/api/orders/create/', lambda ctx: {
+        'invoice_number': _unique('ORD'), 'subtotal': '10.00', 'total': '11.80'
+    }, 'json', 7),
+    ('orders.list', 'get', '/api/orders/list/', None, None, 3),
+
+    ('invoices.list', 'get', '/api/invoices/', None, None, 3),
+    ('invoices.list.cursor', 'get', '/api/invoices/?paginate=cursor', None, None, 2),
+    ('invoices.search', 'get', '/api/invoices/?search=INV', None, None, 3),
+    ('invoices.retrieve', 'get', '/api/invoices/{invoice_id}/', None, None, 2),
+    ('invoices.document.pdf', 'get', '/api/invoices/{invoice_id}/document/?file_format=pdf', None, None, 2),
+    ('invoices.document.html', 'get', '/api/invoices/{invoice_id}/document/?file_format=html', None, None, 2),
+    ('invoices.create', 'post', '/api/invoices/', lambda ctx: _invoice_payload(ctx, lines=3), 'json', 15),
+    ('invoices.sync', 'post', '/api/invoices/sync/', lambda ctx: {'invoices': [
+        {**_invoice_payload(ctx, lines=2), 'client_id': _unique(ctx['tenant'])} for _ in range(5)
+    ]}, 'json', 15),
+    ('invoices.add_payment', 'post', '/api/invoices/{invoice_id}/add_payment/', lambda ctx: {'amount': '1.00'}, 'json', 11),
+    ('invoices.cancel', 'post', '/api/invoices/{cancel_invoice_id}/cancel/', lambda ctx: {'reason': 'budget'}, 'json', 13),
+    ('invoices.update', 'patch', '/api/invoices/{invoice_id}/', lambda ctx: {'notes': _unique('note')}, 'json', 7),
+    ('invoices.delete', 'delete', '/api/invoices/{delete_invoice_id}/', None, None, 13),
+    ('invoices.stats', 'get', '/api/invoices/stats/', None, None, 1),
+    ('invoices.stats.async', 'get', '/api/invoices/async/stats/', None, None, 1),
+    ('invoices.list.async', 'get', '/api/invoices/async/', None, None, 3),
+    ('invoices.list.async.cursor', 'get', '/api/invoices/async/?paginate=cursor', None, None, 2),
+    ('dashboard', 'get', '/api/dashboard/', None, None, 3),
+    ('invoices.export.csv', 'get', '/api/invoices/export/?file_format=csv', None, None, 1),
+    ('invoices.export.ndjson', 'get', '/api/invoices/export/?file_format=ndjson', None, None, 2),
+    ('invoices.export.items', 'get', '/api/invoices/export/?file_format=items-csv', None, None, 1),
+    ('invoices.reports', 'get', '/api/invoices/reports/?start_date=2000-01-01&end_date=2100-01-01', None, None, 1),
+    ('invoices.validate', 'post', '/api/invoices/validate/', lambda ctx: _invoice_payload(ctx, lines=3), 'json', 3),
+    ('invoices.validate.cart', 'post', '/api/invoices/validate/', lambda ctx: _invoice_payload(ctx, lines=500), 'json', 3),
+    ('invoices.send_email', 'post', '/api/invoices/{invoice_id}/send_email/',
+     lambda ctx: {'email': 'customer@example.com'}, 'json', 3),
+]
+
+# Not exercised: the Django admin (session auth, not part of the API) and
+# orders/payment-intent/ (calls Stripe over the network).
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Run every API endpoint against a small and a large seeded tenant in a throwaway '
+        'test database; fail if any endpoint exceeds its query budget or its query count '
+        'grows with data size. With --write, also record per-endpoint query counts and wall times '
+        'in a JSON baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'query_budgets.json'),
+                            help='Where --write puts the JSON baseline')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed calls per endpoint and tenant')
+        parser.add_argument('--only', help='Only run endpoints whose name starts with this prefix')
+        parser.add_argument('--write', action='store_true', help='Also write the baseline (budgets are checked either way)')
+
+    def handle(self, *args, **options):
+        endpoints = [e for e in ENDPOINTS if not options['only'] or e[0].startswith(options['only'])]
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results, failures = self._run(endpoints, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name, _, _, _, _, budget in endpoints:
+            result = results[name]
+            marker = 'FAIL' if name in failures else 'ok'
+            timings = ' '.join(f"{size}={ms:.1f}ms" for size, ms in result['ms'].items())
+            self.stdout.write(f"{marker:>4} {name:<28} {result['queries']:>3}/{budget:<3} queries  {timings}")
+
+        if options['write']:
+            with open(options['baseline'], 'w') as baseline:
+                json.dump(results, baseline, indent=2, sort_keys=True)
+                baseline.write('\n')
+            self.stdout.write(f"Baseline written to {options['baseline']}")
+
+        if failures:
+            raise CommandError('\n'.join(f"{name}: {reason}" for name, reason in failures.items()))
+
+    def _run(self, endpoints, repeat):
+        contexts = {size: self._seed(size, **shape) for size, shape in TENANTS.items()}
+        results, failures = {}, {}
+        for name, method, path, payload, request_format, budget in endpoints:
+            counts, timings = {}, {}
+            for size, ctx in contexts.items():
+                samples = []
+                for _ in range(repeat):
+                    queries, elapsed = self._call(ctx, method, path, payload, request_format)
+                    samples.append(elapsed)
+                counts[size] = queries
+                timings[size] = round(statistics.median(samples), 2)
+            queries = max(counts.values())
+            results[name] = {
+                'method': method.upper(),
+                'path': path,
+                'budget': budget,
+                'queries': queries,
+                'ms': timings,
+            }
+            if len(set(counts.values())) > 1:
+                failures[name] = f"query count grows with data size ({counts})"
+            elif queries > budget:
+                failures[name] = f"{queries} queries, budget is {budget}"
+        return results, failures
+
+    def _call(self, ctx, method, path, payload, request_format):
+        # Per-process caches would hide queries on the first call of each run
+        lookup_cache.clear()
+        price_cache.clear()
+        permission_cache.clear()
+        cache.clear()
+        self._refresh_targets(ctx)
+        # Refreshing creates invoices, which compiles the tenant's tax rates
+        rate_tables.clear()
+        # Looked up once per process, so answer it for this database before counting
+        sqlite_fts_available.cache_clear()
+        if connection.vendor == 'sqlite':
+            sqlite_fts_available()
+        client = APIClient()
+        if not path.startswith(('/api/auth/login/', '/api/auth/token/')):
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {ctx['access']}")
+        kwargs = {'secure': True, 'HTTP_HOST': 'localhost'}
+        if payload is not None:
+            kwargs['data'] = payload(ctx)
+            kwargs['format'] = request_format
+        counter = QueryCounter()
+        # Also sees the queries async views run on their worker threads
+        with observe_queries(counter):
+            started = time.perf_counter()
+            response = getattr(client, method)(path.format(**ctx), **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise CommandError(f"{method.upper()} {path} returned HTTP {response.status_code}: {response.content[:300]}")
+        return len(counter.queries), elapsed
+
+    def _refresh_targets(self, ctx):
+        """Fresh rows for endpoints that consume them (cancel, delete)"""
+        user = ctx['user']
+        spare = Product.objects.create(
+            organization_id=user.organization_id, name='Spare', sku=_unique(f"{ctx['tenant']}-spare"), base_price='1.00'
+        )
+        ctx['spare_product_id'] = str(spare.pk)
+        # Only invoices that moved no stock can be deleted, so that one has no catalog lines
+        results, _ = sync_invoices(user, [
+            {**_invoice_payload(ctx), 'client_id': _unique(ctx['tenant'])},
+            {'items': [{'product_name': 'Service', 'quantity': 1, 'unit_price': '10.00'}],
+             'client_id': _unique(ctx['tenant'])},
+        ])
+        ctx['cancel_invoice_id'], ctx['delete_invoice_id'] = (result['id'] for result in results)
+        # Tokens carry claims; a fresh one matches the auth version after user saves
+        ctx['access'] = str(ClaimsTokenObtainPairSerializer.get_token(user).access_token)
+
+    def _seed(self, tenant, products, invoices, items, staff):
+        owner = User.objects.create_user(
+            email=f'owner-{tenant}@budget.local',
+            password=PASSWORD,
+            organization_id=f'budget-{tenant}',
+            business_name=f'Budget {tenant}',
+            role='owner',
+        )
+        for n in range(staff):
+            User.objects.create_user(
+                email=f'staff-{tenant}-{n}@budget.local', password=None,
+                organization_id=owner.organization_id, role='cashier',
+            )
+        categories = Category.objects.bulk_create([
+            Category(organization_id=owner.organization_id, name=f'Category {n}') for n in range(5)
+        ])
+        catalog = Product.objects.bulk_create([
+            Product(
+                organization_id=owner.organization_id,
+                category=categories[n % len(categories)],
+                name=f'Product {n}',
+                sku=f'{tenant}-{n}',
+                barcode=f'{tenant}-bc-{n}',
+                base_price='10.00',
+                stock_quantity=100000,
+            )
+            for n in range(products)
+        ])
+        ctx = {
+            'tenant': tenant,
+            'user': owner,
+            'email': owner.email,
+            'product_id': str(catalog[0].pk),
+            'product_ids': [str(product.pk) for product in catalog],
+            'skus': [product.sku for product in catalog],
+            'barcode': catalog[0].barcode,
+            'barcodes': [product.barcode for product in catalog[:5]],
+        }
+        payloads = [
+            {**_invoice_payload(ctx, lines=min(items, products)), 'client_id': f'{tenant}-seed-{n}'}
+            for n in range(invoices)
+        ]
+        sync_invoices(owner, payloads)
+        ctx['invoice_id'] = str(Order.objects.filter(organization_id=owner.organization_id).first().pk)
+
+        tokens = APIClient().post(
+            '/api/auth/login/', {'email': owner.email, 'password': PASSWORD},
+            format='json', secure=True, HTTP_HOST='localhost'
+        ).json()
+        ctx['access'], ctx['refresh'] = tokens['access'], tokens['refresh']
+        return ctx
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete expired idempotency keys (run periodically, e.g. hourly from cron)'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(f"Deleted {deleted} expired idempotency keys")
@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.jobs import purge_finished
+
+
+class Command(BaseCommand):
+    help = 'Delete finished background jobs (run periodically, e.g. daily from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Keep jobs finished within this many days')
+
+    def handle(self, *args, **options):
+        deleted = purge_finished(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(f"Deleted {deleted} finished jobs")
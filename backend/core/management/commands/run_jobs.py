@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+
+def _run_in_thread(job):
+    from core import jobs
+    try:
+        return jobs.execute(job)
+    finally:
+        # Pool threads keep their connection otherwise; honour CONN_MAX_AGE
+        close_old_connections()
+
+
+# Spawned processes import this module before Django is set up, so
+# core.jobs (which imports models) is only imported inside these functions
+def _init_process():
+    django.setup()
+    from core import jobs
+    jobs.autodiscover()
+
+
+def _run_in_process(job_id):
+    from core import jobs
+    try:
+        return jobs.execute_by_id(job_id)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (see core/jobs.py) until stopped with SIGINT/SIGTERM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Jobs run at the same time')
+        parser.add_argument('--pool', choices=('thread', 'process'), default='thread',
+                            help='Run jobs on threads (I/O-bound work) or processes (CPU-bound work)')
+        parser.add_argument('--batch-size', type=int, default=10, help='Most jobs claimed per query')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when idle')
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is due')
+
+    def handle(self, *args, **options):
+        from core import jobs
+        jobs.autodiscover()
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        concurrency = max(options['concurrency'], 1)
+        if options['pool'] == 'process':
+            # Forked children would share the parent's database sockets
+            connections.close_all()
+            pool = ProcessPoolExecutor(
+                max_workers=concurrency, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_process,
+            )
+            submit = lambda job: pool.submit(_run_in_process, job.id)
+        else:
+            pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='job')
+            submit = lambda job: pool.submit(_run_in_thread, job)
+
+        self.stopping = False
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self._stop)
+
+        self.stdout.write(f"Worker {worker_id}: {concurrency} {options['pool']} slots")
+        running = {}
+        counts = {'succeeded': 0, 'queued': 0, 'failed': 0}
+        last_sweep = 0.0
+        try:
+            while not self.stopping:
+                if time.monotonic() - last_sweep > 60:
+                    requeued = jobs.requeue_stale()
+                    if requeued:
+                        self.stdout.write(f"Returned {requeued} abandoned jobs to the queue")
+                    last_sweep = time.monotonic()
+
+                free = concurrency - len(running)
+                claimed = jobs.claim(worker_id, min(free, options['batch_size'])) if free else []
+                for job in claimed:
+                    running[submit(job)] = job
+
+                if not running:
+                    if options['burst']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                # Claim again as soon as a slot frees up, or after the poll interval
+                timeout = 0 if claimed and len(running) < concurrency else options['poll_interval']
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    self._record(job, future, counts)
+        finally:
+            # Let jobs in flight finish; what they hold would otherwise only be
+            # released after JOB_LOCK_SECONDS
+            for future in list(running):
+                self._record(running.pop(future), future, counts, wait_for_result=True)
+            pool.shutdown(wait=True)
+        self.stdout.write(
+            f"Stopped: {counts['succeeded']} succeeded, {counts['queued']} to retry, {counts['failed']} failed"
+        )
+
+    def _record(self, job, future, counts, wait_for_result=False):
+        try:
+            status = future.result() if wait_for_result or future.done() else None
+        except Exception as exc:
+            # The pool itself broke (e.g. a killed process); the stale sweep will requeue the job
+            self.stderr.write(f"Job {job.id} ({job.name}) crashed its worker: {exc!r}")
+            return
+        if status in counts:
+            counts[status] += 1
+
+    def _stop(self, signum, frame):
+        self.stopping = True
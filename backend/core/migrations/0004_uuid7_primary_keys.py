@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:53
+
+import core.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_jobs'),
+    ]
+
+    # Only the key default the application fills in changes: no schema change, and
+    # existing rows keep their version 4 keys (see core.ids)
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='branch',
+                name='id',
+                field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+            ),
+            migrations.AlterField(
+                model_name='distributor',
+                name='id',
+                field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+            ),
+            migrations.AlterField(
+                model_name='idempotencykey',
+                name='id',
+                field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+            ),
+            migrations.AlterField(
+                model_name='job',
+                name='id',
+                field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+            ),
+            migrations.AlterField(
+                model_name='permission',
+                name='id',
+                field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+            ),
+            migrations.AlterField(
+                model_name='role',
+                name='id',
+                field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+            ),
+            migrations.AlterField(
+                model_name='rolepermission',
+                name='id',
+                field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+            ),
+            migrations.AlterField(
+                model_name='userrole',
+                name='id',
+                field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+            ),
+        ]),
+    ]
@@ -1,10 +1,11 @@
 
-import uuid
+from core.ids import uuid7
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 
 class Permission(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     code = models.CharField(max_length=100, unique=True)
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -28,7 +29,7 @@ class Distributor(models.Model):
         ('enterprise', 'Enterprise'),
     )
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=255)
     slug = models.SlugField(max_length=100, unique=True)
     contact_email = models.EmailField()
@@ -50,7 +51,7 @@ class Distributor(models.Model):
         return self.name
 
 class Branch(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     distributor = models.ForeignKey(Distributor, on_delete=models.CASCADE, related_name='branches')
     name = models.CharField(max_length=255)
     code = models.CharField(max_length=50)
@@ -76,7 +77,7 @@ class Branch(models.Model):
         return f"{self.distributor.name} - {self.name}"
 
 class Role(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     distributor = models.ForeignKey(Distributor, on_delete=models.CASCADE, related_name='roles')
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -96,7 +97,7 @@ class Role(models.Model):
         return f"{self.distributor.name} - {self.name}"
 
 class RolePermission(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     role = models.ForeignKey(Role, on_delete=models.CASCADE)
     permission = models.ForeignKey(Permission, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -106,7 +107,7 @@ class RolePermission(models.Model):
         unique_together = ('role', 'permission')
 
 class UserRole(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='user_roles')
     role = models.ForeignKey(Role, on_delete=models.CASCADE)
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE)
@@ -118,3 +119,56 @@ class UserRole(models.Model):
         db_table = 'core_user_role'
         ordering = ['-is_primary', 'branch']
         unique_together = ('user', 'role', 'branch')
+
+class IdempotencyKey(models.Model):
+    STATUS_CHOICES = (
+        ('in_progress', 'In progress'),
+        ('completed', 'Completed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    locked_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'core_idempotency_key'
+        unique_together = ('user', 'key')
+
+class Job(models.Model):
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    organization_id = models.CharField(max_length=100, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'core_job'
+        indexes = [
+            models.Index(
+                fields=['-priority', 'run_at'], condition=models.Q(status='queued'), name='core_job_dequeue_idx'
+            ),
+            models.Index(fields=['status', 'locked_at'], name='core_job_status_locked_idx'),
+        ]
@@ -0,0 +1,225 @@
+"""
+Money as integer minor units.
+
+An amount is an integer count of its currency's minor unit (paise for
+INR) with a currency tag (``Money``), so totalling a bill is integer
+arithmetic and every amount is exact to the minor unit. ``Decimal`` only
+appears at the edges: parsing request values and model fields
+(``parse_minor`` / ``Money.parse``, ``MoneyField``) and writing them back
+(``to_decimal``).
+
+Rounding rules:
+
+* Values with more decimal places than the minor unit are rounded half up
+  (half away from zero) when parsed: ``10.005`` -> 1001 paise.
+* Products and shares of amounts (quantity x unit price, tax at a rate)
+  are rounded the same way with ``div_round``.
+* ``HALF_EVEN`` matches what a ``DecimalField`` stored, since Django
+  quantizes half-even on save; use it to read back values written
+  before rounding moved here.
+"""
+import functools
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN, ROUND_HALF_UP
+
+from django.conf import settings
+from rest_framework import serializers
+
+HALF_UP = 'half_up'
+HALF_EVEN = 'half_even'
+_DECIMAL_ROUNDING = {HALF_UP: ROUND_HALF_UP, HALF_EVEN: ROUND_HALF_EVEN}
+
+# Decimal places of each currency's minor unit; anything else has two
+MINOR_UNITS = {'INR': 2, 'USD': 2, 'EUR': 2, 'GBP': 2, 'AED': 2, 'JPY': 0, 'KWD': 3, 'BHD': 3}
+_POWERS = tuple(10 ** n for n in range(19))
+
+
+class InvalidAmount(ValueError):
+    pass
+
+
+def default_currency():
+    return getattr(settings, 'CURRENCY', 'INR')
+
+
+def minor_places(currency):
+    return MINOR_UNITS.get(currency, 2)
+
+
+def div_round(numerator, denominator, rounding=HALF_UP):
+    """``numerator / denominator`` rounded to an integer; ``denominator`` must be positive"""
+    if rounding == HALF_UP:
+        if numerator >= 0:
+            return (numerator + numerator + denominator) // (denominator + denominator)
+        return -((denominator - numerator - numerator) // (denominator + denominator))
+    quotient, remainder = divmod(numerator, denominator)
+    twice = remainder + remainder
+    if twice > denominator or (twice == denominator and quotient & 1):
+        quotient += 1
+    return quotient
+
+
+def _from_decimal(value, places, rounding):
+    if not value.is_finite():
+        raise InvalidAmount(f'Not an amount: {value}')
+    try:
+        return int(value.scaleb(places).to_integral_value(rounding=_DECIMAL_ROUNDING[rounding]))
+    except ArithmeticError:
+        # Exponents beyond the decimal context (e.g. "1e999999999")
+        raise InvalidAmount(f'Not an amount: {value}') from None
+
+
+def _parse_text(text, places, rounding):
+    try:
+        return _from_decimal(Decimal(text.strip()), places, rounding)
+    except InvalidOperation:
+        raise InvalidAmount(f'Not an amount: {text!r}') from None
+
+
+def parse_minor(value, places=2, rounding=HALF_UP):
+    """
+    ``value`` (a string, int, ``Decimal``, float or ``Money``) as an integer
+    count of ``10 ** -places`` units; raises ``InvalidAmount``
+    """
+    kind = type(value)
+    if kind is str:
+        whole, _, fraction = value.partition('.')
+        # Plain "-123.45" with at most ``places`` decimals: one int() over the digits;
+        # anything else (exponents, more decimals, stray characters) goes through Decimal
+        if len(fraction) <= places and (fraction[-1:] or whole[-1:]).isdigit():
+            try:
+                return int(whole + fraction) * _POWERS[places - len(fraction)]
+            except ValueError:
+                pass
+        return _parse_text(value, places, rounding)
+    if kind is int:
+        return value * _POWERS[places]
+    if kind is Money:
+        return value.minor
+    if kind is Decimal:
+        return _from_decimal(value, places, rounding)
+    if kind is float:
+        # Read as its shortest repr, the number the client wrote
+        return _parse_text(repr(value), places, rounding)
+    raise InvalidAmount(f'Not an amount: {value!r}')
+
+
+def to_decimal(minor, places=2):
+    """The ``Decimal`` for an integer count of ``10 ** -places`` units, for model fields and JSON"""
+    return Decimal(minor).scaleb(-places)
+
+
+def format_minor(minor, places=2):
+    """``1005`` -> ``'10.05'``"""
+    if not places:
+        return str(minor)
+    whole, fraction = divmod(abs(minor), _POWERS[places])
+    return f"{'-' if minor < 0 else ''}{whole}.{fraction:0{places}d}"
+
+
+@functools.total_ordering
+class Money:
+    """An amount in integer minor units of ``currency``"""
+    __slots__ = ('minor', 'currency')
+
+    def __init__(self, minor=0, currency=None):
+        self.minor = minor
+        self.currency = currency or default_currency()
+
+    @classmethod
+    def parse(cls, value, currency=None, rounding=HALF_UP):
+        if type(value) is cls:
+            return value
+        currency = currency or default_currency()
+        return cls(parse_minor(value, minor_places(currency), rounding), currency)
+
+    @property
+    def places(self):
+        return minor_places(self.currency)
+
+    def to_decimal(self):
+        return to_decimal(self.minor, self.places)
+
+    def scale(self, numerator, denominator, rounding=HALF_UP):
+        """``self * numerator / denominator``, rounded to the minor unit"""
+        return Money(div_round(self.minor * numerator, denominator, rounding), self.currency)
+
+    def _other(self, other):
+        if type(other) is not Money:
+            raise TypeError(f'Expected Money, got {type(other).__name__}')
+        if other.currency != self.currency:
+            raise ValueError(f'Cannot combine {self.currency} and {other.currency}')
+        return other.minor
+
+    def __add__(self, other):
+        return Money(self.minor + self._other(other), self.currency)
+
+    def __radd__(self, other):
+        # sum() starts from 0
+        if other == 0:
+            return self
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        return Money(self.minor - self._other(other), self.currency)
+
+    def __neg__(self):
+        return Money(-self.minor, self.currency)
+
+    def __mul__(self, factor):
+        if type(factor) is not int:
+            return NotImplemented
+        return Money(self.minor * factor, self.currency)
+
+    __rmul__ = __mul__
+
+    def __eq__(self, other):
+        if type(other) is not Money:
+            return NotImplemented
+        return self.minor == other.minor and self.currency == other.currency
+
+    def __lt__(self, other):
+        return self.minor < self._other(other)
+
+    def __hash__(self):
+        return hash((self.minor, self.currency))
+
+    def __bool__(self):
+        return bool(self.minor)
+
+    def __str__(self):
+        return format_minor(self.minor, self.places)
+
+    def __repr__(self):
+        return f"Money('{self}', '{self.currency}')"
+
+
+class MoneyField(serializers.Field):
+    """An amount as a decimal string in the API (like ``DecimalField``) and ``Money`` in validated data"""
+    default_error_messages = {
+        'invalid': 'A valid amount is required.',
+        'max_digits': 'Ensure that there are no more than {max_digits} digits in total.',
+        'min_value': 'Ensure this value is greater than or equal to {min_value}.',
+    }
+
+    def __init__(self, max_digits=12, min_value=None, currency=None, **kwargs):
+        self.max_digits = max_digits
+        self.min_value = min_value
+        self.currency = currency
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('invalid')
+        try:
+            money = Money.parse(data, self.currency)
+        except InvalidAmount:
+            self.fail('invalid')
+        if abs(money.minor) >= _POWERS[self.max_digits]:
+            self.fail('max_digits', max_digits=self.max_digits)
+        if self.min_value is not None and money.minor < parse_minor(self.min_value, money.places):
+            self.fail('min_value', min_value=self.min_value)
+        return money
+
+    def to_representation(self, value):
+        # Model and aggregate values are Decimals already rounded half-even on save
+        return str(Money.parse(value, self.currency, rounding=HALF_EVEN))
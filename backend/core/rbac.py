@@ -0,0 +1,114 @@
+"""
+Effective permissions for the core RBAC models.
+
+A user's permissions in a branch are the codes of every permission granted
+to an active role assigned to them in that branch (``UserRole`` ->
+``Role`` -> ``RolePermission`` -> ``Permission``). Resolving that is a
+four-table join, so each (user, branch) is compiled once into a frozenset
+of codes and kept in a per-process LRU; checks are then a set lookup.
+
+Entries carry two versions from the shared cache (``core.versions``): a
+global one, bumped when roles, permissions or grants change, and one per
+user, bumped when that user's role assignments change. An entry is only
+served while both are current, so a bump drops stale sets in every process
+at once. The signal receivers in ``core.apps`` do the bumping. Writes that
+bypass signals (``QuerySet.update``, raw SQL) are picked up when the entry
+expires, ``RBAC_CACHE_TTL`` seconds after it was compiled.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import RolePermission
+from .versions import bump, current_many
+
+GLOBAL_VERSION_KEY = 'rbac-version'
+
+
+def _user_version_key(user_id):
+    return f'rbac-version:user:{user_id}'
+
+
+def invalidate_all():
+    """Call after any change to roles, permissions or role grants"""
+    bump(GLOBAL_VERSION_KEY)
+
+
+def invalidate_user(user_id):
+    """Call after a change to one user's role assignments"""
+    bump(_user_version_key(user_id))
+
+
+def versions(user_id):
+    user_key = _user_version_key(user_id)
+    found = current_many([GLOBAL_VERSION_KEY, user_key])
+    return found[GLOBAL_VERSION_KEY], found[user_key]
+
+
+def grants(user_id, branch_id):
+    """The grants behind a user's permissions in a branch (primary branch when ``None``)"""
+    queryset = RolePermission.objects.filter(role__userrole__user_id=user_id, role__is_active=True)
+    if branch_id is None:
+        return queryset.filter(role__userrole__is_primary=True)
+    return queryset.filter(role__userrole__branch_id=branch_id)
+
+
+def compile_permissions(user_id, branch_id):
+    """Resolve the permission codes for (user, branch) with one query"""
+    return frozenset(grants(user_id, branch_id).values_list('permission__code', flat=True))
+
+
+class PermissionCache:
+    """Thread-safe LRU of compiled permission sets with versioned invalidation and a TTL"""
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_max_size(self):
+        if self.max_size is not None:
+            return self.max_size
+        return getattr(settings, 'RBAC_CACHE_SIZE', 10000)
+
+    def get_ttl(self):
+        return getattr(settings, 'RBAC_CACHE_TTL', 300)
+
+    def permissions_for(self, user_id, branch_id=None):
+        version = versions(user_id)
+        key = (user_id, branch_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[2]
+
+        codes = compile_permissions(user_id, branch_id)
+        max_size = self.get_max_size()
+        expires = time.monotonic() + self.get_ttl()
+        with self._lock:
+            self._entries[key] = (version, expires, codes)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+        return codes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+permission_cache = PermissionCache()
+
+
+def effective_permissions(user):
+    """Permission codes for ``user`` in their current branch"""
+    return permission_cache.permissions_for(user.pk, user.current_branch_id)
+
+
+def has_permission(user, code):
+    if user.is_superuser:
+        return True
+    return code in effective_permissions(user)
@@ -0,0 +1,245 @@
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from orders.models import Order
+from users.models import User
+
+from . import idempotency
+from .checks import shared_cache_check
+from .management.commands import check_query_budgets
+from .money import (
+    HALF_EVEN, InvalidAmount, Money, MoneyField, div_round, format_minor, parse_minor, to_decimal,
+)
+from .models import IdempotencyKey
+
+
+class DivRoundTests(SimpleTestCase):
+
+    def test_half_up_rounds_ties_away_from_zero(self):
+        self.assertEqual(div_round(5, 2), 3)
+        self.assertEqual(div_round(15, 10), 2)
+        self.assertEqual(div_round(25, 10), 3)
+        self.assertEqual(div_round(-5, 2), -3)
+        self.assertEqual(div_round(-25, 10), -3)
+
+    def test_half_up_rounds_non_ties_to_nearest(self):
+        self.assertEqual(div_round(14, 10), 1)
+        self.assertEqual(div_round(16, 10), 2)
+        self.assertEqual(div_round(-14, 10), -1)
+        self.assertEqual(div_round(-16, 10), -2)
+
+    def test_half_even_rounds_ties_to_even(self):
+        self.assertEqual(div_round(5, 2, HALF_EVEN), 2)
+        self.assertEqual(div_round(15, 10, HALF_EVEN), 2)
+        self.assertEqual(div_round(25, 10, HALF_EVEN), 2)
+        self.assertEqual(div_round(-5, 2, HALF_EVEN), -2)
+        self.assertEqual(div_round(-15, 10, HALF_EVEN), -2)
+        self.assertEqual(div_round(-25, 10, HALF_EVEN), -2)
+
+    def test_half_even_rounds_non_ties_to_nearest(self):
+        self.assertEqual(div_round(26, 10, HALF_EVEN), 3)
+        self.assertEqual(div_round(-26, 10, HALF_EVEN), -3)
+        self.assertEqual(div_round(-24, 10, HALF_EVEN), -2)
+
+    def test_exact_and_zero(self):
+        for rounding in ('half_up', HALF_EVEN):
+            self.assertEqual(div_round(30, 10, rounding), 3)
+            self.assertEqual(div_round(-30, 10, rounding), -3)
+            self.assertEqual(div_round(0, 7, rounding), 0)
+
+    def test_matches_decimal_rounding(self):
+        for numerator in range(-300, 301):
+            for denominator in (1, 2, 3, 4, 10, 16, 20000):
+                exact = Decimal(numerator) / Decimal(denominator)
+                self.assertEqual(
+                    div_round(numerator, denominator),
+                    int(exact.to_integral_value(rounding='ROUND_HALF_UP')), (numerator, denominator),
+                )
+                self.assertEqual(
+                    div_round(numerator, denominator, HALF_EVEN),
+                    int(exact.to_integral_value(rounding='ROUND_HALF_EVEN')), (numerator, denominator),
+                )
+
+
+class ParseMinorTests(SimpleTestCase):
+
+    def test_string_fast_path(self):
+        self.assertEqual(parse_minor('10'), 1000)
+        self.assertEqual(parse_minor('10.5'), 1050)
+        self.assertEqual(parse_minor('10.05'), 1005)
+        self.assertEqual(parse_minor('-10.05'), -1005)
+        self.assertEqual(parse_minor('.5'), 50)
+        self.assertEqual(parse_minor('10.'), 1000)
+        self.assertEqual(parse_minor('0.250', 3), 250)
+
+    def test_strings_past_the_fast_path(self):
+        self.assertEqual(parse_minor(' 10.05 '), 1005)
+        self.assertEqual(parse_minor('1e2'), 10000)
+        self.assertEqual(parse_minor('1.5E-1'), 15)
+        self.assertEqual(parse_minor('+3.10'), 310)
+
+    def test_extra_places_round_half_up(self):
+        self.assertEqual(parse_minor('10.005'), 1001)
+        self.assertEqual(parse_minor('10.004'), 1000)
+        self.assertEqual(parse_minor('-10.005'), -1001)
+        self.assertEqual(parse_minor('0.0005', 3), 1)
+
+    def test_extra_places_round_half_even_on_request(self):
+        self.assertEqual(parse_minor('10.005', rounding=HALF_EVEN), 1000)
+        self.assertEqual(parse_minor('10.015', rounding=HALF_EVEN), 1002)
+        self.assertEqual(parse_minor(Decimal('-10.005'), rounding=HALF_EVEN), -1000)
+
+    def test_other_types(self):
+        self.assertEqual(parse_minor(7), 700)
+        self.assertEqual(parse_minor(-7, 3), -7000)
+        self.assertEqual(parse_minor(Decimal('1.23')), 123)
+        self.assertEqual(parse_minor(2.675), 268)
+        self.assertEqual(parse_minor(Money(42)), 42)
+
+    def test_rejects_what_is_not_an_amount(self):
+        for value in ('', '-', '.', 'abc', '1.2.3', '1,000', '12a', 'NaN', 'Infinity', '1e999999999',
+                      None, [1], {'amount': 1}, float('nan')):
+            with self.subTest(value=value), self.assertRaises(InvalidAmount):
+                parse_minor(value)
+
+    def test_round_trip(self):
+        for text in ('0.00', '10.05', '-0.50', '123456.78'):
+            self.assertEqual(format_minor(parse_minor(text)), text)
+            self.assertEqual(to_decimal(parse_minor(text)), Decimal(text))
+
+
+class MoneyTests(SimpleTestCase):
+
+    def test_scale_rounds_half_up(self):
+        self.assertEqual(Money(5).scale(1, 2), Money(3))
+        self.assertEqual(Money(-5).scale(1, 2), Money(-3))
+        self.assertEqual(Money(5).scale(1, 2, HALF_EVEN), Money(2))
+
+    def test_arithmetic_and_formatting(self):
+        self.assertEqual(sum([Money(105), Money(-5)]), Money(100))
+        self.assertEqual(str(Money(-1005)), '-10.05')
+        self.assertEqual(str(Money(5, 'JPY')), '5')
+        with self.assertRaises(ValueError):
+            Money(1, 'INR') + Money(1, 'USD')
+
+
+class MoneyFieldTests(SimpleTestCase):
+
+    def test_parses_to_money(self):
+        self.assertEqual(MoneyField().run_validation('10.005'), Money(1001))
+
+    def test_rejects_invalid_and_oversized(self):
+        for value in ('abc', True, '1000000000000', '1e999999999'):
+            with self.subTest(value=value), self.assertRaises(serializers.ValidationError):
+                MoneyField(max_digits=12).run_validation(value)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+
+    @override_settings(CACHE_SINGLE_PROCESS=False, CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    })
+    def test_process_local_cache_only_warns(self):
+        messages = shared_cache_check(None)
+        self.assertEqual([message.id for message in messages], ['core.W001'])
+        self.assertFalse(any(message.is_serious() for message in messages))
+
+    @override_settings(CACHE_SINGLE_PROCESS=True, CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    })
+    def test_single_process_is_quiet(self):
+        self.assertEqual(shared_cache_check(None), [])
+
+
+class IdempotencyKeyTests(TestCase):
+    INVOICE = {'items': [{'product_name': 'Milk', 'quantity': '1', 'unit_price': '50.00'}]}
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='Pw123456!xx',
+                                             organization_id='org1', role='owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, key='key-1', data=INVOICE):
+        return self.client.post('/api/invoices/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def claim(self, data=INVOICE):
+        """A key claimed by a first request that is still running"""
+        now = timezone.now()
+        request = SimpleNamespace(method='POST', path='/api/invoices/', data=data)
+        return IdempotencyKey.objects.create(
+            user=self.user, key='key-1', request_fingerprint=idempotency.fingerprint(request),
+            locked_at=now, expires_at=now + timedelta(hours=1),
+        )
+
+    def test_replay_returns_the_stored_response(self):
+        first, second = self.post(), self.post()
+        self.assertEqual(first.status_code, 201, first.content)
+        self.assertNotIn(idempotency.REPLAY_HEADER, first)
+        self.assertEqual((second.status_code, second[idempotency.REPLAY_HEADER]), (201, 'true'))
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.post(key='key-2').status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_key_reused_for_another_request(self):
+        self.post()
+        response = self.post(data={**self.INVOICE, 'notes': 'other'})
+        self.assertEqual(response.status_code, 422, response.content)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_duplicate_waits_for_the_first_request(self):
+        record = self.claim()
+
+        def first_request_finishes(seconds):
+            IdempotencyKey.objects.filter(pk=record.pk).update(
+                status='completed', response_status=201, response_body={'id': 'first'},
+            )
+
+        with mock.patch.object(idempotency.time, 'sleep', side_effect=first_request_finishes) as sleep:
+            response = self.post()
+        sleep.assert_called_once()
+        self.assertEqual((response.status_code, response.json()), (201, {'id': 'first'}))
+        self.assertEqual(response[idempotency.REPLAY_HEADER], 'true')
+        self.assertEqual(Order.objects.count(), 0)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_duplicate_gives_up_while_the_first_is_running(self):
+        self.claim()
+        self.assertEqual(self.post().status_code, 409)
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_expired_keys_run_again_and_are_purged(self):
+        first = self.post()
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        second = self.post()
+        self.assertEqual(second.status_code, 201)
+        self.assertNotIn(idempotency.REPLAY_HEADER, second)
+        self.assertNotEqual(second.json()['id'], first.json()['id'])
+        self.assertEqual(idempotency.purge_expired(), 0)
+        self.assertEqual(idempotency.purge_expired(timezone.now() + timedelta(days=2)), 1)
+
+    def test_response_is_stored_with_the_invoice(self):
+        with mock.patch.object(idempotency, '_complete', side_effect=DatabaseError('lost')):
+            with self.assertRaises(DatabaseError):
+                self.post()
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.post().status_code, 201)
+
+
+class QueryBudgetTests(TransactionTestCase):
+    """``manage.py check_query_budgets`` without the timings; commits like a real request would"""
+
+    def test_endpoints_stay_within_their_query_budgets(self):
+        results, failures = check_query_budgets.Command()._run(check_query_budgets.ENDPOINTS, repeat=1)
+        self.assertEqual(set(results), {endpoint[0] for endpoint in check_query_budgets.ENDPOINTS})
+        self.assertEqual(failures, {})
@@ -0,0 +1,46 @@
+"""
+Version stamps for per-process caches.
+
+Catalog lookups, prices, tax tables and permission sets are cached in each
+process and tagged with a version read from the shared Django cache. A write
+``bump``s the version and every process drops its entries on its next read.
+
+Versions are random tokens, not counters. A counter that was evicted or lost
+in a cache restart would start again at 1 and revive entries stored under the
+old 1, so a missing version is always replaced by one no process has seen.
+This only works across processes when ``CACHES`` is shared by all of them;
+``core.checks`` warns when it is not (see ``CACHE_SINGLE_PROCESS``).
+"""
+import secrets
+
+from django.core.cache import cache
+
+
+def _fresh():
+    return secrets.token_hex(8)
+
+
+def current(key):
+    """The version under ``key``; a fresh one if it was never set or was evicted"""
+    return current_many([key])[key]
+
+
+def current_many(keys):
+    """``{key: version}`` for ``keys`` in one cache round trip when all are set"""
+    found = cache.get_many(keys)
+    missing = [key for key in keys if found.get(key) is None]
+    if missing:
+        for key in missing:
+            # add, not set: if another process got there first, use its version
+            cache.add(key, _fresh(), timeout=None)
+        found.update(cache.get_many(missing))
+        for key in missing:
+            if found.get(key) is None:
+                # Not even kept long enough to read back: match nothing cached
+                found[key] = _fresh()
+    return {key: found[key] for key in keys}
+
+
+def bump(key):
+    """Retire everything cached under the current version of ``key``"""
+    cache.set(key, _fresh(), timeout=None)
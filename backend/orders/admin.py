@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Order, OrderItem
+from .rendering import unpin
 
 
 class OrderItemInline(admin.TabularInline):
@@ -33,6 +34,11 @@ class OrderAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change:
+            unpin(obj.pk)
+
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
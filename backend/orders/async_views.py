@@ -0,0 +1,70 @@
+"""
+Async versions of the invoice read endpoints and the dashboard.
+
+These serve the same data as ``InvoiceViewSet.list``/``stats`` but run
+natively under ASGI, with independent queries fanned out concurrently
+(see ``commerce_project.async_api``).
+"""
+from django.db.models import F
+
+from commerce_project.async_api import AsyncAPIView, gather, run_sync
+from products.models import Product
+from products.serializers import LowStockProductSerializer
+from .counters import get_stats, to_response
+from .invoice_views import invoice_queryset
+from .models import Order
+from .serializers import InvoiceReadSerializer, InvoiceStatsSerializer, RecentInvoiceSerializer
+
+DASHBOARD_LIMIT = 10
+MAX_DASHBOARD_LIMIT = 50
+
+
+class AsyncInvoiceListView(AsyncAPIView):
+    """Invoice list with the same filters and pages as ``GET /api/invoices/``"""
+
+    async def get(self, request):
+        queryset = await run_sync(invoice_queryset, request.user.organization_id, request.GET)
+        body = await self.paginate(queryset, lambda rows: InvoiceReadSerializer(rows, many=True).data)
+        return self.render(body)
+
+
+class AsyncInvoiceStatsView(AsyncAPIView):
+    """Same body as ``GET /api/invoices/stats/``"""
+
+    async def get(self, request):
+        stats = await run_sync(get_stats, request.user.organization_id)
+        return self.render(InvoiceStatsSerializer(to_response(stats)).data)
+
+
+def dashboard_loaders(organization_id, limit=DASHBOARD_LIMIT):
+    """The dashboard's independent queries, as zero-argument callables"""
+    low_stock = Product.objects.filter(
+        organization_id=organization_id, is_active=True,
+    ).with_current_stock().filter(
+        current_stock__lte=F('low_stock_threshold'),
+    ).order_by('current_stock', 'name')[:limit]
+    recent = Order.objects.filter(organization_id=organization_id).order_by('-created_at', '-id')[:limit]
+    return (lambda: get_stats(organization_id), lambda: list(low_stock), lambda: list(recent))
+
+
+def dashboard_body(stats, low_stock, recent):
+    return {
+        'stats': InvoiceStatsSerializer(to_response(stats)).data,
+        'low_stock': LowStockProductSerializer(low_stock, many=True).data,
+        'recent_invoices': RecentInvoiceSerializer(recent, many=True).data,
+    }
+
+
+class DashboardView(AsyncAPIView):
+    """
+    Invoice stats, low-stock products and recent invoices in one response,
+    loaded concurrently. ``?limit=`` caps both lists (default 10, max 50).
+    """
+
+    async def get(self, request):
+        try:
+            limit = min(max(int(request.GET.get('limit', DASHBOARD_LIMIT)), 1), MAX_DASHBOARD_LIMIT)
+        except ValueError:
+            limit = DASHBOARD_LIMIT
+        results = await gather(*dashboard_loaders(request.user.organization_id, limit))
+        return self.render(dashboard_body(*results))
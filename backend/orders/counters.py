@@ -0,0 +1,156 @@
+"""
+Invoice statistics.
+
+``aggregate_stats`` computes every dashboard figure in one conditional
+aggregation over ``Order``. With ``INVOICE_STATS_SOURCE = 'counters'`` the
+stats endpoint instead reads a single ``InvoiceCounters`` row per
+organization, which the invoice write paths keep current by applying the
+before/after difference of each order they touch inside their own
+transaction. ``manage.py reconcile_invoice_counters`` rebuilds the rows from
+scratch and reports drift.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from core.money import HALF_EVEN, Money, parse_minor, to_decimal
+from .models import InvoiceCounters, Order
+
+COUNTED_STATUSES = ('completed', 'partial', 'draft', 'cancelled')
+REVENUE_STATUSES = ('completed', 'partial')
+COUNTER_FIELDS = (
+    'total_count', 'completed_count', 'partial_count', 'draft_count',
+    'cancelled_count', 'total_revenue', 'total_billed',
+)
+MONEY_FIELDS = ('total_revenue', 'total_billed')
+
+
+def counters_enabled():
+    return getattr(settings, 'INVOICE_STATS_SOURCE', 'live') == 'counters'
+
+
+def stats_aggregates():
+    """Aggregate expressions shared by the live query and the reconcile pass"""
+    revenue = Q(status__in=REVENUE_STATUSES)
+    aggregates = {'total_count': Count('id')}
+    for status in COUNTED_STATUSES:
+        aggregates[f'{status}_count'] = Count('id', filter=Q(status=status))
+    aggregates['total_revenue'] = Sum('paid_amount', filter=revenue)
+    aggregates['total_billed'] = Sum('total', filter=revenue)
+    return aggregates
+
+
+def normalize_stats(values):
+    values = dict(values)
+    values['total_revenue'] = values.get('total_revenue') or Decimal('0')
+    values['total_billed'] = values.get('total_billed') or Decimal('0')
+    return values
+
+
+def aggregate_stats(queryset):
+    """All counters for ``queryset`` in a single query"""
+    return normalize_stats(queryset.aggregate(**stats_aggregates()))
+
+
+def to_response(values):
+    """Shape counter values for ``InvoiceStatsSerializer``"""
+    return {
+        'total_count': values['total_count'],
+        'completed_count': values['completed_count'],
+        'partial_count': values['partial_count'],
+        'draft_count': values['draft_count'],
+        'cancelled_count': values['cancelled_count'],
+        'total_revenue': values['total_revenue'],
+        'total_outstanding': (
+            Money.parse(values['total_billed'], rounding=HALF_EVEN)
+            - Money.parse(values['total_revenue'], rounding=HALF_EVEN)
+        ),
+    }
+
+
+def snapshot(order):
+    """The parts of an order that feed the counters"""
+    if order is None:
+        return None
+    return (order.status, order.paid_amount, order.total)
+
+
+def _contribution(state):
+    values = dict.fromkeys(COUNTER_FIELDS, 0)
+    if state is None:
+        return values
+    status, paid_amount, total = state
+    values['total_count'] = 1
+    if status in COUNTED_STATUSES:
+        values[f'{status}_count'] = 1
+    if status in REVENUE_STATUSES:
+        # In paise, rounded the way DecimalField rounds on save, so the
+        # deltas match what ends up in the Order row
+        values['total_revenue'] = parse_minor(paid_amount, rounding=HALF_EVEN)
+        values['total_billed'] = parse_minor(total, rounding=HALF_EVEN)
+    return values
+
+
+def create_counters(organization_id):
+    """Build a missing row from ``Order``; raises IntegrityError if it exists"""
+    values = aggregate_stats(Order.objects.filter(organization_id=organization_id))
+    with transaction.atomic():
+        return InvoiceCounters.objects.create(organization_id=organization_id, **values)
+
+
+def record_change(organization_id, before, after):
+    """
+    Apply the difference between two ``snapshot`` values to the counters.
+
+    Call inside the transaction that writes the order. Does nothing unless
+    the counters mode is enabled.
+    """
+    record_changes(organization_id, [(before, after)])
+
+
+def record_changes(organization_id, changes):
+    """``record_change`` for many (before, after) pairs with a single UPDATE"""
+    if not counters_enabled():
+        return
+    deltas = dict.fromkeys(COUNTER_FIELDS, 0)
+    for before, after in changes:
+        if before == after:
+            continue
+        old, new = _contribution(before), _contribution(after)
+        for field in COUNTER_FIELDS:
+            deltas[field] += new[field] - old[field]
+    for field in MONEY_FIELDS:
+        deltas[field] = to_decimal(deltas[field])
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not updates:
+        return
+    with transaction.atomic():
+        updated = InvoiceCounters.objects.filter(organization_id=organization_id).update(
+            updated_at=timezone.now(), **updates
+        )
+        if updated:
+            return
+        try:
+            # First write since the mode was enabled: the new row is built
+            # from Order, which already includes this transaction's change
+            create_counters(organization_id)
+        except IntegrityError:
+            InvoiceCounters.objects.filter(organization_id=organization_id).update(
+                updated_at=timezone.now(), **updates
+            )
+
+
+def get_stats(organization_id):
+    """Dashboard stats from whichever source is configured"""
+    if not counters_enabled():
+        return aggregate_stats(Order.objects.filter(organization_id=organization_id))
+    counters = InvoiceCounters.objects.filter(organization_id=organization_id).first()
+    if counters is None:
+        try:
+            counters = create_counters(organization_id)
+        except IntegrityError:
+            counters = InvoiceCounters.objects.get(organization_id=organization_id)
+    return {field: getattr(counters, field) for field in COUNTER_FIELDS}
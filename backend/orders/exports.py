@@ -0,0 +1,92 @@
+"""
+Streaming invoice exports.
+
+* ``csv`` - one row per invoice
+* ``ndjson`` - one JSON object per invoice with its items nested
+* ``items-csv`` - one row per line item, with the invoice columns repeated
+
+Rows are read with ``QuerySet.iterator`` in chunks of ``EXPORT_CHUNK_SIZE``
+(a server-side cursor on PostgreSQL); for ``ndjson`` the items are prefetched
+per chunk. The header line is yielded before the first query runs, so the
+response starts straight away and memory stays bounded by one chunk.
+"""
+import csv
+import json
+from decimal import Decimal
+
+from commerce_project.streaming import Echo
+
+from .models import OrderItem
+
+EXPORT_CHUNK_SIZE = 1000
+FORMATS = ('csv', 'ndjson', 'items-csv')
+
+INVOICE_FIELDS = (
+    'id', 'invoice_number', 'invoice_type', 'status', 'branch_id', 'customer_id',
+    'subtotal', 'discount_amount', 'tax_amount', 'total', 'paid_amount',
+    'notes', 'created_by_id', 'created_at',
+)
+ITEM_FIELDS = (
+    'id', 'product_id', 'product_name', 'quantity', 'unit_price',
+    'discount_amount', 'tax_rate', 'tax_amount', 'total',
+)
+ITEM_INVOICE_FIELDS = ('invoice_number', 'status', 'customer_id', 'created_at')
+
+
+def _json_value(value):
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (int, Decimal, str)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _invoice_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(INVOICE_FIELDS)
+    rows = queryset.prefetch_related(None).values_list(*INVOICE_FIELDS)
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def _invoice_ndjson(queryset):
+    queryset = queryset.prefetch_related(None).prefetch_related('items')
+    for order in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        record = {field: _json_value(getattr(order, field)) for field in INVOICE_FIELDS}
+        record['items'] = [
+            {field: _json_value(getattr(item, field)) for field in ITEM_FIELDS}
+            for item in order.items.all()
+        ]
+        yield json.dumps(record) + '\n'
+
+
+def _items_csv(queryset):
+    writer = csv.writer(Echo())
+    header = [f'invoice_{field}' if field != 'invoice_number' else field for field in ITEM_INVOICE_FIELDS]
+    yield writer.writerow(header + [f'item_{field}' if field == 'id' else field for field in ITEM_FIELDS])
+    orders = queryset.prefetch_related(None).order_by().values('pk')
+    columns = [f'order__{field}' for field in ITEM_INVOICE_FIELDS] + list(ITEM_FIELDS)
+    rows = OrderItem.objects.filter(order__in=orders).order_by(
+        'order__created_at', 'order_id'
+    ).values_list(*columns)
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def export_lines(queryset, file_format):
+    """Yield the invoices in ``queryset`` line by line"""
+    if file_format == 'ndjson':
+        return _invoice_ndjson(queryset)
+    if file_format == 'items-csv':
+        return _items_csv(queryset)
+    return _invoice_csv(queryset)
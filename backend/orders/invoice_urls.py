@@ -1,8 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .async_views import AsyncInvoiceListView, AsyncInvoiceStatsView
 from .invoice_views import InvoiceViewSet
 
 router = DefaultRouter()
 router.register(r'', InvoiceViewSet, basename='invoice')
 
-urlpatterns = router.urls
+# Ahead of the router, whose detail route would take "async" for a pk
+urlpatterns = [
+    path('async/', AsyncInvoiceListView.as_view(), name='invoice-list-async'),
+    path('async/stats/', AsyncInvoiceStatsView.as_view(), name='invoice-stats-async'),
+] + router.urls
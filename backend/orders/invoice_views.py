@@ -1,19 +1,84 @@
 import uuid
-from decimal import Decimal
-from datetime import datetime
+from django.conf import settings
 from django.db import transaction
-from django.db.models import Sum, Q, Count
+from django.http import FileResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.negotiation import BaseContentNegotiation
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Order, OrderItem
+from core.idempotency import idempotent, store_response
+from core.jobs import enqueue
+from core.money import HALF_EVEN, InvalidAmount, Money
+from products import pricing, tax
+from .models import Order
+from .sequences import next_invoice_number
+from .counters import get_stats, to_response
+from .exports import FORMATS as EXPORT_FORMATS, export_lines
+from .jobs import SEND_INVOICE_EMAIL
+from .rendering import FORMATS as DOCUMENT_FORMATS, cache_path, render_invoice, unpin
+from .rollups import report
+from .search import search_invoices
+from .tracking import record_change, snapshot
+from .services import PhaseTimer, create_invoice, reverse_stock
+from .sync import sync_invoices
 from .serializers import (
-    InvoiceSerializer, CreateInvoiceSerializer, 
-    InvoiceStatsSerializer, PaymentSerializer
+    InvoiceSerializer, InvoiceReadSerializer, CreateInvoiceSerializer, InvoiceSyncSerializer,
+    InvoiceStatsSerializer, PaymentSerializer, SendInvoiceEmailSerializer,
+    SalesReportQuerySerializer, SalesReportRowSerializer
 )
 
 
+def invoice_queryset(organization_id, params):
+    """The organization's invoices, newest first, narrowed by the list filters in ``params``"""
+    queryset = Order.objects.filter(
+        organization_id=organization_id
+    ).prefetch_related('items').order_by('-created_at', '-id')
+    
+    # Apply filters
+    search = params.get('search', None)
+    if search:
+        queryset = search_invoices(queryset, search)
+    
+    invoice_status = params.get('status', None)
+    if invoice_status:
+        queryset = queryset.filter(status=invoice_status)
+    
+    invoice_type = params.get('invoice_type', None)
+    if invoice_type:
+        queryset = queryset.filter(invoice_type=invoice_type)
+    
+    customer_id = params.get('customer_id', None)
+    if customer_id:
+        queryset = queryset.filter(customer_id=customer_id)
+    
+    start_date = params.get('start_date', None)
+    if start_date:
+        queryset = queryset.filter(created_at__gte=start_date)
+    
+    end_date = params.get('end_date', None)
+    if end_date:
+        queryset = queryset.filter(created_at__lte=end_date)
+    
+    return queryset
+
+
+class DocumentNegotiation(BaseContentNegotiation):
+    """
+    The document endpoint picks its format from ?file_format=, so a browser's
+    ``Accept: application/pdf`` must not turn its responses into a 406
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
 class InvoiceViewSet(viewsets.ModelViewSet):
     """
     ViewSet for invoice operations (using Order model)
@@ -22,158 +87,99 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
     
+    def get_serializer_class(self):
+        # Reads use the precompiled serializer; writes keep the ModelSerializer
+        if self.action in ('list', 'retrieve'):
+            return InvoiceReadSerializer
+        return InvoiceSerializer
+    
     def get_queryset(self):
         """Filter invoices by user's organization"""
-        queryset = Order.objects.filter(
-            organization_id=self.request.user.organization_id
-        ).prefetch_related('items').order_by('-created_at')
-        
-        # Apply filters
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(invoice_number__icontains=search) |
-                Q(customer_id__icontains=search) |
-                Q(notes__icontains=search)
-            )
-        
-        invoice_status = self.request.query_params.get('status', None)
-        if invoice_status:
-            queryset = queryset.filter(status=invoice_status)
-        
-        invoice_type = self.request.query_params.get('invoice_type', None)
-        if invoice_type:
-            queryset = queryset.filter(invoice_type=invoice_type)
-        
-        customer_id = self.request.query_params.get('customer_id', None)
-        if customer_id:
-            queryset = queryset.filter(customer_id=customer_id)
-        
-        start_date = self.request.query_params.get('start_date', None)
-        if start_date:
-            queryset = queryset.filter(created_at__gte=start_date)
-        
-        end_date = self.request.query_params.get('end_date', None)
-        if end_date:
-            queryset = queryset.filter(created_at__lte=end_date)
-        
-        return queryset
+        return invoice_queryset(self.request.user.organization_id, self.request.query_params)
     
-    @transaction.atomic
+    @idempotent
     def create(self, request, *args, **kwargs):
         """Create a new invoice with items and optional payments"""
         serializer = CreateInvoiceSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         data = serializer.validated_data
-        items_data = data.pop('items', [])
-        payments_data = data.pop('payments', [])
         
-        # Generate invoice number
-        invoice_number = self._generate_invoice_number()
+        # Allocated outside the invoice transaction so the counter row is not
+        # locked while the rest of the invoice is written
+        timer = PhaseTimer()
+        with timer.phase('number'):
+            invoice_number = self._generate_invoice_number(data.get('branch_id', ''))
         
-        # Calculate totals
-        subtotal = Decimal('0')
-        total_tax = Decimal('0')
-        
-        # Process items to calculate totals
-        processed_items = []
-        for item_data in items_data:
-            quantity = Decimal(str(item_data.get('quantity', 1)))
-            unit_price = Decimal(str(item_data.get('unit_price', 0)))
-            discount = Decimal(str(item_data.get('discount_amount', 0)))
-            
-            item_subtotal = (quantity * unit_price) - discount
-            # Assuming 18% GST for now (could be configurable)
-            tax_rate = Decimal('18')
-            tax_amount = item_subtotal * tax_rate / Decimal('100')
-            item_total = item_subtotal + tax_amount
+        with transaction.atomic():
+            order = create_invoice(request.user, data, invoice_number, timer=timer)
+            record_change(order.organization_id, None, snapshot(order))
             
-            processed_items.append({
-                **item_data,
-                'tax_rate': tax_rate,
-                'tax_amount': tax_amount,
-                'total': item_total
-            })
+            with timer.phase('serialize'):
+                response_serializer = InvoiceSerializer(order)
+                response_data = response_serializer.data
             
-            subtotal += item_subtotal
-            total_tax += tax_amount
-        
-        discount_amount = Decimal(str(data.get('discount_amount', 0)))
-        total = subtotal + total_tax
+            # Kept with the key only if the invoice commits
+            response = Response(response_data, status=status.HTTP_201_CREATED)
+            store_response(request, response)
         
-        # Calculate paid amount from payments
-        paid_amount = sum(Decimal(str(p.get('amount', 0))) for p in payments_data)
-        
-        # Determine status
-        if paid_amount == 0:
-            order_status = 'draft'
-        elif paid_amount >= total:
-            order_status = 'completed'
-        else:
-            order_status = 'partial'
+        response['Server-Timing'] = timer.server_timing()
+        return response
+    
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """Store a batch of invoices captured offline, skipping ones already synced"""
+        serializer = InvoiceSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
-        # Create order (invoice)
-        order = Order.objects.create(
-            organization_id=request.user.organization_id,
-            created_by=request.user,
-            branch_id=data.get('branch_id', ''),
-            customer_id=data.get('customer_id', ''),
-            invoice_number=invoice_number,
-            invoice_type=data.get('invoice_type', 'sale'),
-            subtotal=subtotal,
-            discount_amount=discount_amount,
-            tax_amount=total_tax,
-            total=total,
-            paid_amount=paid_amount,
-            status=order_status,
-            notes=data.get('notes', '')
+        timer = PhaseTimer()
+        results, summary = sync_invoices(
+            request.user, serializer.validated_data['invoices'], timer=timer
         )
         
-        # Create order items
-        for item_data in processed_items:
-            OrderItem.objects.create(
-                order=order,
-                product_id=item_data.get('product_id'),
-                product_name=item_data.get('product_name', ''),
-                quantity=item_data.get('quantity'),
-                unit_price=item_data.get('unit_price'),
-                discount_amount=item_data.get('discount_amount', 0),
-                tax_rate=item_data.get('tax_rate', 0),
-                tax_amount=item_data.get('tax_amount', 0),
-                total=item_data.get('total')
-            )
-        
-        # Note: Payments would be stored in a Payment model if it exists
-        # For now, we'll just track paid_amount in the Order
-        
-        response_serializer = InvoiceSerializer(order)
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+        response = Response({**summary, 'results': results})
+        response['Server-Timing'] = timer.server_timing()
+        return response
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def add_payment(self, request, pk=None):
         """Add a payment to an existing invoice"""
         invoice = self.get_object()
         
-        amount = Decimal(str(request.data.get('amount', 0)))
+        with transaction.atomic():
+            invoice = self._lock_invoice(invoice)
+            before = snapshot(invoice)
+            self._apply_payment(invoice, request)
+            record_change(invoice.organization_id, before, snapshot(invoice))
+            unpin(invoice.id)
+            
+            # Note: If Payment model exists, create payment record here
+            
+            serializer = InvoiceSerializer(invoice)
+            response = Response(serializer.data)
+            store_response(request, response)
+        return response
+    
+    def _apply_payment(self, invoice, request):
+        try:
+            amount = Money.parse(request.data.get('amount', 0))
+        except InvalidAmount:
+            raise ValidationError({'amount': ['A valid amount is required.']})
         method = request.data.get('method', 'cash')
         reference = request.data.get('reference', '')
         
         # Update paid amount
-        invoice.paid_amount += amount
+        paid_amount = Money.parse(invoice.paid_amount, rounding=HALF_EVEN) + amount
+        invoice.paid_amount = paid_amount.to_decimal()
         
         # Update status based on payment
-        if invoice.paid_amount >= invoice.total:
+        if paid_amount >= Money.parse(invoice.total, rounding=HALF_EVEN):
             invoice.status = 'completed'
-        elif invoice.paid_amount > 0:
+        elif paid_amount.minor > 0:
             invoice.status = 'partial'
         
         invoice.save()
-        
-        # Note: If Payment model exists, create payment record here
-        
-        serializer = InvoiceSerializer(invoice)
-        return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -181,10 +187,16 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         invoice = self.get_object()
         reason = request.data.get('reason', '')
         
-        invoice.status = 'cancelled'
-        if reason:
-            invoice.notes = f"{invoice.notes}\nCancelled: {reason}" if invoice.notes else f"Cancelled: {reason}"
-        invoice.save()
+        with transaction.atomic():
+            invoice = self._lock_invoice(invoice)
+            before = snapshot(invoice)
+            invoice.status = 'cancelled'
+            if reason:
+                invoice.notes = f"{invoice.notes}\nCancelled: {reason}" if invoice.notes else f"Cancelled: {reason}"
+            invoice.save()
+            reverse_stock(invoice, note='Invoice cancelled')
+            record_change(invoice.organization_id, before, snapshot(invoice))
+            unpin(invoice.id)
         
         serializer = InvoiceSerializer(invoice)
         return Response(serializer.data)
@@ -192,99 +204,160 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get invoice statistics for the organization"""
-        queryset = Order.objects.filter(
-            organization_id=request.user.organization_id
-        )
+        stats_data = to_response(get_stats(request.user.organization_id))
         
-        total_count = queryset.count()
-        completed_count = queryset.filter(status='completed').count()
-        partial_count = queryset.filter(status='partial').count()
-        draft_count = queryset.filter(status='draft').count()
-        cancelled_count = queryset.filter(status='cancelled').count()
+        serializer = InvoiceStatsSerializer(stats_data)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream the filtered invoices as csv (default), ndjson or items-csv
+        (?file_format=). Accepts the same filters as the list endpoint.
+        """
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {'file_format': [f"Must be one of: {', '.join(EXPORT_FORMATS)}."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Calculate revenue (completed + partial payments)
-        revenue_data = queryset.filter(
-            status__in=['completed', 'partial']
-        ).aggregate(
-            total_revenue=Sum('paid_amount'),
-            total_billed=Sum('total')
+        queryset = self.filter_queryset(self.get_queryset())
+        content_type = 'application/x-ndjson' if file_format == 'ndjson' else 'text/csv'
+        extension = 'ndjson' if file_format == 'ndjson' else 'csv'
+        response = StreamingHttpResponse(export_lines(queryset, file_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="invoices-{file_format}.{extension}"'
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def reports(self, request):
+        """Sales totals per hour, day or month, served from the rollup tables"""
+        query = SalesReportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        
+        rows, totals = report(
+            request.user.organization_id,
+            params['start_date'],
+            params['end_date'],
+            granularity=params['granularity'],
+            branch_id=params.get('branch_id'),
         )
         
-        total_revenue = revenue_data['total_revenue'] or Decimal('0')
-        total_billed = revenue_data['total_billed'] or Decimal('0')
-        total_outstanding = total_billed - total_revenue
-        
-        stats_data = {
-            'total_count': total_count,
-            'completed_count': completed_count,
-            'partial_count': partial_count,
-            'draft_count': draft_count,
-            'cancelled_count': cancelled_count,
-            'total_revenue': total_revenue,
-            'total_outstanding': total_outstanding,
-        }
-        
-        serializer = InvoiceStatsSerializer(stats_data)
-        return Response(serializer.data)
+        return Response({
+            'start_date': params['start_date'],
+            'end_date': params['end_date'],
+            'granularity': params['granularity'],
+            'totals': SalesReportRowSerializer(totals).data,
+            'results': SalesReportRowSerializer(rows, many=True).data,
+        })
     
     @action(detail=False, methods=['post'])
     def validate(self, request):
-        """Validate invoice totals (server-side calculation)"""
+        """
+        Validate invoice totals (server-side calculation): the lines are
+        priced from the catalog (``products.pricing``) and every line whose
+        sent price, name or product differs is listed in ``discrepancies``
+        """
         serializer = CreateInvoiceSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         data = serializer.validated_data
-        items_data = data.get('items', [])
-        
-        # Calculate totals
-        subtotal = Decimal('0')
-        total_tax = Decimal('0')
-        
-        for item_data in items_data:
-            quantity = Decimal(str(item_data.get('quantity', 1)))
-            unit_price = Decimal(str(item_data.get('unit_price', 0)))
-            discount = Decimal(str(item_data.get('discount_amount', 0)))
-            
-            item_subtotal = (quantity * unit_price) - discount
-            tax_rate = Decimal('18')  # Default GST
-            tax_amount = item_subtotal * tax_rate / Decimal('100')
-            
-            subtotal += item_subtotal
-            total_tax += tax_amount
-        
-        total = subtotal + total_tax
+        organization_id = request.user.organization_id
+        items = data.get('items', [])
+        lines, discrepancies = pricing.resolve(
+            items, pricing.catalog_prices(organization_id, items),
+            pricing.price_list(data['invoice_type'], data.get('customer_tier', ''))
+        )
+        # The totals create would charge
+        _, totals = tax.price_lines(
+            tax.rate_table(organization_id), lines if settings.INVOICE_PRICING == 'catalog' else items,
+            inter_state=data['supply_type'] == 'inter_state'
+        )
         
         return Response({
-            'valid': True,
-            'calculated_subtotal': subtotal,
-            'calculated_tax': total_tax,
-            'calculated_total': total,
+            'valid': not discrepancies,
+            'discrepancies': discrepancies,
+            'calculated_subtotal': totals['subtotal'].to_decimal(),
+            'calculated_tax': totals['tax_amount'].to_decimal(),
+            'calculated_cgst': totals['cgst_amount'].to_decimal(),
+            'calculated_sgst': totals['sgst_amount'].to_decimal(),
+            'calculated_igst': totals['igst_amount'].to_decimal(),
+            'calculated_total': totals['total'].to_decimal(),
         })
     
     @action(detail=True, methods=['post'])
     def send_email(self, request, pk=None):
-        """Send invoice via email (placeholder for future implementation)"""
+        """Queue the invoice email; a run_jobs worker sends it"""
         invoice = self.get_object()
-        email = request.data.get('email', '')
+        serializer = SendInvoiceEmailSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        email = serializer.validated_data['email']
         
-        # TODO: Implement email sending logic
-        # For now, just return success
+        job = enqueue(
+            SEND_INVOICE_EMAIL,
+            {'organization_id': invoice.organization_id, 'invoice_id': str(invoice.id), 'email': email},
+            organization_id=invoice.organization_id,
+        )
         
         return Response({
-            'message': f'Invoice {invoice.invoice_number} would be sent to {email}',
-            'success': True
-        })
+            'message': f'Invoice {invoice.invoice_number} queued for sending to {email}',
+            'success': True,
+            'job_id': job.id,
+        }, status=status.HTTP_202_ACCEPTED)
     
-    def _generate_invoice_number(self):
-        """Generate a unique invoice number"""
-        # Format: INV-YYYYMMDD-XXXX
-        today = datetime.now().strftime('%Y%m%d')
-        
-        # Count invoices created today
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        count = Order.objects.filter(
-            created_at__gte=today_start,
-            organization_id=self.request.user.organization_id
-        ).count() + 1
+    @action(detail=True, methods=['get'], content_negotiation_class=DocumentNegotiation)
+    def document(self, request, pk=None):
+        """
+        The invoice as a PDF (default) or HTML document (?file_format=), from
+        the render cache. The ETag is the content hash.
+        """
+        file_format = request.query_params.get('file_format', 'pdf')
+        if file_format not in DOCUMENT_FORMATS:
+            return Response(
+                {'file_format': [f"Must be one of: {', '.join(DOCUMENT_FORMATS)}."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return f"INV-{today}-{count:04d}"
+        # Items are only loaded if the document has to be rendered
+        invoice = get_object_or_404(
+            Order.objects.select_related('created_by'),
+            organization_id=request.user.organization_id, pk=pk
+        )
+        digest = render_invoice(invoice, file_format)
+        etag = f'"{digest}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            extension, content_type = DOCUMENT_FORMATS[file_format]
+            response = FileResponse(
+                open(cache_path(digest, file_format), 'rb'), content_type=content_type,
+                filename=f'{invoice.invoice_number}.{extension}'
+            )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            before = snapshot(self._lock_invoice(serializer.instance))
+            invoice = serializer.save()
+            record_change(invoice.organization_id, before, snapshot(invoice))
+            unpin(invoice.id)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            before = snapshot(self._lock_invoice(instance))
+            # Deleting would leave its ledger movements pointing at no order
+            if instance.stock_movements.exists():
+                raise ValidationError({'detail': 'This invoice has moved stock; cancel it instead.'})
+            instance.delete()
+            record_change(instance.organization_id, before, None)
+    
+    def _lock_invoice(self, invoice):
+        """Re-read the invoice under a row lock so concurrent writes serialize"""
+        return Order.objects.select_for_update().get(pk=invoice.pk)
+    
+    def _generate_invoice_number(self, branch_id=''):
+        """Allocate the next INV-YYYYMMDD-XXXX number for the organization"""
+        return next_invoice_number(self.request.user.organization_id, branch_id)
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.mail import EmailMessage
+
+from core.jobs import register
+from .models import Order
+from .rendering import cache_path, render_invoice
+
+SEND_INVOICE_EMAIL = 'orders.send_invoice_email'
+
+
+@register(SEND_INVOICE_EMAIL)
+def send_invoice_email(organization_id, invoice_id, email):
+    invoice = Order.objects.select_related('created_by').prefetch_related('items').get(
+        organization_id=organization_id, id=invoice_id
+    )
+    lines = [f"Invoice {invoice.invoice_number}", f"Date: {invoice.created_at:%Y-%m-%d}", '']
+    for item in invoice.items.all():
+        lines.append(f"{item.product_name}  {item.quantity} x {item.unit_price} = {item.total}")
+    lines += [
+        '',
+        f"Subtotal: {invoice.subtotal}",
+        f"Discount: {invoice.discount_amount}",
+        f"Tax: {invoice.tax_amount}",
+        f"Total: {invoice.total}",
+        f"Paid: {invoice.paid_amount}",
+    ]
+    message = EmailMessage(
+        subject=f"Invoice {invoice.invoice_number}",
+        body='\n'.join(lines),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email],
+    )
+    with open(cache_path(render_invoice(invoice, 'pdf'), 'pdf'), 'rb') as document:
+        message.attach(f"{invoice.invoice_number}.pdf", document.read(), 'application/pdf')
+    message.send()
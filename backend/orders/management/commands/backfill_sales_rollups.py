@@ -0,0 +1,32 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import Order
+from orders.rollups import backfill
+
+
+def _date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily and hourly sales rollups from Order'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', help='Only rebuild this organization_id')
+        parser.add_argument('--start-date', type=_date, help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end-date', type=_date, help='Last day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options['organization']:
+            orders = orders.filter(organization_id=options['organization'])
+
+        daily, hourly = backfill(orders, options['start_date'], options['end_date'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {daily} daily and {hourly} hourly rollup rows"
+        ))
@@ -0,0 +1,197 @@
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import path
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from commerce_project.metrics import observe_queries
+from commerce_project.urls import urlpatterns as project_urlpatterns
+from orders.async_views import dashboard_body, dashboard_loaders
+from orders.models import Order
+from products.models import Product
+from users.authentication import ClaimsTokenObtainPairSerializer
+
+User = get_user_model()
+
+SEQUENTIAL_PATH = '/bench/sequential-dashboard/'
+ASYNC_PATH = '/api/dashboard/'
+
+
+class SequentialDashboardView(APIView):
+    """The dashboard as a DRF view: the same queries, one after another"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        loaders = dashboard_loaders(request.user.organization_id)
+        return Response(dashboard_body(*(load() for load in loaders)))
+
+
+# Mounted with ROOT_URLCONF pointing at this module while the benchmark runs
+urlpatterns = [
+    path(SEQUENTIAL_PATH.strip('/') + '/', SequentialDashboardView.as_view()),
+] + project_urlpatterns
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.queries = 0
+        self.statuses = set()
+        self.lock = threading.Lock()
+
+    def add(self, latency, status):
+        with self.lock:
+            self.latencies.append(latency)
+            self.statuses.add(status)
+
+    def count_query(self, execute, sql, params, many, context):
+        with self.lock:
+            self.queries += 1
+        return execute(sql, params, many, context)
+
+    def percentile(self, fraction):
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Dashboard loads under concurrent clients: sync WSGI threads vs async ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200, help='Concurrent dashboard clients')
+        parser.add_argument('--loads', type=int, default=5, help='Dashboard loads per client')
+        parser.add_argument('--wsgi-threads', type=int, default=1,
+                            help='Request threads of the simulated WSGI server; the Procfile runs '
+                                 "gunicorn's default of one sync worker with one thread")
+        parser.add_argument('--db-latency-ms', type=float, default=2.0,
+                            help='Round trip added to every query, as to a database over the network')
+        parser.add_argument('--invoices', type=int, default=500)
+        parser.add_argument('--products', type=int, default=200)
+
+    def handle(self, *args, **options):
+        organization_id = f"bench-{uuid.uuid4()}"
+        user = User.objects.create_user(
+            email=f"{organization_id}@bench.local",
+            password=None,
+            organization_id=organization_id,
+        )
+        try:
+            Product.objects.bulk_create([
+                Product(organization_id=organization_id, name=f"Bench product {n}",
+                        sku=f"{organization_id}-{n}", base_price='10.00', stock_quantity=n % 40)
+                for n in range(options['products'])
+            ])
+            Order.objects.bulk_create([
+                Order(organization_id=organization_id, created_by=user, invoice_number=f"BENCH-{n}",
+                      subtotal='500.00', tax_amount='90.00', total='590.00', paid_amount='590.00',
+                      status='completed' if n % 5 else 'partial')
+                for n in range(options['invoices'])
+            ])
+            token = f"Bearer {ClaimsTokenObtainPairSerializer.get_token(user).access_token}"
+            latency = options['db_latency_ms'] / 1000
+
+            def slow_network(execute, sql, params, many, context):
+                time.sleep(latency)
+                return execute(sql, params, many, context)
+
+            # The async test client always sends Host: testserver
+            with override_settings(ROOT_URLCONF=__name__, ALLOWED_HOSTS=['testserver']):
+                sync_body = Client().get(
+                    SEQUENTIAL_PATH, secure=True, HTTP_AUTHORIZATION=token
+                ).json()
+                async_body = Client().get(
+                    ASYNC_PATH, secure=True, HTTP_AUTHORIZATION=token
+                ).json()
+                if sync_body != async_body:
+                    raise CommandError('The sequential and concurrent dashboards disagree')
+
+                scenarios = [
+                    ('WSGI, sync view', self.run_wsgi, SEQUENTIAL_PATH),
+                    ('ASGI, sync view', self.run_asgi, SEQUENTIAL_PATH),
+                    ('ASGI, async view', self.run_asgi, ASYNC_PATH),
+                ]
+                self.stdout.write(
+                    f"{options['clients']} clients x {options['loads']} loads, "
+                    f"{options['db_latency_ms']}ms per query, {options['wsgi_threads']} WSGI threads"
+                )
+                for label, run, url in scenarios:
+                    stats = Stats()
+                    with observe_queries(slow_network), observe_queries(stats.count_query):
+                        started = time.perf_counter()
+                        run(url, token, stats, options)
+                        elapsed = time.perf_counter() - started
+                    if stats.statuses != {200}:
+                        raise CommandError(f"{label}: unexpected statuses {sorted(stats.statuses)}")
+                    loads = len(stats.latencies)
+                    self.stdout.write(
+                        f"{label:>18}: {loads / elapsed:8.1f} loads/s  "
+                        f"p50 {stats.percentile(0.5) * 1000:7.1f}ms  "
+                        f"p95 {stats.percentile(0.95) * 1000:7.1f}ms  "
+                        f"p99 {stats.percentile(0.99) * 1000:7.1f}ms  "
+                        f"{stats.queries / loads:.1f} queries/load"
+                    )
+        finally:
+            Order.objects.filter(organization_id=organization_id).delete()
+            Product.objects.filter(organization_id=organization_id).delete()
+            user.delete()
+
+    def run_wsgi(self, url, token, stats, options):
+        # Server threads take requests first come, first served from the
+        # listen queue; client threads wait for their response
+        backlog = queue.Queue()
+
+        def server():
+            http = Client()
+            while (request := backlog.get()) is not None:
+                done, response = request
+                response.append(http.get(url, secure=True, HTTP_AUTHORIZATION=token))
+                done.set()
+
+        def client():
+            go.wait()
+            for _ in range(options['loads']):
+                started = time.perf_counter()
+                done, response = threading.Event(), []
+                backlog.put((done, response))
+                done.wait()
+                stats.add(time.perf_counter() - started, response[0].status_code)
+
+        go = threading.Event()
+        # Threads start with an empty context: hand the servers the query wrappers
+        servers = [threading.Thread(target=contextvars.copy_context().run, args=(server,))
+                   for _ in range(options['wsgi_threads'])]
+        clients = [threading.Thread(target=client) for _ in range(options['clients'])]
+        for thread in servers + clients:
+            thread.start()
+        go.set()
+        for thread in clients:
+            thread.join()
+        for _ in servers:
+            backlog.put(None)
+        for thread in servers:
+            thread.join()
+
+    def run_asgi(self, url, token, stats, options):
+        async def client():
+            http = AsyncClient()
+            for _ in range(options['loads']):
+                started = time.perf_counter()
+                response = await http.get(
+                    url, secure=True, headers={'authorization': token}
+                )
+                stats.add(time.perf_counter() - started, response.status_code)
+
+        async def main():
+            await asyncio.gather(*(client() for _ in range(options['clients'])))
+
+        asyncio.run(main())
+
@@ -0,0 +1,85 @@
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from orders.models import InvoiceSequence, Order
+from orders.sequences import InvoiceNumberAllocator
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Concurrency benchmark for invoice number allocation (checks for duplicates)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--creators', type=int, default=50, help='Parallel invoice creators')
+        parser.add_argument('--invoices', type=int, default=20, help='Invoices per creator')
+        parser.add_argument('--block-size', type=int, default=1, help='Numbers reserved per DB round-trip')
+        parser.add_argument('--allocate-only', action='store_true', help='Skip writing Order rows')
+
+    def handle(self, *args, **options):
+        creators = options['creators']
+        per_creator = options['invoices']
+        allocator = InvoiceNumberAllocator(block_size=options['block_size'])
+        organization_id = f"bench-{uuid.uuid4()}"
+        user = User.objects.create_user(
+            email=f"{organization_id}@bench.local",
+            password=None,
+            organization_id=organization_id,
+        )
+
+        numbers = []
+        errors = []
+        numbers_lock = threading.Lock()
+        barrier = threading.Barrier(creators)
+
+        def creator():
+            issued = []
+            try:
+                barrier.wait()
+                for _ in range(per_creator):
+                    invoice_number = allocator.allocate(organization_id)[0]
+                    if not options['allocate_only']:
+                        with transaction.atomic():
+                            Order.objects.create(
+                                organization_id=organization_id,
+                                created_by_id=user.pk,
+                                invoice_number=invoice_number,
+                                subtotal=0,
+                                total=0,
+                            )
+                    issued.append(invoice_number)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+                with numbers_lock:
+                    numbers.extend(issued)
+
+        threads = [threading.Thread(target=creator) for _ in range(creators)]
+        try:
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            duplicates = len(numbers) - len(set(numbers))
+            self.stdout.write(f"creators={creators} invoices={len(numbers)} block_size={allocator.get_block_size()}")
+            self.stdout.write(f"elapsed={elapsed:.3f}s throughput={len(numbers) / elapsed:.1f} invoices/s")
+            self.stdout.write(f"duplicates={duplicates} errors={len(errors)}")
+            for exc in errors[:5]:
+                self.stderr.write(f"  {type(exc).__name__}: {exc}")
+        finally:
+            Order.objects.filter(organization_id=organization_id).delete()
+            InvoiceSequence.objects.filter(organization_id=organization_id).delete()
+            user.delete()
+
+        if duplicates or errors:
+            raise CommandError('Invoice number allocation produced duplicates or errors')
+        self.stdout.write(self.style.SUCCESS('No duplicate invoice numbers'))
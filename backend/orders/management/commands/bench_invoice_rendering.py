@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from orders import rendering
+from orders.models import InvoiceRender, Order, OrderItem
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Invoice renders/s: single renders, cache hits, and batch rendering on a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoices', type=int, default=2000)
+        parser.add_argument('--items', type=int, default=20, help='Line items per invoice')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                            help='Processes for the batch scenario')
+
+    def handle(self, *args, **options):
+        organization_id = f"bench-{uuid.uuid4()}"
+        user = User.objects.create_user(
+            email=f"{organization_id}@bench.local",
+            password=None,
+            organization_id=organization_id,
+            business_name='Bench Traders',
+        )
+        try:
+            orders = Order.objects.bulk_create([
+                Order(organization_id=organization_id, created_by=user, invoice_number=f"BENCH-{n}",
+                      subtotal='500.00', tax_amount='90.00', total='590.00', paid_amount='590.00')
+                for n in range(options['invoices'])
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_name=f"Bench product {n}", quantity='1.000',
+                          unit_price='10.00', tax_rate='18.00', tax_amount='1.80', total=f'{11.80 + n:.2f}')
+                for order in orders for n in range(options['items'])
+            ], batch_size=2000)
+            invoices = list(
+                Order.objects.filter(organization_id=organization_id)
+                .select_related('created_by').prefetch_related('items')
+            )
+
+            with tempfile.TemporaryDirectory() as render_dir, override_settings(INVOICE_RENDER_DIR=render_dir):
+                self.stdout.write(
+                    f"{len(invoices)} invoices x {options['items']} items, "
+                    f"{options['processes']} batch processes"
+                )
+                for file_format in rendering.FORMATS:
+                    self.bench_format(invoices, file_format, options)
+        finally:
+            Order.objects.filter(organization_id=organization_id).delete()
+            user.delete()
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f"{label:>28}: {count / elapsed:9.1f} renders/s  {elapsed * 1000 / count:8.3f}ms each")
+
+    def bench_format(self, invoices, file_format, options):
+        # Rendering only, no cache: what every download cost without one
+        started = time.perf_counter()
+        for invoice in invoices:
+            rendering.render_document(rendering.invoice_context(invoice), file_format)
+        self.report(f"{file_format} single, uncached", len(invoices), time.perf_counter() - started)
+
+        # Batch rendering into the (empty) cache
+        for processes in sorted({1, options['processes']}):
+            InvoiceRender.objects.filter(order__in=invoices).delete()
+            for name in os.listdir(settings.INVOICE_RENDER_DIR):
+                shutil.rmtree(os.path.join(settings.INVOICE_RENDER_DIR, name))
+            started = time.perf_counter()
+            digests = rendering.render_many(invoices, file_format, processes=processes)
+            self.report(f"{file_format} batch, {processes} process(es)", len(invoices), time.perf_counter() - started)
+
+        # Downloads of completed invoices: the pinned render, nothing rendered
+        started = time.perf_counter()
+        for invoice in invoices:
+            if rendering.render_invoice(invoice, file_format) != digests[invoice.id]:
+                raise CommandError('The single and batch renders disagree')
+        self.report(f"{file_format} single, cached", len(invoices), time.perf_counter() - started)
+
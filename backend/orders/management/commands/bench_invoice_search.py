@@ -0,0 +1,95 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from orders.models import Order
+from orders.search import legacy_filter, search_invoices
+
+User = get_user_model()
+
+NOTE_WORDS = [
+    'delivery', 'pickup', 'wholesale', 'credit', 'urgent', 'gift', 'repeat',
+    'festival', 'discounted', 'exchange', 'online', 'walkin', 'bulk', 'return',
+]
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark indexed invoice search against the legacy icontains filters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoices', type=int, default=1_000_000, help='Invoices to seed')
+        parser.add_argument('--queries', type=int, default=200, help='Searches per strategy')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keep', action='store_true', help='Leave the seeded invoices in place')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        organization_id = f"bench-{uuid.uuid4()}"
+        user = User.objects.create_user(
+            email=f"{organization_id}@bench.local",
+            password=None,
+            organization_id=organization_id,
+        )
+        try:
+            customers = self._seed(rng, organization_id, user, options['invoices'], options['batch_size'])
+            terms = self._terms(rng, options['invoices'], customers, options['queries'])
+            base = Order.objects.filter(organization_id=organization_id).order_by('-created_at')
+
+            for name, strategy in (
+                ('indexed', search_invoices),
+                ('icontains', legacy_filter),
+            ):
+                samples = []
+                for term in terms:
+                    started = time.perf_counter()
+                    # Fetch the first page, as the list endpoint would
+                    list(strategy(base, term).values_list('id', flat=True)[:10])
+                    samples.append((time.perf_counter() - started) * 1000)
+                self.stdout.write(
+                    f"{name:>10}: p50={statistics.median(samples):.2f}ms "
+                    f"p99={_percentile(samples, 99):.2f}ms max={max(samples):.2f}ms"
+                )
+        finally:
+            if not options['keep']:
+                Order.objects.filter(organization_id=organization_id).delete()
+                user.delete()
+
+    def _seed(self, rng, organization_id, user, count, batch_size):
+        customers = [f"CUST-{rng.randrange(10**6):06d}" for _ in range(max(1, count // 20))]
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            Order.objects.bulk_create([
+                Order(
+                    organization_id=organization_id,
+                    created_by=user,
+                    customer_id=rng.choice(customers),
+                    invoice_number=f"INV-BENCH-{n:08d}",
+                    subtotal=0,
+                    total=0,
+                    notes=' '.join(rng.sample(NOTE_WORDS, 2)),
+                )
+                for n in range(offset, min(offset + batch_size, count))
+            ])
+        self.stdout.write(f"Seeded {count} invoices in {time.perf_counter() - started:.1f}s")
+        return customers
+
+    def _terms(self, rng, count, customers, queries):
+        terms = []
+        for _ in range(queries):
+            kind = rng.randrange(3)
+            if kind == 0:
+                terms.append(f"{rng.randrange(count):08d}")
+            elif kind == 1:
+                terms.append(rng.choice(customers))
+            else:
+                terms.append(rng.choice(NOTE_WORDS))
+        return terms
@@ -0,0 +1,100 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from commerce_project.renderers import FastJSONRenderer
+from orders.models import Order, OrderItem
+from orders.serializers import InvoiceItemSerializer, InvoiceReadSerializer, InvoiceSerializer
+from products.models import Product
+
+User = get_user_model()
+
+
+class LegacyInvoiceItemSerializer(InvoiceItemSerializer):
+    """The item serializer as it was: product_id read through the relation"""
+    product_id = serializers.CharField(source='product.id', read_only=True, allow_null=True)
+
+
+class LegacyInvoiceSerializer(InvoiceSerializer):
+    items = LegacyInvoiceItemSerializer(many=True, read_only=True)
+
+
+class Command(BaseCommand):
+    help = 'Rows/s for rendering invoice list pages: ModelSerializer vs the precompiled read serializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoices', type=int, default=100, help='Invoices per page')
+        parser.add_argument('--items', type=int, default=50, help='Line items per invoice')
+        parser.add_argument('--rounds', type=int, default=5, help='Timed renders per scenario')
+
+    def handle(self, *args, **options):
+        organization_id = f"bench-{uuid.uuid4()}"
+        user = User.objects.create_user(
+            email=f"{organization_id}@bench.local",
+            password=None,
+            organization_id=organization_id,
+        )
+        try:
+            products = Product.objects.bulk_create([
+                Product(organization_id=organization_id, name=f"Bench product {n}",
+                        sku=f"{organization_id}-{n}", base_price='10.00')
+                for n in range(options['items'])
+            ])
+            orders = Order.objects.bulk_create([
+                Order(organization_id=organization_id, created_by=user, invoice_number=f"BENCH-{n}",
+                      subtotal='500.00', tax_amount='90.00', total='590.00', paid_amount='590.00')
+                for n in range(options['invoices'])
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, product_name=product.name, quantity='1.000',
+                          unit_price='10.00', tax_rate='18.00', tax_amount='1.80', total='11.80')
+                for order in orders for product in products
+            ], batch_size=2000)
+
+            def page():
+                return list(
+                    Order.objects.filter(organization_id=organization_id)
+                    .prefetch_related('items').order_by('-created_at', '-id')
+                )
+
+            rows = options['invoices'] * options['items']
+            scenarios = [
+                ('ModelSerializer, product.id (before)', LegacyInvoiceSerializer, JSONRenderer()),
+                ('ModelSerializer, product_id', InvoiceSerializer, JSONRenderer()),
+                ('ModelSerializer + orjson', InvoiceSerializer, FastJSONRenderer()),
+                ('precompiled + json', InvoiceReadSerializer, JSONRenderer()),
+                ('precompiled + orjson', InvoiceReadSerializer, FastJSONRenderer()),
+            ]
+            outputs = set()
+            for label, serializer_class, renderer in scenarios:
+                best, queries = None, None
+                for _ in range(options['rounds']):
+                    invoices = page()
+                    counted = []
+
+                    def count(execute, *args):
+                        counted.append(args[0])
+                        return execute(*args)
+
+                    with connection.execute_wrapper(count):
+                        started = time.perf_counter()
+                        body = renderer.render(serializer_class(invoices, many=True).data)
+                        elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                    queries = len(counted)
+                outputs.add(body)
+                self.stdout.write(
+                    f"{label:>38}: {best * 1000:8.1f}ms/page {rows / best:>10,.0f} rows/s "
+                    f"{queries:>5} queries after the prefetch"
+                )
+            if len(outputs) != 1:
+                raise CommandError('Serializers or renderers disagree on the output')
+        finally:
+            Order.objects.filter(organization_id=organization_id).delete()
+            Product.objects.filter(organization_id=organization_id).delete()
+            user.delete()
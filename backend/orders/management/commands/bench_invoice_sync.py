@@ -0,0 +1,97 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from orders.models import DailySalesRollup, HourlySalesRollup, InvoiceCounters, InvoiceSequence, Order
+from products.models import Product
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare uploading an offline backlog one invoice at a time against the batch sync endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoices', type=int, default=200, help='Invoices in the backlog')
+        parser.add_argument('--lines', type=int, default=5, help='Line items per invoice')
+        parser.add_argument('--batch', type=int, default=100, help='Invoices per sync request')
+
+    def handle(self, *args, **options):
+        organization_id = f"bench-{uuid.uuid4()}"
+        user = User.objects.create_user(
+            email=f"{organization_id}@bench.local",
+            password=None,
+            organization_id=organization_id,
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            products = Product.objects.bulk_create([
+                Product(
+                    organization_id=organization_id,
+                    name=f"Bench product {n}",
+                    sku=f"{organization_id}-{n}",
+                    base_price='10.00',
+                    stock_quantity=1000000,
+                )
+                for n in range(50)
+            ])
+
+            def backlog(tag):
+                return [
+                    {
+                        'client_id': f"{tag}-{n}",
+                        'items': [
+                            {
+                                'product_id': str(products[(n + line) % len(products)].pk),
+                                'product_name': 'Bench',
+                                'quantity': 1,
+                                'unit_price': '10.00',
+                            }
+                            for line in range(options['lines'])
+                        ],
+                        'payments': [{'amount': '59.00', 'method': 'cash'}],
+                    }
+                    for n in range(options['invoices'])
+                ]
+
+            single = backlog('single')
+            self._report('one request per invoice', len(single), self._run(
+                [(client.post, '/api/invoices/', invoice) for invoice in single]
+            ))
+
+            batch = options['batch']
+            synced = backlog('sync')
+            requests = [
+                (client.post, '/api/invoices/sync/', {'invoices': synced[i:i + batch]})
+                for i in range(0, len(synced), batch)
+            ]
+            self._report(f'sync, batches of {batch}', len(synced), self._run(requests))
+            self._report('sync replay (all duplicates)', len(synced), self._run(requests))
+        finally:
+            Order.objects.filter(organization_id=organization_id).delete()
+            for model in (InvoiceSequence, InvoiceCounters, DailySalesRollup, HourlySalesRollup, Product):
+                model.objects.filter(organization_id=organization_id).delete()
+            user.delete()
+
+    def _run(self, requests):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for post, url, payload in requests:
+                response = post(url, payload, format='json', secure=True, HTTP_HOST='localhost')
+                if response.status_code not in (200, 201):
+                    raise CommandError(f"{url} returned HTTP {response.status_code}: {response.content[:200]}")
+            elapsed = time.perf_counter() - started
+        return elapsed, len(queries)
+
+    def _report(self, label, invoices, measured):
+        elapsed, queries = measured
+        self.stdout.write(
+            f"{label:>30}: {elapsed * 1000:.1f}ms total, "
+            f"{invoices / elapsed:.0f} invoices/s, {queries} queries"
+        )
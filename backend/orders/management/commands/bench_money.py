@@ -0,0 +1,101 @@
+import random
+import statistics
+import time
+import uuid
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.money import div_round, parse_minor
+from products import tax
+
+PAISA = Decimal('0.01')
+RATES = ('0', '5', '12', '18', '28')
+
+
+def _decimal(value):
+    if type(value) is Decimal:
+        return value
+    if type(value) in (str, int):
+        return Decimal(value)
+    return Decimal(str(value))
+
+
+def decimal_price_lines(table, items_data):
+    """``products.tax.price_lines`` as it was in Decimal: Decimal rates, quantize per line"""
+    fractions = [(percent, percent / Decimal(200)) for percent, _ in table.rates]
+    subtotal = tax_total = Decimal(0)
+    lines = []
+    for item in items_data:
+        percent, half_fraction = fractions[table.by_product.get(item['product_id'], table.default)]
+        quantity = _decimal(item.get('quantity', 1))
+        unit_price = _decimal(item.get('unit_price', 0))
+        discount = _decimal(item.get('discount_amount', 0))
+        taxable = (quantity * unit_price).quantize(PAISA, ROUND_HALF_UP) - discount
+        half_tax = (taxable * half_fraction).quantize(PAISA, ROUND_HALF_UP)
+        tax_amount = half_tax + half_tax
+        subtotal += taxable
+        tax_total += tax_amount
+        lines.append({**item, 'quantity': quantity, 'unit_price': unit_price, 'discount_amount': discount,
+                      'tax_rate': percent, 'tax_amount': tax_amount, 'total': taxable + tax_amount})
+    return lines, subtotal, tax_total
+
+
+class Command(BaseCommand):
+    help = 'Invoice totalling throughput: the Decimal pricing loop vs integer paise (core.money)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Bill sizes to price')
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        rng = random.Random(22)
+        largest = max(options['lines'])
+        product_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(min(largest, 5000))]
+        # The rate table the engine would compile, without a database
+        rates = tuple((Decimal(rate).quantize(PAISA), parse_minor(rate)) for rate in RATES)
+        table = tax.RateTable(rates, {pid: rng.randrange(len(RATES)) for pid in product_ids}, {}, 3)
+        items = [
+            {'product_id': rng.choice(product_ids), 'product_name': 'Item',
+             'quantity': rng.choice([1, 2, 3, '0.750', '1.5']),
+             'unit_price': f'{rng.randrange(1, 500000) / 100:.2f}',
+             'discount_amount': rng.choice(['0', '0.50', '5'])}
+            for _ in range(largest)
+        ]
+        self.stdout.write(f"{options['repeat']} runs per bill size, intra-state, median per bill")
+
+        for size in options['lines']:
+            bill = items[:size]
+            decimal_ms = self.time(lambda: decimal_price_lines(table, bill), options['repeat'])
+            integer_ms = self.time(lambda: tax.price_lines(table, bill), options['repeat'])
+            _, subtotal, tax_total = decimal_price_lines(table, bill)
+            _, totals = tax.price_lines(table, bill)
+            if (subtotal, tax_total) != (totals['subtotal'].to_decimal(), totals['tax_amount'].to_decimal()):
+                raise CommandError(f'{size} lines: Decimal and integer totals disagree')
+            self.stdout.write(
+                f"{size:>7} lines: Decimal {decimal_ms:9.2f}ms ({size / decimal_ms:6.0f} lines/ms)  "
+                f"integer {integer_ms:9.2f}ms ({size / integer_ms:6.0f} lines/ms)  "
+                f"x{decimal_ms / integer_ms:4.2f}"
+            )
+
+        # Totalling amounts already parsed, e.g. summing a report or re-totalling a bill
+        amounts = [item['unit_price'] for item in items]
+        decimals = [Decimal(amount) for amount in amounts]
+        paise = [parse_minor(amount) for amount in amounts]
+        decimal_ms = self.time(lambda: sum(
+            (value * Decimal('0.09')).quantize(PAISA, ROUND_HALF_UP) for value in decimals
+        ), options['repeat'])
+        integer_ms = self.time(lambda: sum(div_round(value * 900, 10000) for value in paise), options['repeat'])
+        self.stdout.write(
+            f"{largest:>7} taxes summed: Decimal {decimal_ms:9.2f}ms  integer {integer_ms:9.2f}ms  "
+            f"x{decimal_ms / integer_ms:4.2f}"
+        )
+
+    def time(self, run, repeat):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
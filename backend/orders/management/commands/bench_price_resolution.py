@@ -0,0 +1,100 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from commerce_project.metrics import observe_queries
+from products import pricing, tax
+from products.models import Product
+
+# Queries a cold validation may run: the cart's prices and the two the rate table compiles with
+COLD_QUERY_BUDGET = 3
+
+
+def per_line_prices(organization_id, items_data):
+    """Repricing without a resolution stage: one product query per line"""
+    prices = {}
+    for item in items_data:
+        product = Product.objects.filter(organization_id=organization_id, id=item['product_id']).first()
+        if product is not None:
+            prices[str(product.id)] = pricing.price_entry(product)
+    return prices
+
+
+class Command(BaseCommand):
+    help = 'Validate a large cart against the catalog: a product query per line vs the batched price resolution'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=500, help='Lines in the cart')
+        parser.add_argument('--products', type=int, default=5000, help="Products in the organization's catalog")
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--budget-ms', type=float, default=100.0,
+                            help='Latency budget for validating the cart with nothing cached')
+
+    def handle(self, *args, **options):
+        if options['lines'] > options['products']:
+            raise CommandError('--lines must not exceed --products')
+        organization_id = f"bench-{uuid.uuid4()}"
+        try:
+            products = Product.objects.bulk_create([
+                Product(
+                    organization_id=organization_id, name=f'Bench product {n}', sku=f'{organization_id}-{n}',
+                    base_price=f'{n % 500 + 0.99:.2f}', wholesale_price=f'{n % 500 + 0.49:.2f}', tax_rate='18',
+                )
+                for n in range(options['products'])
+            ], batch_size=2000)
+            # Every tenth line was priced from a stale catalog
+            items_data = [
+                {'product_id': str(product.id), 'product_name': product.name, 'quantity': n % 7 + 1,
+                 'unit_price': f'{n % 500 + (1.99 if n % 10 == 0 else 0.99):.2f}'}
+                for n, product in enumerate(products[:options['lines']])
+            ]
+            self.stdout.write(f"{options['lines']}-line cart, {options['products']} products, "
+                              f"{options['repeat']} runs each")
+
+            def validate(prices):
+                lines, discrepancies = pricing.resolve(items_data, prices)
+                return tax.price_lines(tax.rate_table(organization_id), lines), discrepancies
+
+            def cold():
+                pricing.price_cache.clear()
+                tax.rate_tables.clear()
+                return validate(pricing.catalog_prices(organization_id, items_data))
+
+            self.report('query per line', options, lambda: validate(per_line_prices(organization_id, items_data)))
+            cold_ms, cold_queries, _ = self.report('batched, cold', options, cold)
+            _, warm_queries, (_, discrepancies) = self.report(
+                'batched, warm', options, lambda: validate(pricing.catalog_prices(organization_id, items_data))
+            )
+
+            expected = len(range(0, options['lines'], 10))
+            if len(discrepancies) != expected:
+                raise CommandError(f'{len(discrepancies)} discrepancies reported, expected {expected}')
+            if cold_queries > COLD_QUERY_BUDGET or warm_queries:
+                raise CommandError(f'{cold_queries} queries cold and {warm_queries} warm, '
+                                   f'budget is {COLD_QUERY_BUDGET} and 0')
+            if cold_ms > options['budget_ms']:
+                raise CommandError(f"Cold validation took {cold_ms:.1f}ms, budget is {options['budget_ms']}ms")
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(discrepancies)} discrepancies found; within {COLD_QUERY_BUDGET} queries and "
+                f"{options['budget_ms']}ms"
+            ))
+        finally:
+            Product.objects.filter(organization_id=organization_id).delete()
+            pricing.price_cache.clear()
+            tax.rate_tables.clear()
+
+    def report(self, label, options, validate):
+        samples = []
+        for _ in range(options['repeat']):
+            queries = []
+            started = time.perf_counter()
+            with observe_queries(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+                result = validate()
+            samples.append((time.perf_counter() - started) * 1000)
+        median = statistics.median(samples)
+        self.stdout.write(
+            f"{label:>16}: median {median:8.3f}ms  min {min(samples):8.3f}ms  {len(queries):5d} queries"
+        )
+        return median, len(queries), result
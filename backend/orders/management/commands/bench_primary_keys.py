@@ -0,0 +1,121 @@
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+
+from core.ids import uuid7
+from orders.models import OrderItem
+
+KEYS = (('uuid4', uuid.uuid4), ('uuid7', uuid7))
+ITEMS_PER_ORDER = 5
+
+
+class Command(BaseCommand):
+    help = (
+        'Insert millions of OrderItem rows keyed by random (uuid4) and time-ordered (uuid7) ids '
+        'into scratch copies of the table: insert throughput as it grows, and index sizes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2_000_000, help='Rows inserted per key kind')
+        parser.add_argument('--batch', type=int, default=5000, help='Rows per INSERT transaction')
+        parser.add_argument('--segments', type=int, default=4,
+                            help='Throughput is reported for this many equal stretches of the run')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError('Index sizes are read from PostgreSQL or SQLite catalogs only')
+        fields = OrderItem._meta.concrete_fields
+        rng = random.Random(25)
+        product_ids = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(5000)]
+        self.stdout.write(f"{options['rows']} rows per key kind, {options['batch']} per transaction, "
+                          f"{connection.vendor}")
+
+        results = {}
+        for label, make_id in KEYS:
+            table = f'bench_pk_{label}'
+            self.create_table(table, fields)
+            try:
+                rates = self.fill(table, fields, make_id, product_ids, rng, options)
+                results[label] = self.sizes(table)
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {connection.ops.quote_name(table)}')
+            stretch = ' '.join(f'{rate:8.0f}' for rate in rates)
+            self.stdout.write(f"{label}: rows/s by stretch {stretch}  (last/first x{rates[-1] / rates[0]:.2f})")
+
+        for label, sizes in results.items():
+            self.stdout.write(f"{label}: " + '  '.join(
+                f"{name} {'n/a' if size is None else f'{size / 2 ** 20:8.1f} MiB'}" for name, size in sizes.items()
+            ))
+        v4, v7 = results['uuid4']['primary key'], results['uuid7']['primary key']
+        if v4 and v7:
+            self.stdout.write(self.style.SUCCESS(f"uuid7 primary key index is x{v7 / v4:.2f} the size of uuid4's"))
+
+    def create_table(self, table, fields):
+        quote = connection.ops.quote_name
+        columns = ', '.join(
+            f"{quote(field.column)} {field.db_type(connection)}{' PRIMARY KEY' if field.primary_key else ' NULL'}"
+            for field in fields
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {quote(table)}')
+            cursor.execute(f'CREATE TABLE {quote(table)} ({columns})')
+            # The index the order foreign key has on the real table
+            cursor.execute(f'CREATE INDEX {quote(table + "_order")} ON {quote(table)} ({quote("order_id")})')
+
+    def fill(self, table, fields, make_id, product_ids, rng, options):
+        """Insert the rows batch by batch; returns rows/s per stretch of the run"""
+        quote = connection.ops.quote_name
+        sql = (f"INSERT INTO {quote(table)} ({', '.join(quote(field.column) for field in fields)}) "
+               f"VALUES ({', '.join(['%s'] * len(fields))})")
+        key_field = OrderItem._meta.pk
+
+        def key(value):
+            return key_field.get_db_prep_value(value, connection)
+
+        stretch_rows = max(options['rows'] // options['segments'], 1)
+        rates, inserted = [], 0
+        stretch_started, stretch_start_row = time.perf_counter(), 0
+        order_id = None
+        while inserted < options['rows']:
+            rows = []
+            for n in range(inserted, min(inserted + options['batch'], options['rows'])):
+                if n % ITEMS_PER_ORDER == 0:
+                    order_id = key(make_id())
+                rows.append((
+                    key(make_id()), order_id, key(rng.choice(product_ids)), 'Item', Decimal('1.000'),
+                    Decimal('10.00'), Decimal('0.00'), Decimal('18.00'), Decimal('1.80'), Decimal('11.80'),
+                ))
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+            inserted += len(rows)
+            if inserted - stretch_start_row >= stretch_rows or inserted == options['rows']:
+                now = time.perf_counter()
+                rates.append((inserted - stretch_start_row) / (now - stretch_started))
+                stretch_started, stretch_start_row = now, inserted
+        return rates
+
+    def sizes(self, table):
+        """Bytes taken by the table, its primary key index and its order index"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                names = {'table': table, 'primary key': f'{table}_pkey', 'order index': f'{table}_order'}
+                sizes = {}
+                for name, relation in names.items():
+                    cursor.execute('SELECT pg_relation_size(%s::regclass)', [relation])
+                    sizes[name] = cursor.fetchone()[0]
+                return sizes
+            names = {'table': table, 'primary key': f'sqlite_autoindex_{table}_1', 'order index': f'{table}_order'}
+            sizes = {}
+            for name, relation in names.items():
+                try:
+                    cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = %s', [relation])
+                    sizes[name] = cursor.fetchone()[0]
+                except DatabaseError:
+                    # SQLite built without the dbstat virtual table
+                    sizes[name] = None
+            return sizes
@@ -0,0 +1,133 @@
+import contextvars
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from commerce_project.metrics import observe_queries
+from orders.models import Order, OrderItem
+from orders.services import build_invoice, load_products, stock_movements
+from products import stock
+from products.models import Product, StockMovement
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Concurrent checkouts of one SKU: stock as a row UPDATE vs the append-only stock ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=100, help='Concurrent checkouts of the product')
+        parser.add_argument('--rounds', type=int, default=3, help='Checkouts per client')
+        parser.add_argument('--db-latency-ms', type=float, default=1.0,
+                            help='Round trip added to every query, as to a database over the network')
+        parser.add_argument('--after-stock-queries', type=int, default=2,
+                            help='Statements the checkout runs after its stock write before committing '
+                                 '(the view records stats and rollups there)')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            raise CommandError(
+                'SQLite lets one transaction write at a time, so every checkout queues whichever way '
+                'stock is stored; run this against PostgreSQL'
+            )
+        organization_id = f"bench-{uuid.uuid4()}"
+        user = User.objects.create_user(
+            email=f"{organization_id}@bench.local",
+            password=None,
+            organization_id=organization_id,
+        )
+        initial = 10 ** 6
+        product = Product.objects.create(
+            organization_id=organization_id, name='Bench bestseller', sku=f"{organization_id}-hot",
+            base_price='10.00', stock_quantity=initial,
+        )
+        latency = options['db_latency_ms'] / 1000
+
+        def slow_network(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        self.stdout.write(
+            f"{options['checkouts']} concurrent checkouts x {options['rounds']} of one SKU, "
+            f"{options['db_latency_ms']}ms per query, {connection.vendor}"
+        )
+        try:
+            for label, write_stock in (('row UPDATE', self.update_row), ('stock ledger', self.append_movement)):
+                with observe_queries(slow_network):
+                    latencies, errors, elapsed = self.run(user, product, write_stock, options)
+                if errors:
+                    for exc in errors[:5]:
+                        self.stderr.write(f"  {type(exc).__name__}: {exc}")
+                    raise CommandError(f"{label}: {len(errors)} checkouts failed")
+                latencies.sort()
+                self.stdout.write(
+                    f"{label:>13}: {len(latencies) / elapsed:8.1f} checkouts/s  "
+                    f"p50 {latencies[len(latencies) // 2] * 1000:7.1f}ms  "
+                    f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.1f}ms  "
+                    f"max {latencies[-1] * 1000:7.1f}ms"
+                )
+
+            sold = 2 * options['checkouts'] * options['rounds']
+            before_compaction = stock.current_stock([product.id])[product.id]
+            stock.compact(organization_id)
+            product.refresh_from_db()
+            if not before_compaction == product.stock_quantity == initial - sold:
+                raise CommandError(
+                    f"Stock is off: expected {initial - sold}, ledger {before_compaction}, "
+                    f"after compaction {product.stock_quantity}"
+                )
+            self.stdout.write(self.style.SUCCESS(f"Stock adds up: {product.stock_quantity} after {sold} sold"))
+        finally:
+            StockMovement.objects.filter(organization_id=organization_id).delete()
+            Order.objects.filter(organization_id=organization_id).delete()
+            product.delete()
+            user.delete()
+
+    def update_row(self, order, deltas):
+        stock.apply_to_snapshot(deltas)
+
+    def append_movement(self, order, deltas):
+        stock.record(order.organization_id, stock_movements(order, deltas))
+
+    def run(self, user, product, write_stock, options):
+        latencies, errors = [], []
+        lock = threading.Lock()
+        barrier = threading.Barrier(options['checkouts'])
+        data = {'items': [{'product_id': str(product.id), 'product_name': product.name,
+                           'quantity': 1, 'unit_price': '10.00'}]}
+
+        def client():
+            try:
+                barrier.wait()
+                for _ in range(options['rounds']):
+                    started = time.perf_counter()
+                    # The checkout's writes in the order create_invoice makes them
+                    with transaction.atomic():
+                        products = load_products(user.organization_id, data['items'])
+                        order, items, deltas = build_invoice(user, data, f"BENCH-{uuid.uuid4()}", products)
+                        order.save(force_insert=True)
+                        OrderItem.objects.bulk_create(items)
+                        write_stock(order, deltas)
+                        with connection.cursor() as cursor:
+                            for _ in range(options['after_stock_queries']):
+                                cursor.execute('SELECT 1')
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        # Threads start with an empty context: hand the clients the query wrappers
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(client,))
+                   for _ in range(options['checkouts'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, errors, time.perf_counter() - started
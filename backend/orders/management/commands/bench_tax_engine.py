@@ -0,0 +1,131 @@
+import statistics
+import time
+import uuid
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products import tax
+from products.models import HsnTaxRate, Product
+
+HSN_RATES = ('0', '5', '12', '18', '28')
+PAISA = Decimal('0.01')
+
+
+def flat_rate_lines(items_data):
+    """
+    The pricing the tax engine replaced: 18% on every line, every field
+    re-parsed through str(), and the product ids parsed in a second loop
+    """
+    subtotal = Decimal('0')
+    total_tax = Decimal('0')
+    processed_items = []
+    for item_data in items_data:
+        quantity = Decimal(str(item_data.get('quantity', 1)))
+        unit_price = Decimal(str(item_data.get('unit_price', 0)))
+        discount = Decimal(str(item_data.get('discount_amount', 0)))
+        item_subtotal = (quantity * unit_price) - discount
+        tax_rate = Decimal('18')
+        tax_amount = item_subtotal * tax_rate / Decimal('100')
+        processed_items.append({**item_data, 'tax_rate': tax_rate, 'tax_amount': tax_amount,
+                                'total': item_subtotal + tax_amount})
+        subtotal += item_subtotal
+        total_tax += tax_amount
+    for item in processed_items:
+        item['product_uuid'] = uuid.UUID(str(item.get('product_id')))
+    return processed_items, subtotal, total_tax
+
+
+def queried_rate_totals(organization_id, items_data):
+    """Catalog-driven without a compiled table: the invoice's rates queried and resolved per call"""
+    ids = [uuid.UUID(item['product_id']) for item in items_data]
+    hsn_rates = dict(
+        HsnTaxRate.objects.filter(organization_id=organization_id).values_list('hsn_code', 'rate')
+    )
+    products = {
+        product_id: hsn_rates.get(hsn_code, rate) if hsn_code else rate
+        for product_id, hsn_code, rate in Product.objects.filter(
+            organization_id=organization_id, id__in=ids
+        ).values_list('id', 'hsn_code', 'tax_rate')
+    }
+    subtotal = total_tax = Decimal('0')
+    for product_id, item_data in zip(ids, items_data):
+        rate = products[product_id]
+        quantity = Decimal(str(item_data.get('quantity', 1)))
+        unit_price = Decimal(str(item_data.get('unit_price', 0)))
+        discount = Decimal(str(item_data.get('discount_amount', 0)))
+        taxable = (quantity * unit_price - discount).quantize(PAISA, ROUND_HALF_UP)
+        half_tax = (taxable * rate / Decimal('200')).quantize(PAISA, ROUND_HALF_UP)
+        subtotal += taxable
+        total_tax += half_tax + half_tax
+    return subtotal, total_tax
+
+
+class Command(BaseCommand):
+    help = 'Time pricing one large invoice: the flat-rate loop, rates queried per invoice, and the compiled rate table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=1000, help='Lines on the invoice')
+        parser.add_argument('--products', type=int, default=5000, help="Products in the organization's catalog")
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if options['lines'] > options['products']:
+            raise CommandError('--lines must not exceed --products')
+        organization_id = f"bench-{uuid.uuid4()}"
+        try:
+            HsnTaxRate.objects.bulk_create([
+                HsnTaxRate(organization_id=organization_id, hsn_code=f'H{n:03d}', rate=HSN_RATES[n % len(HSN_RATES)])
+                for n in range(40)
+            ])
+            # Half the catalog is rated through its HSN code, half by its own rate
+            products = Product.objects.bulk_create([
+                Product(
+                    organization_id=organization_id, name=f'Bench product {n}', sku=f'{organization_id}-{n}',
+                    base_price='10.00', hsn_code=f'H{n % 80:03d}', tax_rate=HSN_RATES[n % 3 + 1],
+                )
+                for n in range(options['products'])
+            ], batch_size=2000)
+            items_data = [
+                {'product_id': str(product.id), 'product_name': product.name,
+                 'quantity': n % 7 + 1, 'unit_price': f'{n % 500 + 0.99:.2f}', 'discount_amount': '0.10'}
+                for n, product in enumerate(products[:options['lines']])
+            ]
+            self.stdout.write(f"{options['lines']}-line invoice, {options['products']} products, "
+                              f"{options['repeat']} runs each")
+
+            self.report('flat 18% (before)', options, lambda: flat_rate_lines(items_data))
+            self.report('rates queried per invoice', options,
+                        lambda: queried_rate_totals(organization_id, items_data))
+
+            def cold():
+                tax.rate_tables.clear()
+                return tax.price_lines(tax.rate_table(organization_id), items_data)
+
+            self.report('compiled table, cold', options, cold)
+            warm = self.report('compiled table, warm', options,
+                               lambda: tax.price_lines(tax.rate_table(organization_id), items_data))
+
+            _, totals = warm
+            computed = (totals['subtotal'].to_decimal(), totals['tax_amount'].to_decimal())
+            if computed != queried_rate_totals(organization_id, items_data):
+                raise CommandError('The compiled table and the queried rates disagree')
+            self.stdout.write(self.style.SUCCESS(
+                f"Totals agree: subtotal {totals['subtotal']}, tax {totals['tax_amount']}"
+            ))
+        finally:
+            Product.objects.filter(organization_id=organization_id).delete()
+            HsnTaxRate.objects.filter(organization_id=organization_id).delete()
+            tax.rate_tables.clear()
+
+    def report(self, label, options, price):
+        samples = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            result = price()
+            samples.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f"{label:>26}: median {statistics.median(samples):8.3f}ms  "
+            f"min {min(samples):8.3f}ms  {options['lines'] / statistics.median(samples):8.1f} lines/ms"
+        )
+        return result
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders.counters import COUNTER_FIELDS, normalize_stats, stats_aggregates
+from orders.models import InvoiceCounters, Order
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-organization invoice counters from Order and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', help='Only reconcile this organization_id')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        counters = InvoiceCounters.objects.all()
+        if options['organization']:
+            orders = orders.filter(organization_id=options['organization'])
+            counters = counters.filter(organization_id=options['organization'])
+
+        expected = {
+            row.pop('organization_id'): normalize_stats(row)
+            for row in orders.order_by().values('organization_id').annotate(**stats_aggregates())
+        }
+        stored = {row.organization_id: row for row in counters}
+        empty = normalize_stats(dict.fromkeys(COUNTER_FIELDS, 0))
+
+        drifted = 0
+        with transaction.atomic():
+            for organization_id in sorted(set(expected) | set(stored)):
+                values = expected.get(organization_id, empty)
+                row = stored.get(organization_id)
+                if row is None:
+                    # Never tracked: nothing to compare against, just build it
+                    drift = {}
+                else:
+                    drift = {
+                        field: (getattr(row, field), values[field])
+                        for field in COUNTER_FIELDS
+                        if getattr(row, field) != values[field]
+                    }
+                if drift:
+                    drifted += 1
+                    details = ', '.join(f"{field}: {old} -> {new}" for field, (old, new) in drift.items())
+                    self.stdout.write(self.style.WARNING(f"{organization_id}: {details}"))
+                if not options['dry_run'] and (row is None or drift):
+                    InvoiceCounters.objects.update_or_create(
+                        organization_id=organization_id, defaults=values
+                    )
+
+        summary = f"Checked {len(set(expected) | set(stored))} organizations, {drifted} with drift"
+        if options['dry_run']:
+            summary += ' (dry run, nothing written)'
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import Order
+from orders.rendering import FORMATS, PINNED_STATUSES, render_many
+
+
+class Command(BaseCommand):
+    help = 'Render completed and cancelled invoices into the render cache ahead of their first download'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', help='Only render this organization_id')
+        parser.add_argument('--format', dest='file_format', choices=FORMATS, default='pdf')
+        parser.add_argument('--processes', type=int, default=None, help='Render processes (default: one per CPU)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Invoices loaded and rendered at a time')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.filter(status__in=PINNED_STATUSES).exclude(
+            renders__format=options['file_format']
+        )
+        if options['organization']:
+            orders = orders.filter(organization_id=options['organization'])
+        ids = list(orders.order_by('created_at').values_list('id', flat=True))
+
+        done = 0
+        for start in range(0, len(ids), options['batch_size']):
+            batch = Order.objects.filter(id__in=ids[start:start + options['batch_size']]).select_related(
+                'created_by'
+            ).prefetch_related('items')
+            done += len(render_many(batch, options['file_format'], processes=options['processes']))
+            self.stdout.write(f"{done}/{len(ids)} invoices rendered")
+        self.stdout.write(f"Pinned {done} {options['file_format']} documents")
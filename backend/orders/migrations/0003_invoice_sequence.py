@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:38
+
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('organization_id', models.CharField(max_length=100)),
+                ('branch_id', models.CharField(blank=True, max_length=100)),
+                ('day', models.DateField()),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='invoice_number',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(fields=('organization_id', 'invoice_number'), name='orders_order_org_invoice_number_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='invoicesequence',
+            constraint=models.UniqueConstraint(fields=('organization_id', 'branch_id', 'day'), name='orders_invoicesequence_scope_uniq'),
+        ),
+    ]
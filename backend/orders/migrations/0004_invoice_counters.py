@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_invoice_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceCounters',
+            fields=[
+                ('organization_id', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('total_count', models.IntegerField(default=0)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('partial_count', models.IntegerField(default=0)),
+                ('draft_count', models.IntegerField(default=0)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_billed', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:42
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_invoice_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('organization_id', models.CharField(max_length=100)),
+                ('branch_id', models.CharField(blank=True, max_length=100)),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('cancelled_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('day', models.DateField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('organization_id', 'day', 'branch_id'), name='orders_dailysalesrollup_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlySalesRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('organization_id', models.CharField(max_length=100)),
+                ('branch_id', models.CharField(blank=True, max_length=100)),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('cancelled_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('hour', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('organization_id', 'hour', 'branch_id'), name='orders_hourlysalesrollup_bucket_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_invoice_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['organization_id', 'created_at', 'id'], name='orders_org_created_idx'),
+        ),
+    ]
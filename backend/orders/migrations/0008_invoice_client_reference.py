@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='client_reference',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_reference', ''), _negated=True), fields=('organization_id', 'client_reference'), name='orders_order_org_client_reference_uniq'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+FTS_TABLE = 'orders_order_fts'
+
+
+def restore_search_triggers(apps, schema_editor):
+    # SQLite applies 0008's conditional constraint by rebuilding orders_order,
+    # which drops the FTS triggers from 0006; put them back and reindex
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    if FTS_TABLE not in schema_editor.connection.introspection.table_names():
+        return
+    columns = 'invoice_number, customer_id, notes'
+    new_values = 'new.invoice_number, new.customer_id, new.notes'
+    old_values = 'old.invoice_number, old.customer_id, old.notes'
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON orders_order BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.rowid, {new_values}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON orders_order BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON orders_order BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.rowid, {new_values}); END"
+    )
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_invoice_client_reference'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
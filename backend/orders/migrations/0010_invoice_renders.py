@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:25
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_restore_invoice_search_triggers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceRender',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('format', models.CharField(max_length=10)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renders', to='orders.order')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('order', 'format'), name='orders_invoicerender_order_format_uniq')],
+            },
+        ),
+    ]
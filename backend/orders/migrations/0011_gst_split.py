@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:39
+
+from decimal import Decimal
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+# SQLite adds these columns by rebuilding orders_order, which drops the FTS triggers again
+restore_search_triggers = import_module(
+    'orders.migrations.0009_restore_invoice_search_triggers'
+).restore_search_triggers
+
+
+def split_existing_tax(apps, schema_editor):
+    # Existing invoices were all priced as intra-state: half CGST, the rest SGST
+    Order = apps.get_model('orders', 'Order')
+    half = Round(F('tax_amount') * Decimal('0.5'), 2)
+    Order.objects.update(cgst_amount=half, sgst_amount=F('tax_amount') - half)
+    # Documents rendered before show no GST split; render them again
+    apps.get_model('orders', 'InvoiceRender').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_invoice_renders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='cgst_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='igst_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='place_of_supply',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='sgst_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='supply_type',
+            field=models.CharField(choices=[('intra_state', 'Intra-state'), ('inter_state', 'Inter-state')], default='intra_state', max_length=20),
+        ),
+        migrations.RunPython(split_existing_tax, migrations.RunPython.noop),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:03
+
+import re
+
+from django.db import migrations, models
+
+
+def backfill_branch_tags(apps, schema_editor):
+    # The tag each sequence has been issuing under; branches that shortened to
+    # the same tag on the same day get numbered variants from now on
+    InvoiceSequence = apps.get_model('orders', 'InvoiceSequence')
+    taken = set()
+    for sequence in InvoiceSequence.objects.exclude(branch_id='').order_by('organization_id', 'day', 'branch_id'):
+        base = re.sub(r'[^A-Za-z0-9]', '', sequence.branch_id)[:8].upper() or 'BRANCH'
+        tag, n = base, 1
+        while (sequence.organization_id, sequence.day, tag) in taken:
+            n += 1
+            tag = f'{base}{n}'
+        taken.add((sequence.organization_id, sequence.day, tag))
+        sequence.branch_tag = tag
+        sequence.save(update_fields=['branch_tag'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_uuid7_primary_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoicesequence',
+            name='branch_tag',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.RunPython(backfill_branch_tags, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='invoicesequence',
+            constraint=models.UniqueConstraint(fields=('organization_id', 'day', 'branch_tag'), name='orders_invoicesequence_tag_uniq'),
+        ),
+    ]
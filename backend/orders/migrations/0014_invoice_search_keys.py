@@ -0,0 +1,101 @@
+from importlib import import_module
+
+from django.db import migrations
+
+FTS_TABLE = 'orders_order_fts'
+KEYS_TABLE = 'orders_order_fts_keys'
+COLUMNS = ('invoice_number', 'customer_id', 'notes')
+
+create_rowid_search_index = import_module('orders.migrations.0006_invoice_search').create_search_index
+
+
+def _values(row):
+    return ', '.join(f'{row}.{column}' for column in COLUMNS)
+
+
+def restore_search_triggers(apps, schema_editor):
+    """
+    (Re)create the triggers that keep the FTS table in step with orders_order
+    and resync it. SQLite applies some schema changes by rebuilding
+    orders_order, which drops its triggers; such migrations must run this.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    if KEYS_TABLE not in schema_editor.connection.introspection.table_names():
+        return
+    columns = ', '.join(COLUMNS)
+    key_of = f'SELECT search_rowid FROM {KEYS_TABLE} WHERE order_id = old.id'
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON orders_order BEGIN "
+        f"INSERT INTO {KEYS_TABLE}(order_id) VALUES (new.id); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) "
+        f"SELECT search_rowid, {_values('new')} FROM {KEYS_TABLE} WHERE order_id = new.id; END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON orders_order BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({key_of}); "
+        f"DELETE FROM {KEYS_TABLE} WHERE order_id = old.id; END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {columns} ON orders_order BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({key_of}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) "
+        f"SELECT search_rowid, {_values('new')} FROM {KEYS_TABLE} WHERE order_id = old.id; END"
+    )
+    # Writes made while the triggers were missing
+    schema_editor.execute(f'DELETE FROM {KEYS_TABLE} WHERE order_id NOT IN (SELECT id FROM orders_order)')
+    schema_editor.execute(
+        f'INSERT INTO {KEYS_TABLE}(order_id) SELECT id FROM orders_order '
+        f'WHERE id NOT IN (SELECT order_id FROM {KEYS_TABLE})'
+    )
+    schema_editor.execute(f'DELETE FROM {FTS_TABLE}')
+    schema_editor.execute(
+        f'INSERT INTO {FTS_TABLE}(rowid, {columns}) SELECT k.search_rowid, {_values("o")} '
+        f'FROM {KEYS_TABLE} k JOIN orders_order o ON o.id = k.order_id'
+    )
+
+
+def key_search_index_on_order_id(apps, schema_editor):
+    # 0006 matched FTS rows to orders by orders_order's implicit rowid, which
+    # VACUUM may renumber. Key them by the order's id through a table with an
+    # explicit INTEGER PRIMARY KEY instead; FTS5 keeps its own rowids stable.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    if FTS_TABLE not in schema_editor.connection.introspection.table_names():
+        # SQLite built without FTS5/trigram: search falls back to icontains
+        return
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+    schema_editor.execute(f'DROP TABLE {FTS_TABLE}')
+    schema_editor.execute(
+        f'CREATE TABLE {KEYS_TABLE} (search_rowid INTEGER PRIMARY KEY, order_id char(32) NOT NULL UNIQUE)'
+    )
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({', '.join(COLUMNS)}, tokenize='trigram')"
+    )
+    restore_search_triggers(apps, schema_editor)
+
+
+def key_search_index_on_rowid(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    if KEYS_TABLE not in schema_editor.connection.introspection.table_names():
+        return
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    schema_editor.execute(f'DROP TABLE {KEYS_TABLE}')
+    create_rowid_search_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0013_invoice_sequence_branch_tags'),
+    ]
+
+    operations = [
+        migrations.RunPython(key_search_index_on_order_id, key_search_index_on_rowid),
+    ]
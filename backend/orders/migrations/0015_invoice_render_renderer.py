@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0014_invoice_search_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoicerender',
+            name='renderer',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
 from django.conf import settings
 from products.models import Product
-import uuid
+from core.ids import uuid7
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -10,28 +10,56 @@ class Order(models.Model):
         ('partial', 'Partial'),
         ('cancelled', 'Cancelled'),
     ]
+    SUPPLY_TYPE_CHOICES = [
+        ('intra_state', 'Intra-state'),
+        ('inter_state', 'Inter-state'),
+    ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     organization_id = models.CharField(max_length=100, db_index=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
     branch_id = models.CharField(max_length=100, blank=True)
     customer_id = models.CharField(max_length=100, blank=True)
-    invoice_number = models.CharField(max_length=100, unique=True)
+    client_reference = models.CharField(max_length=100, blank=True)
+    invoice_number = models.CharField(max_length=100)
     invoice_type = models.CharField(max_length=20, default='sale')
     subtotal = models.DecimalField(max_digits=12, decimal_places=2)
     discount_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     tax_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # GST: tax_amount is CGST + SGST on an intra-state supply, IGST on an inter-state one
+    supply_type = models.CharField(max_length=20, choices=SUPPLY_TYPE_CHOICES, default='intra_state')
+    place_of_supply = models.CharField(max_length=50, blank=True)
+    cgst_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    sgst_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    igst_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=12, decimal_places=2)
     paid_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='completed')
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization_id', 'invoice_number'],
+                name='orders_order_org_invoice_number_uniq',
+            ),
+            # Client-generated IDs from offline terminals make batch sync replay-safe
+            models.UniqueConstraint(
+                fields=['organization_id', 'client_reference'],
+                condition=~models.Q(client_reference=''),
+                name='orders_order_org_client_reference_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['organization_id', 'created_at', 'id'], name='orders_org_created_idx'),
+        ]
+
     def __str__(self):
         return self.invoice_number
 
 class OrderItem(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
     product_name = models.CharField(max_length=255)
@@ -44,3 +72,123 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product_name} x {self.quantity}"
+
+
+class InvoiceSequence(models.Model):
+    """Per-(organization, branch, day) invoice number counter.
+
+    ``last_value`` is the highest number handed out so far; see
+    ``orders.sequences`` for how numbers are allocated from it.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    organization_id = models.CharField(max_length=100)
+    branch_id = models.CharField(max_length=100, blank=True)
+    day = models.DateField()
+    # The tag in this scope's invoice numbers; distinct branches never share one on a day
+    branch_tag = models.CharField(max_length=20, blank=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization_id', 'branch_id', 'day'],
+                name='orders_invoicesequence_scope_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['organization_id', 'day', 'branch_tag'],
+                name='orders_invoicesequence_tag_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id}/{self.branch_id or '-'}/{self.day}: {self.last_value}"
+
+
+class InvoiceCounters(models.Model):
+    """
+    Running invoice totals for one organization.
+
+    Only maintained when ``INVOICE_STATS_SOURCE = 'counters'``; see
+    ``orders.counters``.
+    """
+    organization_id = models.CharField(max_length=100, primary_key=True)
+    total_count = models.IntegerField(default=0)
+    completed_count = models.IntegerField(default=0)
+    partial_count = models.IntegerField(default=0)
+    draft_count = models.IntegerField(default=0)
+    cancelled_count = models.IntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_billed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.organization_id}: {self.total_count} invoices"
+
+
+class SalesRollup(models.Model):
+    """Invoice facts summed per organization, branch and time bucket"""
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    organization_id = models.CharField(max_length=100)
+    branch_id = models.CharField(max_length=100, blank=True)
+    invoice_count = models.IntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cancelled_count = models.IntegerField(default=0)
+    cancelled_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailySalesRollup(SalesRollup):
+    day = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization_id', 'day', 'branch_id'],
+                name='orders_dailysalesrollup_bucket_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id}/{self.branch_id or '-'}/{self.day}"
+
+
+class HourlySalesRollup(SalesRollup):
+    hour = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization_id', 'hour', 'branch_id'],
+                name='orders_hourlysalesrollup_bucket_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.organization_id}/{self.branch_id or '-'}/{self.hour:%Y-%m-%d %H:00}"
+
+
+class InvoiceRender(models.Model):
+    """
+    The rendered document a completed invoice is pinned to, so it is served
+    from the render cache without being rendered again; see ``orders.rendering``
+    """
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='renders')
+    format = models.CharField(max_length=10)
+    content_hash = models.CharField(max_length=64)
+    # Renderer the pin was made with; pins from any other renderer are ignored
+    renderer = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'format'], name='orders_invoicerender_order_format_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id}.{self.format}: {self.content_hash}"
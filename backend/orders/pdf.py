@@ -0,0 +1,135 @@
+"""
+Minimal PDF writer for invoices.
+
+Just enough of PDF 1.4 for text documents: pages with text in the
+Helvetica and Helvetica-Bold base fonts, which viewers provide themselves,
+so nothing is embedded, plus horizontal rules. Text is encoded as WinAnsi
+(cp1252); characters outside it print as ``?``. Content streams are
+deflated. Output is deterministic: the same calls produce the same bytes,
+because ``orders.rendering`` keys its cache on the content.
+"""
+import zlib
+
+A4 = (595.28, 841.89)
+
+# Advance widths (1/1000 em) of the printable ASCII range, from the Adobe
+# Helvetica and Helvetica-Bold AFM files; other characters use ``_DEFAULT_WIDTH``
+_HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+_HELVETICA_BOLD_WIDTHS = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+)
+_DEFAULT_WIDTH = 556
+FONTS = {'F1': ('Helvetica', _HELVETICA_WIDTHS), 'F2': ('Helvetica-Bold', _HELVETICA_BOLD_WIDTHS)}
+
+
+def text_width(text, size, bold=False):
+    widths = FONTS['F2' if bold else 'F1'][1]
+    total = 0
+    for char in text:
+        code = ord(char) - 32
+        total += widths[code] if 0 <= code < len(widths) else _DEFAULT_WIDTH
+    return total * size / 1000
+
+
+def _escape(text):
+    encoded = text.encode('cp1252', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _number(value):
+    return f'{value:.2f}'.rstrip('0').rstrip('.').encode()
+
+
+class Page:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self._ops = []
+
+    def text(self, x, y, text, size=10, bold=False, align='left'):
+        """Draw one line of text; ``x`` is the left edge, or the right edge with ``align='right'``"""
+        if align == 'right':
+            x -= text_width(text, size, bold)
+        font = b'F2' if bold else b'F1'
+        self._ops.append(
+            b'BT /' + font + b' ' + _number(size) + b' Tf ' + _number(x) + b' ' + _number(y)
+            + b' Td (' + _escape(text) + b') Tj ET'
+        )
+
+    def rule(self, x1, x2, y, width=0.5):
+        self._ops.append(
+            _number(width) + b' w ' + _number(x1) + b' ' + _number(y) + b' m '
+            + _number(x2) + b' ' + _number(y) + b' l S'
+        )
+
+    def content(self):
+        return b'\n'.join(self._ops)
+
+
+class Document:
+    def __init__(self, page_size=A4, title=''):
+        self.page_size = page_size
+        self.title = title
+        self.pages = []
+
+    def add_page(self):
+        page = Page(*self.page_size)
+        self.pages.append(page)
+        return page
+
+    def render(self):
+        # Objects: 1 catalog, 2 page tree, 3-4 fonts, 5 info, then a
+        # (page, content stream) pair per page
+        objects = [None] * 5
+        page_ids = []
+        for page in self.pages:
+            stream = zlib.compress(page.content(), 6)
+            page_id, content_id = len(objects) + 1, len(objects) + 2
+            page_ids.append(page_id)
+            objects.append(
+                b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 ' + _number(page.width) + b' '
+                + _number(page.height) + b'] /Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> '
+                b'/Contents ' + str(content_id).encode() + b' 0 R >>'
+            )
+            objects.append(
+                b'<< /Length ' + str(len(stream)).encode() + b' /Filter /FlateDecode >>\nstream\n'
+                + stream + b'\nendstream'
+            )
+        objects[0] = b'<< /Type /Catalog /Pages 2 0 R >>'
+        objects[1] = (
+            b'<< /Type /Pages /Kids [' + b' '.join(b'%d 0 R' % page_id for page_id in page_ids)
+            + b'] /Count ' + str(len(page_ids)).encode() + b' >>'
+        )
+        for index, name in ((2, 'Helvetica'), (3, 'Helvetica-Bold')):
+            objects[index] = (
+                b'<< /Type /Font /Subtype /Type1 /BaseFont /' + name.encode()
+                + b' /Encoding /WinAnsiEncoding >>'
+            )
+        objects[4] = b'<< /Title (' + _escape(self.title) + b') >>'
+
+        output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+        xref = len(output)
+        output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        for offset in offsets:
+            output += b'%010d 00000 n \n' % offset
+        output += (
+            b'trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+            % (len(objects) + 1, xref)
+        )
+        return bytes(output)
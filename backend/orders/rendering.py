@@ -0,0 +1,299 @@
+"""
+Invoice documents (PDF and HTML) and their render cache.
+
+An invoice is first flattened into a context of display strings
+(``invoice_context``) and the document is a pure function of that context
+(``render_document``). The SHA-256 of the context, the format and the
+renderer version is the document's content hash, and rendered documents
+are stored under it in ``INVOICE_RENDER_DIR`` (``<format>/<ab>/<hash>.<ext>``).
+Invoices that render to the same content share one file, and an invoice
+that has not changed since its last render is served without rendering.
+
+Completed and cancelled invoices are also pinned to their hash with an
+``InvoiceRender`` row, so they are served from the cache without even
+loading their items. Writes that change a pinned invoice (payments, edits,
+cancelling) drop the pin with ``unpin``. A pin records the renderer it was
+made with (``RENDERER_VERSION`` and the template's hash) and is ignored
+once either changes, so a new layout reaches pinned invoices too.
+
+The HTML template is compiled once per process. PDFs are drawn with
+``orders.pdf``. ``render_many`` renders a batch in a process pool; workers
+only render and write files, the database work stays in the caller.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import django
+from django.conf import settings
+from django.template.loader import get_template
+
+from . import pdf
+from .models import InvoiceRender
+
+# Bump when the PDF layout changes; template edits change the hash by themselves
+RENDERER_VERSION = 1
+FORMATS = {'pdf': ('pdf', 'application/pdf'), 'html': ('html', 'text/html; charset=utf-8')}
+PINNED_STATUSES = ('completed', 'cancelled')
+HTML_TEMPLATE = 'orders/invoice.html'
+# A render takes well under a millisecond and a pool process a good part of a
+# second to start (it imports Django), so each process needs this many documents
+POOL_MIN_RENDERS_PER_PROCESS = 500
+
+# PDF layout, in points
+_MARGIN = 50
+_ROW_HEIGHT = 16
+_COLUMNS = (('Qty', 330), ('Rate', 400), ('Tax', 470), ('Amount', 545))
+_ITEM_WIDTH = 210
+
+
+def _amount(value):
+    return f'{value:,.2f}'
+
+
+def _quantity(value):
+    text = f'{value:f}'
+    return text.rstrip('0').rstrip('.') if '.' in text else text
+
+
+def _tax_lines(order):
+    lines = [('CGST', order.cgst_amount), ('SGST', order.sgst_amount), ('IGST', order.igst_amount)]
+    return [{'label': label, 'amount': _amount(amount)} for label, amount in lines if amount]
+
+
+def invoice_context(order):
+    """Everything the invoice documents show, as strings; uses prefetched items if present"""
+    seller = order.created_by
+    return {
+        'seller': seller.business_name or seller.email,
+        'invoice_number': order.invoice_number,
+        'invoice_type': order.invoice_type.capitalize(),
+        'status': order.get_status_display(),
+        'date': f'{order.created_at:%Y-%m-%d}',
+        'customer_id': order.customer_id,
+        'place_of_supply': order.place_of_supply,
+        'notes': order.notes,
+        'items': [
+            {
+                'name': item.product_name,
+                'quantity': _quantity(item.quantity),
+                'unit_price': _amount(item.unit_price),
+                'tax': _amount(item.tax_amount),
+                'total': _amount(item.total),
+            }
+            for item in order.items.all()
+        ],
+        'subtotal': _amount(order.subtotal),
+        'discount_amount': _amount(order.discount_amount),
+        'tax_amount': _amount(order.tax_amount),
+        'tax_lines': _tax_lines(order),
+        'total': _amount(order.total),
+        'paid_amount': _amount(order.paid_amount),
+        'balance': _amount(order.total - order.paid_amount),
+    }
+
+
+@lru_cache(maxsize=None)
+def _html_template():
+    return get_template(HTML_TEMPLATE)
+
+
+@lru_cache(maxsize=None)
+def _renderer_fingerprint():
+    template = _html_template().template
+    return f'{RENDERER_VERSION}:{hashlib.sha256(template.source.encode()).hexdigest()}'
+
+
+def content_hash(context, file_format):
+    payload = json.dumps(
+        [_renderer_fingerprint(), file_format, context], sort_keys=True, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _fit(text, width, size):
+    if pdf.text_width(text, size) <= width:
+        return text
+    while text and pdf.text_width(text + '...', size) > width:
+        text = text[:-1]
+    return text + '...'
+
+
+def _render_pdf(context):
+    document = pdf.Document(title=f"Invoice {context['invoice_number']}")
+    width, height = document.page_size
+    right = width - _MARGIN
+
+    def new_page():
+        page = document.add_page()
+        y = height - _MARGIN
+        page.text(_MARGIN, y - 12, context['seller'], size=16, bold=True)
+        page.text(right, y - 12, f"Invoice {context['invoice_number']}", size=12, bold=True, align='right')
+        y -= 34
+        page.text(_MARGIN, y, f"Date: {context['date']}")
+        page.text(right, y, f"{context['invoice_type']} / {context['status']}", align='right')
+        if context['customer_id']:
+            y -= 14
+            page.text(_MARGIN, y, f"Customer: {context['customer_id']}")
+        if context['place_of_supply']:
+            y -= 14
+            page.text(_MARGIN, y, f"Place of supply: {context['place_of_supply']}")
+        y -= 26
+        page.text(_MARGIN, y, 'Item', bold=True)
+        for label, x in _COLUMNS:
+            page.text(x, y, label, bold=True, align='right')
+        page.rule(_MARGIN, right, y - 5)
+        return page, y - _ROW_HEIGHT - 4
+
+    page, y = new_page()
+    for item in context['items']:
+        if y < _MARGIN + 40:
+            page, y = new_page()
+        page.text(_MARGIN, y, _fit(item['name'], _ITEM_WIDTH, 10))
+        for key, (_, x) in zip(('quantity', 'unit_price', 'tax', 'total'), _COLUMNS):
+            page.text(x, y, item[key], align='right')
+        y -= _ROW_HEIGHT
+
+    # (label, amount, font size, bold); the GST split is set smaller under the tax line
+    totals = [
+        ('Subtotal', context['subtotal'], 10, False),
+        ('Discount', context['discount_amount'], 10, False),
+        ('Tax', context['tax_amount'], 10, False),
+        *((line['label'], line['amount'], 9, False) for line in context['tax_lines']),
+        ('Total', context['total'], 10, True),
+        ('Paid', context['paid_amount'], 10, False),
+        ('Balance due', context['balance'], 10, True),
+    ]
+    notes = context['notes'].splitlines()
+    if y - _ROW_HEIGHT * (len(totals) + len(notes) + 1) < _MARGIN + 20:
+        page, y = new_page()
+    page.rule(_MARGIN, right, y + _ROW_HEIGHT - 6)
+    for label, amount, size, bold in totals:
+        page.text(_COLUMNS[2][1], y, label, size=size, bold=bold, align='right')
+        page.text(right, y, amount, size=size, bold=bold, align='right')
+        y -= _ROW_HEIGHT
+    for line in notes:
+        y -= 4
+        page.text(_MARGIN, y, _fit(line, right - _MARGIN, 9), size=9)
+
+    for number, page in enumerate(document.pages, start=1):
+        page.text(right, _MARGIN / 2, f'Page {number} of {len(document.pages)}', size=8, align='right')
+    return document.render()
+
+
+def render_document(context, file_format):
+    """The document bytes for an ``invoice_context``"""
+    if file_format == 'pdf':
+        return _render_pdf(context)
+    return _html_template().render(context).encode()
+
+
+def cache_path(digest, file_format, root=None):
+    extension = FORMATS[file_format][0]
+    return os.path.join(root or settings.INVOICE_RENDER_DIR, file_format, digest[:2], f'{digest}.{extension}')
+
+
+def _store(digest, file_format, content, root=None):
+    path = cache_path(digest, file_format, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written beside the target and renamed into place, so readers never see a partial file
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as temp:
+            temp.write(content)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return path
+
+
+def _render_to_cache(context, file_format, digest, root=None):
+    # Pool workers are passed ``root``: they only see the settings module, not overrides
+    if not os.path.exists(cache_path(digest, file_format, root)):
+        _store(digest, file_format, render_document(context, file_format), root)
+    return digest
+
+
+def _pin(orders, digests, file_format):
+    renderer = _renderer_fingerprint()
+    InvoiceRender.objects.bulk_create(
+        [InvoiceRender(order=order, format=file_format, content_hash=digests[order.id], renderer=renderer)
+         for order in orders if order.status in PINNED_STATUSES],
+        update_conflicts=True, unique_fields=['order', 'format'], update_fields=['content_hash', 'renderer'],
+    )
+
+
+def _pinned(orders, file_format):
+    """
+    Hashes of the pinned orders among ``orders`` whose pin is from the current
+    renderer and whose document is still in the cache
+    """
+    ids = [order.id for order in orders if order.status in PINNED_STATUSES]
+    if not ids:
+        return {}
+    pins = InvoiceRender.objects.filter(order_id__in=ids, format=file_format, renderer=_renderer_fingerprint())
+    return {
+        order_id: digest
+        for order_id, digest in pins.values_list('order_id', 'content_hash')
+        if os.path.exists(cache_path(digest, file_format))
+    }
+
+
+def unpin(order_id):
+    """Call when a pinned invoice changes, so its documents are rendered afresh"""
+    InvoiceRender.objects.filter(order_id=order_id).delete()
+
+
+def render_invoice(order, file_format='pdf'):
+    """
+    The content hash of the invoice's document, rendering it into the cache
+    only if it is not there; read it from ``cache_path(hash, file_format)``
+    """
+    digest = _pinned([order], file_format).get(order.id)
+    if digest is not None:
+        return digest
+    context = invoice_context(order)
+    digest = _render_to_cache(context, file_format, content_hash(context, file_format))
+    _pin([order], {order.id: digest}, file_format)
+    return digest
+
+
+def render_many(orders, file_format='pdf', processes=None):
+    """
+    ``render_invoice`` for many invoices (prefetch their items and
+    ``created_by``), rendering the missing documents on up to ``processes``
+    worker processes; returns ``{order id: content hash}``
+    """
+    orders = list(orders)
+    pinned = _pinned(orders, file_format)
+    digests = dict(pinned)
+    todo = {}
+    for order in orders:
+        if order.id in pinned:
+            continue
+        context = invoice_context(order)
+        digest = content_hash(context, file_format)
+        digests[order.id] = digest
+        if digest not in todo and not os.path.exists(cache_path(digest, file_format)):
+            todo[digest] = context
+
+    processes = min(processes or os.cpu_count() or 1, len(todo) // POOL_MIN_RENDERS_PER_PROCESS)
+    if processes > 1:
+        with ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+        ) as pool:
+            list(pool.map(
+                _render_to_cache, todo.values(), [file_format] * len(todo), todo.keys(),
+                [settings.INVOICE_RENDER_DIR] * len(todo), chunksize=max(len(todo) // (processes * 4), 1),
+            ))
+    else:
+        for digest, context in todo.items():
+            _render_to_cache(context, file_format, digest)
+
+    _pin([order for order in orders if order.id not in pinned], digests, file_format)
+    return digests
@@ -0,0 +1,213 @@
+"""
+Daily and hourly sales rollups.
+
+Each invoice contributes to one ``DailySalesRollup`` and one
+``HourlySalesRollup`` row, bucketed by its ``created_at`` in the project
+time zone. Cancelled invoices move out of the sales figures and into
+``cancelled_count``/``cancelled_total``. Payments taken later are credited
+to the bucket the invoice was created in.
+
+The invoice endpoints apply the before/after difference of every order they
+write, in the same transaction. History that predates the rollups (or was
+written some other way) is loaded with ``manage.py backfill_sales_rollups``.
+"""
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncHour, TruncMonth
+from django.utils import timezone
+
+from core.money import HALF_EVEN, parse_minor, to_decimal
+from .models import DailySalesRollup, HourlySalesRollup
+
+AMOUNT_FIELDS = ('subtotal', 'tax_amount', 'total', 'paid_amount', 'cancelled_total')
+FACT_FIELDS = ('invoice_count', 'cancelled_count') + AMOUNT_FIELDS
+
+
+def snapshot(order):
+    """The parts of an order that feed the rollups"""
+    if order is None:
+        return None
+    return (
+        order.branch_id or '',
+        order.created_at,
+        order.status,
+        order.subtotal,
+        order.tax_amount,
+        order.total,
+        order.paid_amount,
+    )
+
+
+def _buckets(created_at):
+    local = timezone.localtime(created_at)
+    return local.date(), local.replace(minute=0, second=0, microsecond=0)
+
+
+def _facts(state):
+    _, _, status, subtotal, tax_amount, total, paid_amount = state
+    # In paise, rounded the way DecimalField rounds on save
+    amounts = [parse_minor(value, rounding=HALF_EVEN) for value in (subtotal, tax_amount, total, paid_amount)]
+    facts = dict.fromkeys(FACT_FIELDS, 0)
+    if status == 'cancelled':
+        facts['cancelled_count'] = 1
+        facts['cancelled_total'] = amounts[2]
+    else:
+        facts['invoice_count'] = 1
+        facts['subtotal'], facts['tax_amount'], facts['total'], facts['paid_amount'] = amounts
+    return facts
+
+
+def _apply(model, bucket_field, organization_id, branch_id, bucket, deltas):
+    key = {'organization_id': organization_id, 'branch_id': branch_id, bucket_field: bucket}
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not changes:
+        return
+    if model.objects.filter(**key).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **deltas)
+    except IntegrityError:
+        model.objects.filter(**key).update(**changes)
+
+
+def record_change(organization_id, before, after):
+    """
+    Apply the difference between two ``snapshot`` values to the rollups.
+
+    Call inside the transaction that writes the order.
+    """
+    record_changes(organization_id, [(before, after)])
+
+
+def record_changes(organization_id, changes):
+    """``record_change`` for many (before, after) pairs, one write per bucket"""
+    deltas = {}
+    for before, after in changes:
+        if before == after:
+            continue
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None:
+                continue
+            branch_id, created_at = state[0], state[1]
+            key = (branch_id,) + _buckets(created_at)
+            bucket_deltas = deltas.setdefault(key, dict.fromkeys(FACT_FIELDS, 0))
+            for field, value in _facts(state).items():
+                bucket_deltas[field] += sign * value
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        for (branch_id, day, hour), bucket_deltas in deltas.items():
+            for field in AMOUNT_FIELDS:
+                bucket_deltas[field] = to_decimal(bucket_deltas[field])
+            _apply(DailySalesRollup, 'day', organization_id, branch_id, day, bucket_deltas)
+            _apply(HourlySalesRollup, 'hour', organization_id, branch_id, hour, bucket_deltas)
+
+
+def rollup_aggregates():
+    """
+    Aggregate expressions that turn raw orders into rollup facts, keyed
+    ``sum_<fact>`` since an aggregate cannot reuse the name of an Order field.
+    """
+    live = ~Q(status='cancelled')
+    cancelled = Q(status='cancelled')
+    return {
+        'sum_invoice_count': Count('id', filter=live),
+        'sum_subtotal': Sum('subtotal', filter=live),
+        'sum_tax_amount': Sum('tax_amount', filter=live),
+        'sum_total': Sum('total', filter=live),
+        'sum_paid_amount': Sum('paid_amount', filter=live),
+        'sum_cancelled_count': Count('id', filter=cancelled),
+        'sum_cancelled_total': Sum('total', filter=cancelled),
+    }
+
+
+def backfill(orders, start_date=None, end_date=None):
+    """
+    Rebuild the rollups covered by ``orders`` (optionally limited to a date
+    range) from scratch. Returns the number of (daily, hourly) rows written.
+    """
+    tz = timezone.get_current_timezone()
+    orders = orders.annotate(
+        rollup_day=TruncDate('created_at', tzinfo=tz),
+        rollup_hour=TruncHour('created_at', tzinfo=tz),
+    )
+    if start_date:
+        orders = orders.filter(rollup_day__gte=start_date)
+    if end_date:
+        orders = orders.filter(rollup_day__lte=end_date)
+
+    written = []
+    for model, bucket_field, trunc_field in (
+        (DailySalesRollup, 'day', 'rollup_day'),
+        (HourlySalesRollup, 'hour', 'rollup_hour'),
+    ):
+        rows = orders.order_by().values('organization_id', 'branch_id', trunc_field).annotate(
+            **rollup_aggregates()
+        )
+        rollups = []
+        for row in rows.iterator():
+            facts = {field: row[f'sum_{field}'] or 0 for field in FACT_FIELDS}
+            rollups.append(model(
+                organization_id=row['organization_id'],
+                branch_id=row['branch_id'],
+                **{bucket_field: row[trunc_field]},
+                **facts
+            ))
+
+        organization_ids = orders.order_by().values('organization_id').distinct()
+        stale = model.objects.filter(organization_id__in=organization_ids)
+        if start_date:
+            stale = stale.filter(**{f'{bucket_field}__gte': _bucket_start(bucket_field, start_date)})
+        if end_date:
+            stale = stale.filter(**{f'{bucket_field}__lt': _bucket_start(bucket_field, end_date + datetime.timedelta(days=1))})
+        with transaction.atomic():
+            stale.delete()
+            model.objects.bulk_create(rollups, batch_size=1000)
+        written.append(len(rollups))
+    return tuple(written)
+
+
+def _bucket_start(bucket_field, day):
+    if bucket_field == 'day':
+        return day
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def report(organization_id, start_date, end_date, granularity='day', branch_id=None):
+    """
+    Range query over the rollups. ``granularity`` is 'hour', 'day' or
+    'month'; months are summed from the daily rows in the database.
+    Returns (rows, totals).
+    """
+    if granularity == 'hour':
+        queryset = HourlySalesRollup.objects.filter(
+            organization_id=organization_id,
+            hour__gte=_bucket_start('hour', start_date),
+            hour__lt=_bucket_start('hour', end_date + datetime.timedelta(days=1)),
+        )
+        period = F('hour')
+    else:
+        queryset = DailySalesRollup.objects.filter(
+            organization_id=organization_id,
+            day__gte=start_date,
+            day__lte=end_date,
+        )
+        period = TruncMonth('day') if granularity == 'month' else F('day')
+    if branch_id is not None:
+        queryset = queryset.filter(branch_id=branch_id)
+
+    sums = {f'sum_{field}': Sum(field) for field in FACT_FIELDS}
+    grouped = queryset.annotate(period=period).values('period').annotate(**sums).order_by('period')
+    rows = []
+    totals = dict.fromkeys(FACT_FIELDS, 0)
+    for group in grouped:
+        row = {'period': group['period']}
+        for field in FACT_FIELDS:
+            row[field] = group[f'sum_{field}'] or 0
+            totals[field] += row[field]
+        rows.append(row)
+    return rows, totals
@@ -0,0 +1,88 @@
+"""
+Invoice search over ``invoice_number``, ``customer_id`` and ``notes``.
+
+Substring semantics are the same as the old ``icontains`` filters, but each
+backend answers from an index and results come back ranked:
+
+* PostgreSQL: a pg_trgm GIN index on the concatenated columns, matched with
+  ``ILIKE`` and ranked by ``similarity()``.
+* SQLite: an FTS5 table with the trigram tokenizer, kept in step by
+  triggers and ranked by ``bm25()``. Its rows are matched to orders by id
+  through ``orders_order_fts_keys``, never by ``orders_order``'s implicit
+  rowid, which VACUUM may renumber. Terms shorter than three characters
+  cannot be answered by a trigram index and fall back to ``icontains``.
+
+Both indexes are created by migration ``0006_invoice_search`` (the SQLite
+one rebuilt by ``0014_invoice_search_keys``) and maintained
+by the database on every write. Any other backend uses ``icontains``.
+
+SQLite applies some schema changes by rebuilding ``orders_order``, which
+drops the FTS triggers; such migrations must restore them afterwards with
+``restore_search_triggers`` from ``0014_invoice_search_keys``.
+"""
+import functools
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'orders_order_fts'
+KEYS_TABLE = 'orders_order_fts_keys'
+SEARCH_COLUMNS = ('invoice_number', 'customer_id', 'notes')
+TRIGRAM_INDEX = 'orders_order_search_trgm'
+DOCUMENT_SQL = " || ' ' || ".join(f'"orders_order"."{column}"' for column in SEARCH_COLUMNS)
+
+
+@functools.cache
+def sqlite_fts_available():
+    """Whether the FTS5 shadow table exists (SQLite builds without FTS5 skip it)"""
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def legacy_filter(queryset, term):
+    return queryset.filter(
+        Q(invoice_number__icontains=term) |
+        Q(customer_id__icontains=term) |
+        Q(notes__icontains=term)
+    )
+
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _postgres_search(queryset, term):
+    return queryset.filter(
+        RawSQL(f'({DOCUMENT_SQL}) ILIKE %s', [_like_pattern(term)], output_field=BooleanField())
+    ).annotate(
+        search_rank=RawSQL(f'similarity(({DOCUMENT_SQL}), %s)', [term], output_field=FloatField())
+    ).order_by('-search_rank', '-created_at')
+
+
+def _sqlite_search(queryset, term):
+    match = '"' + term.replace('"', '""') + '"'
+    # Joined rather than correlated so FTS5 drives the query and computes
+    # bm25 (its built-in ``rank``; lower is better) once per match
+    return queryset.extra(
+        tables=[FTS_TABLE, KEYS_TABLE],
+        where=[
+            f'{FTS_TABLE} MATCH %s',
+            f'{KEYS_TABLE}.search_rowid = {FTS_TABLE}.rowid',
+            f'{KEYS_TABLE}.order_id = "orders_order"."id"',
+        ],
+        params=[match],
+        select={'search_rank': f'{FTS_TABLE}.rank'},
+    ).order_by('search_rank', '-created_at')
+
+
+def search_invoices(queryset, term):
+    """Filter ``queryset`` to invoices matching ``term``, best matches first"""
+    term = term.strip()
+    if not term:
+        return queryset
+    if connection.vendor == 'postgresql':
+        return _postgres_search(queryset, term)
+    if connection.vendor == 'sqlite' and len(term) >= 3 and sqlite_fts_available():
+        return _sqlite_search(queryset, term)
+    return legacy_filter(queryset, term)
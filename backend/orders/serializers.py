@@ -1,4 +1,12 @@
+import decimal
+from operator import attrgetter
+
 from rest_framework import serializers
+from django.conf import settings
+from django.utils import timezone
+from core.money import InvalidAmount, MoneyField, parse_minor
+from products.pricing import TIER_CHOICES
+from products.tax import QUANTITY_PLACES
 from .models import Order, OrderItem
 from django.contrib.auth import get_user_model
 
@@ -7,7 +15,8 @@ User = get_user_model()
 
 class InvoiceItemSerializer(serializers.ModelSerializer):
     """Serializer for invoice items (OrderItem model)"""
-    product_id = serializers.CharField(source='product.id', read_only=True, allow_null=True)
+    # Read the FK column directly; going through ``product`` loads a row per line
+    product_id = serializers.CharField(read_only=True, allow_null=True)
     
     class Meta:
         model = OrderItem
@@ -23,7 +32,7 @@ class PaymentSerializer(serializers.Serializer):
     """Serializer for payment records (simplified, as Payment model might not exist yet)"""
     id = serializers.CharField(read_only=True)
     invoice_id = serializers.CharField(read_only=True)
-    amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    amount = MoneyField(max_digits=12)
     method = serializers.CharField()
     reference = serializers.CharField(required=False, allow_blank=True)
     created_at = serializers.DateTimeField(read_only=True)
@@ -52,19 +61,162 @@ class InvoiceSerializer(serializers.ModelSerializer):
             'id', 'branch_id', 'customer_id', 'customer', 
             'invoice_number', 'invoice_type', 'items',
             'subtotal', 'discount_amount', 'discount_type',
-            'tax_amount', 'total', 'paid_amount', 'status',
+            'tax_amount', 'supply_type', 'place_of_supply',
+            'cgst_amount', 'sgst_amount', 'igst_amount',
+            'total', 'paid_amount', 'status',
             'notes', 'payments', 'created_by', 'created_at'
         ]
-        read_only_fields = ['id', 'organization_id', 'created_by', 'created_at', 'invoice_number']
+        read_only_fields = [
+            'id', 'organization_id', 'created_by', 'created_at', 'invoice_number',
+            'supply_type', 'place_of_supply', 'cgst_amount', 'sgst_amount', 'igst_amount'
+        ]
+
+
+def _as_string(value):
+    return None if value is None else str(value)
+
+
+def _as_decimal(max_digits, decimal_places):
+    """Same output as ``serializers.DecimalField`` with the model's precision"""
+    quantum = decimal.Decimal(1).scaleb(-decimal_places)
+    context = decimal.getcontext().copy()
+    context.prec = max_digits
+
+    def convert(value):
+        if value is None:
+            return None
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(quantum, context=context))
+    return convert
+
+
+def _as_datetime(value):
+    """Same output as ``serializers.DateTimeField`` (ISO 8601, ``Z`` for UTC)"""
+    if value is None:
+        return None
+    if settings.USE_TZ and timezone.is_aware(value):
+        value = value.astimezone(timezone.get_current_timezone())
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _as_is(value):
+    return value
+
+
+def _converter(field):
+    if field.get_internal_type() == 'DecimalField':
+        return _as_decimal(field.max_digits, field.decimal_places)
+    if field.get_internal_type() == 'DateTimeField':
+        return _as_datetime
+    if field.get_internal_type() in ('UUIDField', 'ForeignKey'):
+        return _as_string
+    return _as_is
+
+
+def _compile(model, fields):
+    """
+    (key, getter, converter) per field, resolved once at import time.
+    Entries are model field names or ready-made (key, getter, converter).
+    """
+    compiled = []
+    for entry in fields:
+        if isinstance(entry, str):
+            field = model._meta.get_field(entry)
+            entry = (entry, attrgetter(field.attname), _converter(field))
+        compiled.append(entry)
+    return tuple(compiled)
+
+
+def _rows(fields):
+    def convert(instances):
+        return [{key: to_json(get(obj)) for key, get, to_json in fields} for obj in instances]
+    return convert
+
+
+INVOICE_ITEM_FIELDS = _compile(OrderItem, [
+    'id', 'product_id', 'product_name', 'quantity',
+    'unit_price', 'discount_amount', 'tax_rate',
+    'tax_amount', 'total'
+])
+
+INVOICE_FIELDS = _compile(Order, [
+    'id', 'branch_id', 'customer_id',
+    ('customer', lambda order: None, _as_is),
+    'invoice_number', 'invoice_type',
+    ('items', lambda order: order.items.all(), _rows(INVOICE_ITEM_FIELDS)),
+    'subtotal', 'discount_amount',
+    ('discount_type', lambda order: 'fixed', _as_is),
+    'tax_amount', 'supply_type', 'place_of_supply',
+    'cgst_amount', 'sgst_amount', 'igst_amount',
+    'total', 'paid_amount', 'status',
+    'notes', 'created_by', 'created_at'
+])
+
+
+class InvoiceReadSerializer(serializers.BaseSerializer):
+    """
+    Read-only twin of ``InvoiceSerializer`` for list and retrieve.
+
+    Produces the same JSON, but every field's getter and converter is
+    compiled once when the module loads, instead of binding and walking
+    a tree of field objects for every invoice and line item.
+    """
+    def to_representation(self, instance):
+        return {key: convert(get(instance)) for key, get, convert in INVOICE_FIELDS}
+
+
+# Amounts in the free-form line and payment dicts: (key, decimal places). They
+# are parsed by products.tax and orders.services, so they are checked here to
+# answer a malformed one with a 400 instead of failing mid-pricing
+ITEM_AMOUNTS = (('quantity', QUANTITY_PLACES), ('unit_price', 2), ('discount_amount', 2))
+PAYMENT_AMOUNTS = (('amount', 2),)
+# As OrderItem/Order store them: max_digits=12
+MAX_AMOUNT_DIGITS = 12
+
+
+def _check_amounts(rows, amounts):
+    """ListField-style errors ({index: {key: [message]}}) for unparseable or oversized amounts"""
+    errors = {}
+    for index, row in enumerate(rows):
+        row_errors = {}
+        for key, places in amounts:
+            if key not in row:
+                continue
+            value = row[key]
+            try:
+                if isinstance(value, bool):
+                    raise InvalidAmount(value)
+                minor = parse_minor(value, places)
+            except InvalidAmount:
+                row_errors[key] = ['A valid number is required.']
+                continue
+            if abs(minor) >= 10 ** MAX_AMOUNT_DIGITS:
+                row_errors[key] = [f'Ensure that there are no more than {MAX_AMOUNT_DIGITS} digits in total.']
+        if row_errors:
+            errors[index] = row_errors
+    if errors:
+        raise serializers.ValidationError(errors)
+    return rows
 
 
 class CreateInvoiceSerializer(serializers.Serializer):
     """Serializer for creating invoices with items"""
+    # Selects the branch's own daily number sequence and sales rollups
+    branch_id = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
     customer_id = serializers.CharField(required=False, allow_null=True, allow_blank=True)
     invoice_type = serializers.CharField(default='sale')
+    # Wholesale customers (and wholesale invoices) are charged products' wholesale_price
+    customer_tier = serializers.ChoiceField(choices=TIER_CHOICES, required=False)
     items = serializers.ListField(child=serializers.DictField())
-    discount_amount = serializers.DecimalField(max_digits=12, decimal_places=2, default=0)
+    discount_amount = MoneyField(max_digits=12, default=0)
     discount_type = serializers.CharField(default='fixed')
+    # Inter-state supplies are taxed as IGST, intra-state ones as CGST + SGST
+    supply_type = serializers.ChoiceField(choices=Order.SUPPLY_TYPE_CHOICES, default='intra_state')
+    place_of_supply = serializers.CharField(max_length=50, required=False, allow_blank=True)
     notes = serializers.CharField(required=False, allow_blank=True)
     payments = serializers.ListField(
         child=serializers.DictField(),
@@ -72,6 +224,34 @@ class CreateInvoiceSerializer(serializers.Serializer):
         allow_empty=True
     )
 
+    def validate_items(self, items):
+        return _check_amounts(items, ITEM_AMOUNTS)
+
+    def validate_payments(self, payments):
+        return _check_amounts(payments, PAYMENT_AMOUNTS)
+
+
+# Upper bound on invoices per sync request; larger backlogs are sent in pages
+MAX_SYNC_BATCH = 500
+
+
+class SyncInvoiceSerializer(CreateInvoiceSerializer):
+    """One invoice captured offline; ``client_id`` makes replays harmless"""
+    client_id = serializers.CharField(max_length=100)
+
+
+class InvoiceSyncSerializer(serializers.Serializer):
+    """Envelope for a batch of offline invoices"""
+    invoices = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=MAX_SYNC_BATCH
+    )
+
+
+class SendInvoiceEmailSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+
 
 class InvoiceStatsSerializer(serializers.Serializer):
     """Serializer for invoice statistics"""
@@ -80,8 +260,44 @@ class InvoiceStatsSerializer(serializers.Serializer):
     partial_count = serializers.IntegerField()
     draft_count = serializers.IntegerField()
     cancelled_count = serializers.IntegerField()
-    total_revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
-    total_outstanding = serializers.DecimalField(max_digits=12, decimal_places=2)
+    total_revenue = MoneyField(max_digits=14)
+    total_outstanding = MoneyField(max_digits=14)
+
+
+class RecentInvoiceSerializer(serializers.ModelSerializer):
+    """Invoice summary for the dashboard's recent activity list"""
+    class Meta:
+        model = Order
+        fields = ['id', 'invoice_number', 'invoice_type', 'status', 'total', 'paid_amount', 'created_at']
+
+
+class SalesReportQuerySerializer(serializers.Serializer):
+    """Query parameters for the rollup-backed sales report"""
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    granularity = serializers.ChoiceField(choices=['hour', 'day', 'month'], default='day')
+    branch_id = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, attrs):
+        if attrs['start_date'] > attrs['end_date']:
+            raise serializers.ValidationError("start_date must be on or before end_date.")
+        return attrs
+
+
+class SalesReportRowSerializer(serializers.Serializer):
+    """One period of the sales report (also used for the range totals)"""
+    period = serializers.SerializerMethodField()
+    invoice_count = serializers.IntegerField()
+    subtotal = MoneyField(max_digits=14)
+    tax_amount = MoneyField(max_digits=14)
+    total = MoneyField(max_digits=14)
+    paid_amount = MoneyField(max_digits=14)
+    cancelled_count = serializers.IntegerField()
+    cancelled_total = MoneyField(max_digits=14)
+
+    def get_period(self, obj):
+        period = obj.get('period')
+        return period.isoformat() if period else None
 
 
 # Keep original serializers for backward compatibility
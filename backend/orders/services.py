@@ -0,0 +1,267 @@
+"""
+Write path for invoices.
+
+``create_invoice`` issues a fixed number of queries however many lines a
+bill has: one SELECT for the referenced products (two more when the
+organization's tax rates are not compiled yet, see ``products.tax``), one
+INSERT for the order, one bulk INSERT for the items and one bulk INSERT
+into the stock ledger (``products.stock``). Lines are charged the
+``unit_price`` the client sent, or with ``INVOICE_PRICING = 'catalog'``
+the catalog's price (``products.pricing``), read by that same product
+SELECT. ``create_invoices`` does the same for a whole batch of invoices at
+once, always at the prices the (offline) terminals charged. Nothing here
+updates a product row, so checkouts selling the same product do not queue
+on its row lock.
+
+Amounts are integer paise (``core.money``) until they are set on the model
+fields as ``Decimal``.
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.models import Sum
+
+from core.money import Money, div_round, to_decimal
+from products import pricing, stock, tax
+from products.models import Product, StockMovement
+from .models import Order, OrderItem
+
+# Stock moves only for invoice types that physically move goods
+STOCK_DIRECTION = {
+    'sale': -1,
+    'return': 1,
+    'wholesale': -1,
+}
+# The ledger kind each of those invoice types records; a wholesale invoice is a sale
+STOCK_KIND = {
+    'sale': 'sale',
+    'return': 'return',
+    'wholesale': 'sale',
+}
+
+
+class PhaseTimer:
+    """Collects wall-clock milliseconds per named phase"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.timings[name] = self.timings.get(name, 0) + elapsed
+
+    def server_timing(self):
+        """Render the timings as a ``Server-Timing`` header value"""
+        return ', '.join(f"{name};dur={ms:.2f}" for name, ms in self.timings.items())
+
+
+def load_products(organization_id, items_data):
+    """
+    Fetch every product referenced by the items in one ``IN`` query;
+    keyed by canonical id string, as ``products.tax.price_lines`` returns it
+    """
+    ids = {tax.canonical_id(item.get('product_id')) for item in items_data}
+    ids.discard(None)
+    if not ids:
+        return {}
+    products = Product.objects.filter(
+        organization_id=organization_id, id__in=ids
+    ).only('is_loose', *pricing.PRICE_FIELDS)
+    return {str(product.id): product for product in products}
+
+
+def catalog_priced(data, products):
+    """``data`` with its catalog lines priced from the loaded ``products``"""
+    tier = pricing.price_list(data.get('invoice_type', 'sale'), data.get('customer_tier', ''))
+    lines, _ = pricing.resolve(data.get('items', []), pricing.product_prices(products.values()), tier)
+    return {**data, 'items': lines}
+
+
+def stock_deltas(invoice_type, processed_items, products):
+    """Net stock change per product for this invoice (whole units only)"""
+    direction = STOCK_DIRECTION.get(invoice_type)
+    if not direction:
+        return {}
+    deltas = {}
+    for item in processed_items:
+        product = products.get(item['product_id'])
+        # Loose goods are sold by weight; stock_quantity only counts whole units
+        if product is None or product.is_loose:
+            continue
+        quantity = div_round(item['quantity'], 10 ** tax.QUANTITY_PLACES)
+        deltas[product.id] = deltas.get(product.id, 0) + direction * quantity
+    return {product_id: delta for product_id, delta in deltas.items() if delta}
+
+
+def stock_movements(order, deltas):
+    """Unsaved ledger rows for an invoice's stock deltas, referencing the order"""
+    return [
+        StockMovement(
+            organization_id=order.organization_id, product_id=product_id, kind=STOCK_KIND[order.invoice_type],
+            quantity=delta, branch_id=order.branch_id, order=order,
+        )
+        for product_id, delta in deltas.items()
+    ]
+
+
+def reverse_stock(order, note=''):
+    """
+    Put back the stock an invoice moved: one ``reversal`` movement per product
+    whose movements for the order do not net to zero yet, so reversing twice
+    moves nothing. Call in the transaction that cancels the invoice.
+    """
+    totals = StockMovement.objects.filter(order=order).values('product_id').annotate(
+        total=Sum('quantity')
+    ).values_list('product_id', 'total')
+    return stock.record(order.organization_id, [
+        StockMovement(
+            organization_id=order.organization_id, product_id=product_id, kind='reversal',
+            quantity=-total, branch_id=order.branch_id, order=order, note=note,
+        )
+        for product_id, total in totals if total
+    ])
+
+
+def build_invoice(user, data, invoice_number, products, rates=None):
+    """
+    Price one invoice with the organization's rate table (``products.tax``).
+    Returns the unsaved ``Order``, its unsaved ``OrderItem`` rows and its
+    stock deltas; nothing is written.
+    """
+    items_data = data.get('items', [])
+    payments_data = data.get('payments', [])
+    invoice_type = data.get('invoice_type', 'sale')
+    supply_type = data.get('supply_type', 'intra_state')
+
+    rates = rates or tax.rate_table(user.organization_id)
+    processed_items, totals = tax.price_lines(rates, items_data, inter_state=supply_type == 'inter_state')
+    for item in processed_items:
+        # Lines for unknown products are kept, just not linked
+        if item['product_id'] not in products:
+            item['product_id'] = None
+
+    discount_amount = Money.parse(data.get('discount_amount', 0))
+    total = totals['total']
+
+    # Calculate paid amount from payments
+    paid_amount = sum((Money.parse(p.get('amount', 0)) for p in payments_data), Money())
+
+    # Determine status
+    if not paid_amount:
+        order_status = 'draft'
+    elif paid_amount >= total:
+        order_status = 'completed'
+    else:
+        order_status = 'partial'
+
+    order = Order(
+        organization_id=user.organization_id,
+        created_by=user,
+        branch_id=data.get('branch_id', ''),
+        customer_id=data.get('customer_id', ''),
+        client_reference=data.get('client_id', ''),
+        invoice_number=invoice_number,
+        invoice_type=invoice_type,
+        subtotal=totals['subtotal'].to_decimal(),
+        discount_amount=discount_amount.to_decimal(),
+        tax_amount=totals['tax_amount'].to_decimal(),
+        supply_type=supply_type,
+        place_of_supply=data.get('place_of_supply', ''),
+        cgst_amount=totals['cgst_amount'].to_decimal(),
+        sgst_amount=totals['sgst_amount'].to_decimal(),
+        igst_amount=totals['igst_amount'].to_decimal(),
+        total=total.to_decimal(),
+        paid_amount=paid_amount.to_decimal(),
+        status=order_status,
+        notes=data.get('notes', '')
+    )
+    items = [
+        OrderItem(
+            order=order,
+            product_id=item_data['product_id'],
+            product_name=item_data.get('product_name', ''),
+            quantity=to_decimal(item_data['quantity'], tax.QUANTITY_PLACES),
+            unit_price=to_decimal(item_data['unit_price']),
+            discount_amount=to_decimal(item_data['discount_amount']),
+            tax_rate=item_data['tax_rate'],
+            tax_amount=to_decimal(item_data['tax_amount']),
+            total=to_decimal(item_data['total'])
+        )
+        for item_data in processed_items
+    ]
+    return order, items, stock_deltas(invoice_type, processed_items, products)
+
+
+def create_invoice(user, data, invoice_number, timer=None):
+    """
+    Create an invoice with its items and stock movements.
+
+    Must run inside a transaction. Returns the saved ``Order``; per-phase
+    timings are recorded on ``timer`` when one is given.
+    """
+    timer = timer or PhaseTimer()
+
+    with timer.phase('products'):
+        products = load_products(user.organization_id, data.get('items', []))
+        rates = tax.rate_table(user.organization_id)
+
+    with timer.phase('pricing'):
+        if settings.INVOICE_PRICING == 'catalog':
+            data = catalog_priced(data, products)
+        order, items, deltas = build_invoice(user, data, invoice_number, products, rates)
+
+    with timer.phase('order'):
+        order.save(force_insert=True)
+
+    with timer.phase('items'):
+        OrderItem.objects.bulk_create(items)
+
+    with timer.phase('stock'):
+        stock.record(user.organization_id, stock_movements(order, deltas))
+
+    # Note: Payments would be stored in a Payment model if it exists
+    # For now, we'll just track paid_amount in the Order
+
+    return order
+
+
+def create_invoices(user, entries, timer=None):
+    """
+    Create many invoices with set-based writes: one product SELECT and one
+    bulk INSERT each of orders, items and stock movements, however many
+    invoices and lines there are.
+
+    ``entries`` is a list of (data, invoice_number). Must run inside a
+    transaction. Returns the saved orders in the same order.
+    """
+    timer = timer or PhaseTimer()
+
+    with timer.phase('products'):
+        all_items = [item for data, _ in entries for item in data.get('items', [])]
+        products = load_products(user.organization_id, all_items)
+        rates = tax.rate_table(user.organization_id)
+
+    with timer.phase('pricing'):
+        orders, items, movements = [], [], []
+        for data, invoice_number in entries:
+            order, order_items, deltas = build_invoice(user, data, invoice_number, products, rates)
+            orders.append(order)
+            items.extend(order_items)
+            movements.extend(stock_movements(order, deltas))
+
+    with timer.phase('orders'):
+        Order.objects.bulk_create(orders)
+
+    with timer.phase('items'):
+        OrderItem.objects.bulk_create(items)
+
+    with timer.phase('stock'):
+        stock.record(user.organization_id, movements)
+
+    return orders
@@ -0,0 +1,139 @@
+"""
+Batch upload of invoices captured offline by POS terminals.
+
+A terminal queues bills while it has no connection and sends them in one
+request when it is back online. Each bill carries a ``client_id`` generated
+on the terminal and stored as ``Order.client_reference``. The client ID is
+unique per organization, so sending a batch again (after a timeout, say)
+reports the bills already stored as ``duplicate`` and does not create
+them twice.
+
+A batch of N bills costs a fixed number of queries: one lookup of known
+client IDs, one number reservation per branch, one product SELECT, one bulk
+INSERT each for orders, items and stock ledger movements, and one
+counter/rollup update per bucket. Bills that fail validation are
+reported on their own and do not stop the rest of the batch. So do bills
+that hit a database conflict other than a concurrent upload of the same
+bills: the batch is then stored one bill per savepoint.
+"""
+from django.db import IntegrityError, transaction
+
+from .models import Order
+from .sequences import allocator
+from .serializers import SyncInvoiceSerializer
+from .services import create_invoices
+from .tracking import record_changes, snapshot
+
+
+def _result(client_id, status, order=None, errors=None):
+    result = {'client_id': client_id, 'status': status}
+    if order is not None:
+        result['id'] = str(order.pk)
+        result['invoice_number'] = order.invoice_number
+    if errors is not None:
+        result['errors'] = errors
+    return result
+
+
+def _validate(invoices):
+    """Split raw payloads into valid data (by client_id) and error results"""
+    valid, results = {}, {}
+    for index, payload in enumerate(invoices):
+        serializer = SyncInvoiceSerializer(data=payload)
+        client_id = payload.get('client_id') if isinstance(payload, dict) else None
+        if not serializer.is_valid():
+            results[index] = _result(client_id, 'error', errors=serializer.errors)
+        elif serializer.validated_data['client_id'] in valid:
+            results[index] = _result(client_id, 'error', errors={
+                'client_id': ['Client ID appears earlier in this batch.']
+            })
+        else:
+            valid[serializer.validated_data['client_id']] = (index, serializer.validated_data)
+    return valid, results
+
+
+def _existing(organization_id, client_ids):
+    return {
+        order.client_reference: order
+        for order in Order.objects.filter(
+            organization_id=organization_id, client_reference__in=client_ids
+        ).only('id', 'invoice_number', 'client_reference')
+    }
+
+
+def _allocate(organization_id, pending, numbers):
+    """Reserve invoice numbers for pending bills, one reservation per branch"""
+    by_branch = {}
+    for client_id, (_, data) in pending.items():
+        if client_id not in numbers:
+            by_branch.setdefault(data['branch_id'], []).append(client_id)
+    for branch_id, client_ids in by_branch.items():
+        allocated = allocator.allocate(organization_id, branch_id, count=len(client_ids))
+        numbers.update(zip(client_ids, allocated))
+
+
+def _store_each(user, pending, numbers, results, timer):
+    """Store bills one per savepoint; a bill that still conflicts is reported on its own"""
+    organization_id = user.organization_id
+    for client_id, (index, data) in pending.items():
+        try:
+            with transaction.atomic():
+                orders = create_invoices(user, [(data, numbers[client_id])], timer=timer)
+                record_changes(organization_id, [(None, snapshot(orders[0]))])
+        except IntegrityError:
+            order = _existing(organization_id, [client_id]).get(client_id)
+            if order is not None:
+                results[index] = _result(client_id, 'duplicate', order)
+            else:
+                results[index] = _result(client_id, 'error', errors={
+                    'non_field_errors': ['Invoice conflicts with data already stored.']
+                })
+            continue
+        results[index] = _result(client_id, 'created', orders[0])
+
+
+def sync_invoices(user, invoices, timer=None):
+    """
+    Store a batch of offline invoices. Returns (results, summary); results
+    follow the order of ``invoices``.
+    """
+    organization_id = user.organization_id
+    valid, results = _validate(invoices)
+    numbers = {}
+
+    conflicted = False
+    while valid:
+        existing = _existing(organization_id, list(valid))
+        for client_id, order in existing.items():
+            index, _ = valid.pop(client_id)
+            results[index] = _result(client_id, 'duplicate', order)
+        if not valid:
+            break
+        if conflicted and not existing:
+            # The conflict was not another upload of these bills: store them
+            # one at a time so only the bills at fault fail
+            _store_each(user, valid, numbers, results, timer)
+            break
+
+        # Numbers are reserved outside the transaction (see InvoiceViewSet.create)
+        # and reused if a concurrent upload forces a retry
+        _allocate(organization_id, valid, numbers)
+        entries = [(data, numbers[client_id]) for client_id, (_, data) in valid.items()]
+        try:
+            with transaction.atomic():
+                orders = create_invoices(user, entries, timer=timer)
+                record_changes(organization_id, [(None, snapshot(order)) for order in orders])
+        except IntegrityError:
+            # Another upload of some of the same bills won the race; the next
+            # pass reports those as duplicates and stores the rest
+            conflicted = True
+            continue
+        for (index, _), order in zip(valid.values(), orders):
+            results[index] = _result(order.client_reference, 'created', order)
+        break
+
+    ordered = [results[index] for index in sorted(results)]
+    summary = {'received': len(invoices)}
+    for name in ('created', 'duplicate', 'error'):
+        summary[name] = sum(1 for result in ordered if result['status'] == name)
+    return ordered, summary
@@ -0,0 +1,295 @@
+from datetime import date
+from unittest import mock
+
+from django.db import IntegrityError
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from products.models import Product, StockMovement
+from products.stock import current_stock
+from users.models import User
+from . import sync
+from .models import InvoiceSequence, Order
+from .sequences import InvoiceNumberAllocator, reserve_numbers
+from .serializers import CreateInvoiceSerializer, SyncInvoiceSerializer
+from .services import create_invoices
+
+LINE = {'product_name': 'Milk', 'quantity': '2', 'unit_price': '50.00'}
+
+
+class InvoiceAmountValidationTests(SimpleTestCase):
+
+    def errors(self, data, serializer_class=CreateInvoiceSerializer):
+        serializer = serializer_class(data=data)
+        self.assertFalse(serializer.is_valid())
+        return serializer.errors
+
+    def test_valid_amounts_pass_through_unchanged(self):
+        serializer = CreateInvoiceSerializer(data={
+            'items': [{**LINE, 'quantity': 1.5, 'discount_amount': '10.005'}],
+            'payments': [{'amount': 100}],
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data['items'][0]['quantity'], 1.5)
+
+    def test_malformed_line_amounts(self):
+        errors = self.errors({'items': [LINE, {**LINE, 'quantity': 'two', 'unit_price': 'NaN'}]})
+        self.assertEqual(set(errors['items'][1]), {'quantity', 'unit_price'})
+        self.assertNotIn(0, errors['items'])
+
+    def test_malformed_payment_amount(self):
+        errors = self.errors({'items': [LINE], 'payments': [{'amount': True}, {'amount': '1e999999999'}]})
+        self.assertEqual(set(errors['payments']), {0, 1})
+
+    def test_oversized_amount(self):
+        errors = self.errors({'items': [{**LINE, 'unit_price': '10000000000.00'}]})
+        self.assertIn('unit_price', errors['items'][0])
+
+    def test_sync_bills_are_checked_too(self):
+        errors = self.errors({'client_id': 'c1', 'items': [{**LINE, 'discount_amount': [1]}]}, SyncInvoiceSerializer)
+        self.assertIn('discount_amount', errors['items'][0])
+
+
+DAY = date(2026, 10, 17)
+
+
+class ReserveNumbersTests(TestCase):
+
+    def test_consecutive_reservations(self):
+        self.assertEqual(reserve_numbers('org1', '', DAY), (1, ''))
+        self.assertEqual(reserve_numbers('org1', '', DAY, count=5), (2, ''))
+        self.assertEqual(reserve_numbers('org1', '', DAY), (7, ''))
+
+    def test_day_and_branch_rollover(self):
+        reserve_numbers('org1', 'store-1', DAY, count=3)
+        self.assertEqual(reserve_numbers('org1', 'store-1', date(2026, 10, 18)), (1, 'STORE1'))
+        self.assertEqual(reserve_numbers('org1', 'store-2', DAY), (1, 'STORE2'))
+        self.assertEqual(reserve_numbers('org2', 'store-1', DAY), (1, 'STORE1'))
+        self.assertEqual(reserve_numbers('org1', 'store-1', DAY), (4, 'STORE1'))
+
+    def test_branches_shortening_to_one_tag_get_variants(self):
+        self.assertEqual(reserve_numbers('org1', 'store-001a', DAY), (1, 'STORE001'))
+        self.assertEqual(reserve_numbers('org1', 'store001A', DAY), (1, 'STORE0012'))
+        # Kept the next day too, even though the base tag would be free then
+        tomorrow = date(2026, 10, 18)
+        self.assertEqual(reserve_numbers('org1', 'store001A', tomorrow), (1, 'STORE0012'))
+
+    def test_retries_when_another_worker_creates_the_sequence(self):
+        # The other worker's row appears after our UPDATE found nothing: our
+        # INSERT hits the unique constraint and the UPDATE runs again
+        InvoiceSequence.objects.create(organization_id='org1', branch_id='', day=DAY, last_value=3)
+        update = QuerySet.update
+        calls = []
+
+        def update_missing_first(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update_missing_first):
+            self.assertEqual(reserve_numbers('org1', '', DAY, count=2), (4, ''))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(InvoiceSequence.objects.get().last_value, 5)
+
+    def test_integrity_error_for_another_scope_is_not_swallowed(self):
+        with mock.patch.object(InvoiceSequence.objects, 'create', side_effect=IntegrityError):
+            with self.assertRaises(RuntimeError):
+                reserve_numbers('org1', 'store-1', DAY)
+
+
+class InvoiceNumberAllocatorTests(TestCase):
+
+    def test_unit_blocks_hit_the_database_each_time(self):
+        allocator = InvoiceNumberAllocator(block_size=1)
+        self.assertEqual(allocator.allocate('org1', day=DAY, count=2), ['INV-20261017-0001', 'INV-20261017-0002'])
+        self.assertEqual(allocator.allocate('org1', day=DAY), ['INV-20261017-0003'])
+
+    def test_numbers_are_handed_out_from_reserved_blocks(self):
+        allocator = InvoiceNumberAllocator(block_size=5)
+        self.assertEqual(allocator.allocate('org1', 'store-1', DAY, count=2),
+                         ['INV-20261017-STORE1-0001', 'INV-20261017-STORE1-0002'])
+        self.assertEqual(InvoiceSequence.objects.get().last_value, 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(allocator.allocate('org1', 'store-1', DAY, count=3),
+                             [f'INV-20261017-STORE1-000{n}' for n in (3, 4, 5)])
+        # Exhausted: the next block follows on
+        self.assertEqual(allocator.allocate('org1', 'store-1', DAY), ['INV-20261017-STORE1-0006'])
+        self.assertEqual(InvoiceSequence.objects.get().last_value, 10)
+
+    def test_processes_get_disjoint_blocks(self):
+        first, second = InvoiceNumberAllocator(block_size=3), InvoiceNumberAllocator(block_size=3)
+        numbers = first.allocate('org1', day=DAY) + second.allocate('org1', day=DAY) + first.allocate('org1', day=DAY)
+        self.assertEqual(numbers, ['INV-20261017-0001', 'INV-20261017-0004', 'INV-20261017-0002'])
+
+    def test_blocks_of_previous_days_are_dropped(self):
+        allocator = InvoiceNumberAllocator(block_size=5)
+        allocator.allocate('org1', day=DAY)
+        self.assertEqual(allocator.allocate('org1', day=date(2026, 10, 18)), ['INV-20261018-0001'])
+        self.assertEqual(list(allocator._blocks), [('org1', '', date(2026, 10, 18))])
+
+
+class InvoiceBranchNumberingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='Pw123456!xx',
+                                             organization_id='org1', role='owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, branch_id):
+        response = self.client.post('/api/invoices/', {'branch_id': branch_id, 'items': [LINE]}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def test_branches_number_their_invoices_separately(self):
+        numbers = [self.create(branch)['invoice_number'] for branch in ('north', 'south', 'north', '')]
+        self.assertEqual([number.split('-', 2)[2] for number in numbers],
+                         ['NORTH-0001', 'SOUTH-0001', 'NORTH-0002', '0001'])
+        self.assertEqual(self.create('south')['branch_id'], 'south')
+
+
+class InvoiceStockReversalTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='Pw123456!xx',
+                                             organization_id='org1', role='owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(organization_id='org1', name='Milk', sku='MILK',
+                                              base_price='50.00', stock_quantity=10)
+
+    def create(self):
+        response = self.client.post('/api/invoices/', {
+            'items': [{**LINE, 'product_id': str(self.product.id), 'quantity': '3'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def stock(self):
+        return current_stock([self.product.id])[self.product.id]
+
+    def test_cancel_puts_stock_back_once(self):
+        invoice_id = self.create()
+        self.assertEqual(self.stock(), 7)
+        for _ in range(2):
+            response = self.client.post(f'/api/invoices/{invoice_id}/cancel/', format='json')
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(self.stock(), 10)
+        reversal = StockMovement.objects.get(kind='reversal')
+        self.assertEqual((str(reversal.order_id), reversal.quantity), (invoice_id, 3))
+
+    def test_invoices_that_moved_stock_are_not_deleted(self):
+        invoice_id = self.create()
+        response = self.client.delete(f'/api/invoices/{invoice_id}/')
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(StockMovement.objects.filter(order_id=invoice_id).count(), 1)
+        self.assertEqual(StockMovement.objects.filter(order=None).count(), 0)
+
+        response = self.client.post('/api/invoices/', {'items': [LINE]}, format='json')
+        response = self.client.delete(f"/api/invoices/{response.json()['id']}/")
+        self.assertEqual(response.status_code, 204, response.content)
+
+    def test_wholesale_invoices_record_sales(self):
+        response = self.client.post('/api/invoices/', {
+            'invoice_type': 'wholesale', 'items': [{**LINE, 'product_id': str(self.product.id)}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        movement = StockMovement.objects.get(order_id=response.json()['id'])
+        self.assertEqual((movement.kind, movement.quantity), ('sale', -2))
+
+
+@override_settings(INVOICE_STATS_SOURCE='counters')
+class OrderCountersTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='Pw123456!xx',
+                                             organization_id='org1', role='owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def stats(self):
+        response = self.client.get('/api/invoices/stats/')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_orders_created_directly_are_counted(self):
+        self.assertEqual(self.stats()['total_count'], 0)
+        response = self.client.post('/api/orders/create/', {
+            'invoice_number': 'ORD-1', 'subtotal': '10.00', 'total': '11.80', 'status': 'completed',
+            'paid_amount': '11.80',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        counted = self.stats()
+        with self.settings(INVOICE_STATS_SOURCE='live'):
+            self.assertEqual(self.stats(), counted)
+        self.assertEqual(counted['total_count'], 1)
+
+
+class InvoiceSyncTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='Pw123456!xx',
+                                             organization_id='org1', role='owner')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(organization_id='org1', name='Milk', sku='MILK',
+                                              base_price='50.00', stock_quantity=10)
+
+    def bill(self, client_id, **fields):
+        return {'client_id': client_id, 'items': [{**LINE, 'product_id': str(self.product.id)}], **fields}
+
+    def sync(self, invoices):
+        response = self.client.post('/api/invoices/sync/', {'invoices': invoices}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_invalid_bills_do_not_stop_the_batch(self):
+        body = self.sync([
+            self.bill('a'),
+            self.bill('b', payments=[{'amount': 'lots'}]),
+            self.bill('a'),
+            {'items': [LINE]},
+            self.bill('c'),
+        ])
+        self.assertEqual([result['status'] for result in body['results']],
+                         ['created', 'error', 'error', 'error', 'created'])
+        self.assertEqual({key: body[key] for key in ('received', 'created', 'duplicate', 'error')},
+                         {'received': 5, 'created': 2, 'duplicate': 0, 'error': 3})
+        self.assertIn('payments', body['results'][1]['errors'])
+        self.assertIn('client_id', body['results'][2]['errors'])
+        self.assertEqual(set(Order.objects.values_list('client_reference', flat=True)), {'a', 'c'})
+        self.assertEqual(current_stock([self.product.id])[self.product.id], 6)
+
+    def test_replayed_bills_are_reported_not_stored_again(self):
+        first = self.sync([self.bill('a'), self.bill('b')])
+        second = self.sync([self.bill('b'), self.bill('a'), self.bill('c')])
+        self.assertEqual([result['status'] for result in second['results']], ['duplicate', 'duplicate', 'created'])
+        self.assertEqual([result['id'] for result in second['results'][:2]],
+                         [result['id'] for result in reversed(first['results'])])
+        self.assertEqual(Order.objects.count(), 3)
+        self.assertEqual(StockMovement.objects.count(), 3)
+
+    def test_bills_are_stored_one_by_one_after_a_conflict(self):
+        calls = []
+
+        def conflicting_batch(user, entries, timer=None):
+            calls.append(len(entries))
+            if len(entries) > 1:
+                raise IntegrityError('conflict')
+            return create_invoices(user, entries, timer=timer)
+
+        with mock.patch.object(sync, 'create_invoices', conflicting_batch):
+            body = self.sync([self.bill('a'), self.bill('b')])
+        self.assertEqual(calls, [2, 1, 1])
+        self.assertEqual(body['created'], 2)
+        self.assertEqual(len({result['invoice_number'] for result in body['results']}), 2)
+
+    def test_numbers_come_from_reserved_blocks(self):
+        with mock.patch.object(sync, 'allocator', InvoiceNumberAllocator(block_size=10)):
+            first = self.sync([self.bill('a', branch_id='north'), self.bill('b', branch_id='north')])
+            second = self.sync([self.bill('c', branch_id='north'), self.bill('d')])
+        numbers = [result['invoice_number'] for result in first['results'] + second['results']]
+        self.assertEqual([number.split('-', 2)[2] for number in numbers],
+                         ['NORTH-0001', 'NORTH-0002', 'NORTH-0003', '0001'])
+        self.assertEqual(dict(InvoiceSequence.objects.values_list('branch_id', 'last_value')),
+                         {'north': 10, '': 10})
@@ -0,0 +1,30 @@
+"""
+Derived invoice data kept in step with writes.
+
+The invoice endpoints take a ``snapshot`` of an order before and after they
+change it and pass both to ``record_change`` inside the same transaction;
+every derived store (stats counters, sales rollups) applies the difference.
+"""
+from . import counters, rollups
+
+
+def snapshot(order):
+    if order is None:
+        return None
+    return {
+        'counters': counters.snapshot(order),
+        'rollups': rollups.snapshot(order),
+    }
+
+
+def record_change(organization_id, before, after):
+    record_changes(organization_id, [(before, after)])
+
+
+def record_changes(organization_id, changes):
+    """Apply many (before, after) snapshot pairs in one pass per store"""
+    for name, store in (('counters', counters), ('rollups', rollups)):
+        store.record_changes(organization_id, [
+            (before[name] if before else None, after[name] if after else None)
+            for before, after in changes
+        ])
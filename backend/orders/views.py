@@ -1,11 +1,13 @@
 import stripe
 import os
 from django.conf import settings
+from django.db import transaction
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from .models import Order
 from .serializers import OrderSerializer
+from .tracking import record_change, snapshot
 
 stripe.api_key = os.environ.get('STRIPE_SECRET_KEY')
 
@@ -15,17 +17,22 @@ class CreateOrderView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
-        serializer.save(
-            organization_id=self.request.user.organization_id,
-            created_by=self.request.user
-        )
+        # Orders count towards the invoice stats and rollups like any invoice
+        with transaction.atomic():
+            order = serializer.save(
+                organization_id=self.request.user.organization_id,
+                created_by=self.request.user
+            )
+            record_change(order.organization_id, None, snapshot(order))
 
 class OrderListView(generics.ListAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(organization_id=self.request.user.organization_id)
+        return Order.objects.filter(
+            organization_id=self.request.user.organization_id
+        ).prefetch_related('items').order_by('-created_at', '-id')
 
 class CreatePaymentIntentView(APIView):
     def post(self, request, *args, **kwargs):
@@ -1,5 +1,12 @@
 from django.contrib import admin
-from .models import Category, Product
+from django.db import transaction
+from . import catalog, pricing, tax
+from .models import Category, HsnTaxRate, Product
+
+
+def _invalidate_on_commit(organization_id, *modules):
+    for module in modules:
+        transaction.on_commit(lambda module=module: module.invalidate(organization_id))
 
 
 @admin.register(Category)
@@ -35,3 +42,45 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('created_at',)
         }),
     )
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        _invalidate_on_commit(obj.organization_id, catalog, pricing, tax)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        _invalidate_on_commit(obj.organization_id, catalog, pricing, tax)
+
+    def delete_queryset(self, request, queryset):
+        organization_ids = set(queryset.values_list('organization_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for organization_id in organization_ids:
+            _invalidate_on_commit(organization_id, catalog, pricing, tax)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Once created, stock only changes through the ledger (products.stock)
+        if obj is not None:
+            return self.readonly_fields + ('stock_quantity',)
+        return self.readonly_fields
+
+
+@admin.register(HsnTaxRate)
+class HsnTaxRateAdmin(admin.ModelAdmin):
+    list_display = ('hsn_code', 'rate', 'description', 'organization_id', 'updated_at')
+    list_filter = ('organization_id',)
+    search_fields = ('hsn_code', 'description', 'organization_id')
+    ordering = ('organization_id', 'hsn_code')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        _invalidate_on_commit(obj.organization_id, tax)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        _invalidate_on_commit(obj.organization_id, tax)
+
+    def delete_queryset(self, request, queryset):
+        organization_ids = set(queryset.values_list('organization_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for organization_id in organization_ids:
+            _invalidate_on_commit(organization_id, tax)
@@ -0,0 +1,14 @@
+from commerce_project.async_api import AsyncAPIView
+from .models import Product
+from .serializers import ProductSerializer
+
+
+class AsyncProductListView(AsyncAPIView):
+    """Product list with the same pages as ``GET /api/products/list/``, served natively under ASGI"""
+
+    async def get(self, request):
+        queryset = Product.objects.filter(
+            organization_id=request.user.organization_id
+        ).with_current_stock().order_by('-created_at', '-id')
+        body = await self.paginate(queryset, lambda rows: ProductSerializer(rows, many=True).data)
+        return self.render(body)
@@ -0,0 +1,226 @@
+"""
+Streaming catalog import and export.
+
+Imports read CSV or NDJSON a line at a time, validate and upsert in chunks of
+``IMPORT_CHUNK_SIZE`` rows keyed on ``sku``. Each chunk costs a fixed number
+of queries: one for existing SKUs, one for categories, one bulk INSERT and
+one bulk UPDATE, plus a read and an INSERT into the stock ledger when rows
+carry a new ``stock_quantity`` for existing products (taken as a count, see
+``products.stock.set_stock``). Each chunk commits on its own, so a bad row
+only fails itself. Blank CSV cells are treated as "not provided" and leave
+the stored value alone.
+
+Exports iterate the catalog with ``QuerySet.iterator`` (a server-side cursor
+on PostgreSQL) and yield one line at a time, so memory stays flat however
+large the catalog is.
+"""
+import csv
+import json
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from commerce_project.streaming import Echo
+
+from .models import Category, Product
+from .stock import set_stock
+
+IMPORT_CHUNK_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+FORMATS = ('csv', 'ndjson')
+
+IMPORT_FIELDS = (
+    'sku', 'name', 'description', 'category', 'barcode', 'hsn_code', 'unit',
+    'base_price', 'is_loose', 'wholesale_price', 'cost_price', 'tax_rate',
+    'stock_quantity', 'low_stock_threshold', 'is_active',
+)
+REQUIRED_ON_CREATE = ('name', 'base_price')
+EXPORT_FIELDS = ('id',) + IMPORT_FIELDS + ('created_at',)
+
+
+class ProductImportRowSerializer(serializers.ModelSerializer):
+    """Field validation for one import row; SKU uniqueness is checked per chunk"""
+    category = serializers.UUIDField(required=False, allow_null=True)
+    sku = serializers.CharField(max_length=100)
+
+    class Meta:
+        model = Product
+        fields = IMPORT_FIELDS
+        extra_kwargs = {field: {'required': False} for field in IMPORT_FIELDS if field != 'sku'}
+
+
+def _decode_lines(stream):
+    first = True
+    for raw in stream:
+        line = raw.decode('utf-8') if isinstance(raw, bytes) else raw
+        if first:
+            line = line.lstrip('\ufeff')
+            first = False
+        yield line
+
+
+def iter_rows(stream, file_format):
+    """Yield (row_number, dict) pairs from a CSV or NDJSON byte stream"""
+    lines = _decode_lines(stream)
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            # Blank cells mean "leave as is"
+            yield reader.line_num, {
+                key.strip(): value for key, value in row.items()
+                if key and value not in (None, '')
+            }
+        return
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ProductImporter:
+    """Upserts streamed rows into one organization's catalog"""
+
+    def __init__(self, organization_id, chunk_size=IMPORT_CHUNK_SIZE):
+        self.organization_id = organization_id
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self._seen_skus = set()
+
+    def run(self, stream, file_format):
+        for chunk in _chunks(iter_rows(stream, file_format), self.chunk_size):
+            self._import_chunk(chunk)
+        return self.report()
+
+    def report(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'failed': len(self.errors),
+            'errors': self.errors,
+        }
+
+    def _fail(self, row_number, sku, errors):
+        self.errors.append({'row': row_number, 'sku': sku, 'errors': errors})
+
+    def _import_chunk(self, chunk):
+        valid = []
+        for row_number, row in chunk:
+            if not isinstance(row, dict):
+                self._fail(row_number, None, {'non_field_errors': ['Row is not a JSON object.']})
+                continue
+            serializer = ProductImportRowSerializer(data=row)
+            if not serializer.is_valid():
+                self._fail(row_number, row.get('sku'), serializer.errors)
+                continue
+            data = serializer.validated_data
+            if data['sku'] in self._seen_skus:
+                self._fail(row_number, data['sku'], {'sku': ['SKU appears earlier in this file.']})
+                continue
+            self._seen_skus.add(data['sku'])
+            valid.append((row_number, data))
+        if not valid:
+            return
+
+        existing = {
+            product.sku: product
+            for product in Product.objects.filter(sku__in=[data['sku'] for _, data in valid])
+        }
+        category_ids = {data['category'] for _, data in valid if data.get('category')}
+        categories = set(
+            Category.objects.filter(
+                organization_id=self.organization_id, id__in=category_ids
+            ).values_list('id', flat=True)
+        ) if category_ids else set()
+
+        to_create, to_update, update_fields, counts = [], [], set(), {}
+        for row_number, data in valid:
+            has_category = 'category' in data
+            category_id = data.pop('category', None)
+            if category_id and category_id not in categories:
+                self._fail(row_number, data['sku'], {'category': ['Unknown category.']})
+                continue
+            if has_category:
+                data['category_id'] = category_id
+
+            product = existing.get(data['sku'])
+            if product is None:
+                missing = [field for field in REQUIRED_ON_CREATE if field not in data]
+                if missing:
+                    self._fail(row_number, data['sku'], {
+                        field: ['This field is required for new products.'] for field in missing
+                    })
+                    continue
+                to_create.append((row_number, Product(organization_id=self.organization_id, **data)))
+            elif product.organization_id != self.organization_id:
+                self._fail(row_number, data['sku'], {'sku': ['SKU is used by another organization.']})
+            else:
+                if 'stock_quantity' in data:
+                    counts[product.id] = data.pop('stock_quantity')
+                for field, value in data.items():
+                    setattr(product, field, value)
+                update_fields.update(
+                    'category' if field == 'category_id' else field
+                    for field in data if field != 'sku'
+                )
+                to_update.append((row_number, product))
+
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create([product for _, product in to_create])
+                if to_update and update_fields:
+                    Product.objects.bulk_update(
+                        [product for _, product in to_update], sorted(update_fields)
+                    )
+                if counts:
+                    set_stock(self.organization_id, counts, note='Import')
+        except IntegrityError:
+            # A concurrent import claimed one of these SKUs; fail the chunk rather than guess
+            for row_number, product in to_create + to_update:
+                self._fail(row_number, product.sku, {'sku': ['Conflicting write, please retry this row.']})
+            return
+        self.created += len(to_create)
+        self.updated += len(to_update)
+
+
+def _export_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (bool, int, Decimal, str)):
+        return value
+    return str(value)
+
+
+def export_lines(queryset, file_format):
+    """Yield the catalog line by line in CSV or NDJSON"""
+    columns = {'category': 'category_id', 'stock_quantity': 'current_stock'}
+    fields = [columns.get(field, field) for field in EXPORT_FIELDS]
+    rows = queryset.with_current_stock().order_by().values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if file_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow([_export_value(value) for value in row])
+        return
+    for row in rows:
+        record = {}
+        for field, value in zip(EXPORT_FIELDS, row):
+            record[field] = value if value is None or isinstance(value, (bool, int)) else str(value)
+        yield json.dumps(record) + '\n'
@@ -0,0 +1,116 @@
+"""
+Barcode/SKU resolution for the POS.
+
+Resolved products are kept in a per-process LRU keyed by (organization,
+code). Every organization has a catalog version in the shared cache
+(``core.versions``); an entry is only served while the version it was stored
+under is still current, so bumping the version (``invalidate``) drops that
+organization's entries in every process at once.
+
+Unknown codes are cached too, so repeated scans of an unregistered barcode
+do not reach the database until the catalog changes.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+
+from core import versions
+
+from .models import Product
+
+LOOKUP_FIELDS = (
+    'id', 'name', 'sku', 'barcode', 'hsn_code', 'unit', 'base_price',
+    'wholesale_price', 'tax_rate', 'is_loose', 'stock_quantity', 'is_active',
+)
+
+
+def _version_key(organization_id):
+    return f'catalog-version:{organization_id}'
+
+
+def catalog_version(organization_id):
+    return versions.current(_version_key(organization_id))
+
+
+def invalidate(organization_id):
+    """Bump the organization's catalog version; call after any product or stock write"""
+    versions.bump(_version_key(organization_id))
+
+
+def to_record(product):
+    """Plain, JSON-ready dict for a product (decimals as strings), with its current stock"""
+    record = {}
+    for field in LOOKUP_FIELDS:
+        value = getattr(product, field)
+        record[field] = value if value is None or isinstance(value, (bool, int)) else str(value)
+    record['stock_quantity'] = product.current_stock
+    return record
+
+
+class ProductLookupCache:
+    """Thread-safe LRU of product records with per-organization versioning"""
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_max_size(self):
+        if self.max_size is not None:
+            return self.max_size
+        return getattr(settings, 'PRODUCT_LOOKUP_CACHE_SIZE', 10000)
+
+    def resolve(self, organization_id, codes):
+        """
+        Map each code to a product record (``None`` when unknown). Barcodes
+        take precedence over SKUs. Cache misses are fetched in one query.
+        """
+        version = catalog_version(organization_id)
+        found = {}
+        missing = []
+        with self._lock:
+            for code in codes:
+                entry = self._entries.get((organization_id, code))
+                if entry is not None and entry[0] == version:
+                    self._entries.move_to_end((organization_id, code))
+                    found[code] = entry[1]
+                elif code not in missing:
+                    missing.append(code)
+
+        if missing:
+            fetched = dict.fromkeys(missing)
+            products = Product.objects.filter(organization_id=organization_id).filter(
+                Q(barcode__in=missing) | Q(sku__in=missing)
+            ).only(*LOOKUP_FIELDS).with_current_stock()
+            for product in products:
+                record = to_record(product)
+                if product.sku in fetched and fetched[product.sku] is None:
+                    fetched[product.sku] = record
+                if product.barcode in fetched:
+                    fetched[product.barcode] = record
+            found.update(fetched)
+            self._store(organization_id, version, fetched)
+
+        return {code: found[code] for code in codes}
+
+    def _store(self, organization_id, version, records):
+        max_size = self.get_max_size()
+        with self._lock:
+            for code, record in records.items():
+                self._entries[(organization_id, code)] = (version, record)
+                self._entries.move_to_end((organization_id, code))
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+lookup_cache = ProductLookupCache()
+
+
+def resolve_codes(organization_id, codes):
+    return lookup_cache.resolve(organization_id, codes)
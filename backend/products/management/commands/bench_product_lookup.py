@@ -0,0 +1,83 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+
+from products.catalog import lookup_cache, resolve_codes
+from products.models import Product
+
+User = get_user_model()
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Measure scan-to-line latency (p50/p99) of the barcode lookup endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20000, help='Catalog size to seed')
+        parser.add_argument('--scans', type=int, default=2000, help='Lookups per scenario')
+        parser.add_argument('--batch', type=int, default=50, help='Codes per batch request')
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        organization_id = f"bench-{uuid.uuid4()}"
+        user = User.objects.create_user(
+            email=f"{organization_id}@bench.local",
+            password=None,
+            organization_id=organization_id,
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            Product.objects.bulk_create([
+                Product(
+                    organization_id=organization_id,
+                    name=f"Bench product {n}",
+                    sku=f"{organization_id}-{n}",
+                    barcode=f"89{n:011d}",
+                    base_price='10.00',
+                )
+                for n in range(options['products'])
+            ], batch_size=2000)
+            barcodes = [f"89{rng.randrange(options['products']):011d}" for _ in range(options['scans'])]
+
+            lookup_cache.clear()
+            self._report('engine, cold', [self._time(resolve_codes, organization_id, [code]) for code in barcodes])
+            self._report('engine, warm', [self._time(resolve_codes, organization_id, [code]) for code in barcodes])
+
+            url = '/api/products/list/lookup/'
+            self._report('endpoint, single', [
+                self._time(client.get, url, {'code': code}, secure=True, HTTP_HOST='localhost') for code in barcodes
+            ])
+            batch = options['batch']
+            batches = [barcodes[i:i + batch] for i in range(0, len(barcodes), batch)]
+            self._report(f'endpoint, batch of {batch}', [
+                self._time(client.post, url, {'codes': codes}, format='json', secure=True, HTTP_HOST='localhost')
+                for codes in batches
+            ])
+        finally:
+            Product.objects.filter(organization_id=organization_id).delete()
+            user.delete()
+
+    def _time(self, func, *args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = (time.perf_counter() - started) * 1000
+        status_code = getattr(result, 'status_code', 200)
+        if status_code != 200:
+            raise CommandError(f"Lookup returned HTTP {status_code}")
+        return elapsed
+
+    def _report(self, label, samples):
+        self.stdout.write(
+            f"{label:>22}: p50={statistics.median(samples):.3f}ms "
+            f"p99={_percentile(samples, 99):.3f}ms n={len(samples)}"
+        )
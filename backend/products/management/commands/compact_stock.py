@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from products.stock import COMPACT_BATCH_SIZE, compact
+
+
+class Command(BaseCommand):
+    help = 'Fold pending stock movements into the product stock snapshots (run periodically, e.g. every minute from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', help='Only compact this organization_id')
+        parser.add_argument('--batch-size', type=int, default=COMPACT_BATCH_SIZE,
+                            help='Movements folded per transaction')
+
+    def handle(self, *args, **options):
+        folded = compact(options['organization'], batch_size=options['batch_size'])
+        self.stdout.write(f"Folded {folded} stock movements")
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['organization_id', 'barcode'], name='products_org_barcode_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['organization_id', 'sku'], name='products_org_sku_idx'),
+        ),
+    ]
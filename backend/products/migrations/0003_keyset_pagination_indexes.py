@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['organization_id', 'created_at', 'id'], name='products_org_created_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:32
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_invoice_renders'),
+        ('products', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('organization_id', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('sale', 'Sale'), ('return', 'Return'), ('adjustment', 'Adjustment'), ('transfer', 'Transfer')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('branch_id', models.CharField(blank=True, max_length=100)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('compaction', models.UUIDField(blank=True, editable=False, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='orders.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('compaction__isnull', True)), fields=['product', 'quantity'], name='products_stock_pending_idx'), models.Index(fields=['product', '-created_at'], name='products_stock_history_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:39
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HsnTaxRate',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('organization_id', models.CharField(max_length=100)),
+                ('hsn_code', models.CharField(max_length=20)),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('organization_id', 'hsn_code'), name='products_hsn_rate_org_code_uniq')],
+            },
+        ),
+    ]
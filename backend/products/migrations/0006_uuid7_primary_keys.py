@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:53
+
+import core.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_hsn_tax_rates'),
+    ]
+
+    # Only the key default the application fills in changes: no schema change, and
+    # existing rows keep their version 4 keys (see core.ids)
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='category',
+                name='id',
+                field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+            ),
+            migrations.AlterField(
+                model_name='hsntaxrate',
+                name='id',
+                field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+            ),
+            migrations.AlterField(
+                model_name='product',
+                name='id',
+                field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+            ),
+            migrations.AlterField(
+                model_name='stockmovement',
+                name='id',
+                field=models.UUIDField(default=core.ids.uuid7, editable=False, primary_key=True, serialize=False),
+            ),
+        ]),
+    ]
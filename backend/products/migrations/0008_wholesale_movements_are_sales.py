@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:10
+
+from django.db import migrations
+
+
+def relabel_wholesale_movements(apps, schema_editor):
+    # Wholesale invoices recorded their invoice type, which is not a movement kind
+    StockMovement = apps.get_model('products', 'StockMovement')
+    StockMovement.objects.filter(kind='wholesale').update(kind='sale')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_stock_movement_reversal'),
+    ]
+
+    operations = [
+        migrations.RunPython(relabel_wholesale_movements, migrations.RunPython.noop),
+    ]
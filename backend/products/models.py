@@ -1,9 +1,10 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.conf import settings
-import uuid
+from core.ids import uuid7
 
 class Category(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     organization_id = models.CharField(max_length=100)
     name = models.CharField(max_length=100)
     parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='subcategories')
@@ -12,8 +13,22 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+class ProductQuerySet(models.QuerySet):
+    def with_current_stock(self):
+        """
+        Annotate ``current_stock``: the ``stock_quantity`` snapshot plus the
+        stock movements not folded into it yet (see ``products.stock``)
+        """
+        pending = StockMovement.objects.filter(
+            product=models.OuterRef('pk'), compaction__isnull=True
+        ).order_by().values('product').annotate(total=models.Sum('quantity')).values('total')
+        return self.annotate(current_stock=models.F('stock_quantity') + Coalesce(
+            models.Subquery(pending, output_field=models.IntegerField()), 0
+        ))
+
+
 class Product(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     organization_id = models.CharField(max_length=100)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='products')
     name = models.CharField(max_length=255)
@@ -32,5 +47,78 @@ class Product(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['organization_id', 'barcode'], name='products_org_barcode_idx'),
+            models.Index(fields=['organization_id', 'sku'], name='products_org_sku_idx'),
+            models.Index(fields=['organization_id', 'created_at', 'id'], name='products_org_created_idx'),
+        ]
+
     def __str__(self):
         return self.name
+
+
+class StockMovement(models.Model):
+    """
+    One entry in the append-only stock ledger; ``quantity`` is the signed
+    change. Current stock is ``Product.stock_quantity`` (the snapshot) plus
+    the movements not yet folded into it, see ``products.stock``
+    """
+    KIND_CHOICES = [
+        ('sale', 'Sale'),
+        ('return', 'Return'),
+        ('adjustment', 'Adjustment'),
+        ('transfer', 'Transfer'),
+        # Undoes an invoice's movements when it is cancelled
+        ('reversal', 'Reversal'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    organization_id = models.CharField(max_length=100)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField()
+    branch_id = models.CharField(max_length=100, blank=True)
+    order = models.ForeignKey(
+        'orders.Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements'
+    )
+    note = models.CharField(max_length=255, blank=True)
+    # Set by the compaction that folded the movement into the snapshot
+    compaction = models.UUIDField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['product', 'quantity'], condition=models.Q(compaction__isnull=True),
+                name='products_stock_pending_idx',
+            ),
+            models.Index(fields=['product', '-created_at'], name='products_stock_history_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.quantity:+d} {self.product_id}"
+
+
+class HsnTaxRate(models.Model):
+    """
+    An organization's GST rate for an HSN code. Takes precedence over
+    ``Product.tax_rate`` for the organization's products with that code,
+    see ``products.tax``
+    """
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    organization_id = models.CharField(max_length=100)
+    hsn_code = models.CharField(max_length=20)
+    rate = models.DecimalField(max_digits=5, decimal_places=2)
+    description = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['organization_id', 'hsn_code'], name='products_hsn_rate_org_code_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.hsn_code}: {self.rate}%"
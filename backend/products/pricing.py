@@ -0,0 +1,175 @@
+"""
+Server-side price resolution for invoice lines.
+
+Clients send ``unit_price`` and ``product_name`` on every line; ``resolve``
+prices each catalog line from its product instead and reports the lines
+where what was sent differs. A line is priced from the invoice's price
+list: ``wholesale_price`` on wholesale invoices and for wholesale customers
+(when the product has one), ``base_price`` otherwise. Lines that do not
+reference a catalog product keep what the client sent.
+
+Prices are looked up by product id through a per-process LRU versioned per
+organization in the shared cache (``core.versions``), like the barcode
+lookups in ``products.catalog`` but under a version of its own: the catalog
+version moves with every sale's stock movements, this one only with product
+writes. Call ``invalidate`` after writing products. Misses are fetched in one
+query, so resolving a cart costs at most one query however many lines it has.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from core import versions
+from core.money import HALF_EVEN, InvalidAmount, Money, parse_minor
+from .models import Product
+from .tax import canonical_id
+
+RETAIL = 'retail'
+WHOLESALE = 'wholesale'
+TIER_CHOICES = [
+    (RETAIL, 'Retail'),
+    (WHOLESALE, 'Wholesale'),
+]
+
+PRICE_FIELDS = ('id', 'name', 'base_price', 'wholesale_price')
+
+
+def _version_key(organization_id):
+    return f'prices-version:{organization_id}'
+
+
+def prices_version(organization_id):
+    return versions.current(_version_key(organization_id))
+
+
+def invalidate(organization_id):
+    """Bump the organization's price version; call after product writes"""
+    versions.bump(_version_key(organization_id))
+
+
+def price_list(invoice_type='sale', customer_tier=''):
+    """The price list an invoice is charged from: ``WHOLESALE`` or ``RETAIL``"""
+    return WHOLESALE if WHOLESALE in (invoice_type, customer_tier) else RETAIL
+
+
+def price_entry(product):
+    """(name, base price, wholesale price or ``None``) of a product, prices in paise"""
+    wholesale = product.wholesale_price
+    return (
+        product.name,
+        parse_minor(product.base_price, rounding=HALF_EVEN),
+        None if wholesale is None else parse_minor(wholesale, rounding=HALF_EVEN),
+    )
+
+
+def product_prices(products):
+    """Price entries for ``Product`` rows already loaded, keyed by canonical id"""
+    return {str(product.id): price_entry(product) for product in products}
+
+
+class PriceCache:
+    """Thread-safe LRU of price entries by product id with per-organization versioning"""
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_max_size(self):
+        if self.max_size is not None:
+            return self.max_size
+        return getattr(settings, 'PRODUCT_PRICE_CACHE_SIZE', 50000)
+
+    def get(self, organization_id, product_ids):
+        """
+        Map each id (canonical form) to its price entry, ``None`` when the
+        organization has no such product. Misses are fetched in one query.
+        """
+        version = prices_version(organization_id)
+        found = {}
+        missing = []
+        with self._lock:
+            for product_id in product_ids:
+                entry = self._entries.get((organization_id, product_id))
+                if entry is not None and entry[0] == version:
+                    self._entries.move_to_end((organization_id, product_id))
+                    found[product_id] = entry[1]
+                elif product_id not in missing:
+                    missing.append(product_id)
+
+        if missing:
+            fetched = dict.fromkeys(missing)
+            fetched.update(product_prices(
+                Product.objects.filter(organization_id=organization_id, id__in=missing).only(*PRICE_FIELDS)
+            ))
+            found.update(fetched)
+            self._store(organization_id, version, fetched)
+
+        return found
+
+    def _store(self, organization_id, version, entries):
+        max_size = self.get_max_size()
+        with self._lock:
+            for product_id, entry in entries.items():
+                self._entries[(organization_id, product_id)] = (version, entry)
+                self._entries.move_to_end((organization_id, product_id))
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+price_cache = PriceCache()
+
+
+def catalog_prices(organization_id, items_data):
+    """Price entries for the products the lines reference, keyed by canonical id"""
+    ids = {canonical_id(item.get('product_id')) for item in items_data}
+    ids.discard(None)
+    if not ids:
+        return {}
+    return price_cache.get(organization_id, ids)
+
+
+def resolve(items_data, prices, tier=RETAIL):
+    """
+    Price the lines from ``prices`` (canonical id -> price entry). Returns
+    (lines, discrepancies): each catalog line with the catalog's
+    ``product_name`` and ``unit_price``, and one discrepancy per field a
+    line sent that differs from the catalog, or per ``product_id`` that is
+    not in it.
+    """
+    lines = []
+    discrepancies = []
+    for index, item in enumerate(items_data):
+        sent_id = item.get('product_id')
+        product_id = canonical_id(sent_id)
+        entry = prices.get(product_id) if product_id else None
+        if entry is None:
+            if sent_id not in (None, ''):
+                discrepancies.append(
+                    {'index': index, 'product_id': sent_id, 'field': 'product_id', 'sent': sent_id, 'expected': None}
+                )
+            lines.append(item)
+            continue
+
+        name, base_price, wholesale_price = entry
+        price = Money(wholesale_price if tier == WHOLESALE and wholesale_price is not None else base_price)
+        sent_price = item.get('unit_price')
+        if sent_price not in (None, ''):
+            try:
+                differs = parse_minor(sent_price) != price.minor
+            except InvalidAmount:
+                differs = True
+            if differs:
+                discrepancies.append({'index': index, 'product_id': product_id, 'field': 'unit_price',
+                                      'sent': sent_price, 'expected': str(price)})
+        sent_name = item.get('product_name')
+        if sent_name and sent_name != name:
+            discrepancies.append({'index': index, 'product_id': product_id, 'field': 'product_name',
+                                  'sent': sent_name, 'expected': name})
+        lines.append({**item, 'product_id': product_id, 'product_name': name, 'unit_price': price})
+    return lines, discrepancies
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Product, Category
+from .models import Product, Category, HsnTaxRate, StockMovement
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -7,8 +7,80 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('organization_id',)
 
+class HsnTaxRateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = HsnTaxRate
+        fields = ('id', 'hsn_code', 'rate', 'description', 'updated_at')
+        read_only_fields = ('updated_at',)
+        extra_kwargs = {'rate': {'min_value': 0, 'max_value': 100}}
+
+    def validate_hsn_code(self, value):
+        existing = HsnTaxRate.objects.filter(
+            organization_id=self.context['request'].user.organization_id, hsn_code=value
+        )
+        if self.instance is not None:
+            existing = existing.exclude(pk=self.instance.pk)
+        if existing.exists():
+            raise serializers.ValidationError('A rate for this HSN code already exists.')
+        return value
+
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = '__all__'
         read_only_fields = ('organization_id',)
+
+    def update(self, instance, validated_data):
+        # stock_quantity is the ledger snapshot, which only compaction writes;
+        # saving every field would put back a stale value over a concurrent one
+        validated_data.pop('stock_quantity', None)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # stock_quantity is only the ledger snapshot; report current stock when annotated
+        current_stock = getattr(instance, 'current_stock', None)
+        if current_stock is not None:
+            data['stock_quantity'] = current_stock
+        return data
+
+class LowStockProductSerializer(serializers.ModelSerializer):
+    stock_quantity = serializers.IntegerField(source='current_stock')
+
+    class Meta:
+        model = Product
+        fields = ('id', 'name', 'sku', 'unit', 'stock_quantity', 'low_stock_threshold')
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockMovement
+        fields = ('id', 'kind', 'quantity', 'branch_id', 'order', 'note', 'created_at')
+        read_only_fields = fields
+
+class StockChangeSerializer(serializers.Serializer):
+    """A manual stock change: a signed adjustment, or a move between branches (transfer)"""
+    kind = serializers.ChoiceField(choices=['adjustment', 'transfer'])
+    quantity = serializers.IntegerField()
+    branch_id = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    to_branch_id = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    note = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+
+    def validate(self, attrs):
+        if attrs['quantity'] == 0:
+            raise serializers.ValidationError({'quantity': ['Must not be zero.']})
+        if attrs['kind'] == 'transfer':
+            if attrs['quantity'] <= 0:
+                raise serializers.ValidationError({'quantity': ['Must be positive for a transfer.']})
+            if attrs.get('to_branch_id', '') == attrs['branch_id']:
+                raise serializers.ValidationError({'to_branch_id': ['Must differ from branch_id.']})
+        return attrs
+
+class ProductLookupSerializer(serializers.Serializer):
+    codes = serializers.ListField(
+        child=serializers.CharField(max_length=100, trim_whitespace=True),
+        allow_empty=False,
+        max_length=500
+    )
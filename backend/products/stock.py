@@ -0,0 +1,115 @@
+"""
+Stock ledger.
+
+Stock changes are appended to ``StockMovement`` as signed quantities
+(sales, returns, adjustments, transfers) instead of updating
+``Product.stock_quantity``. Checkouts of the same product therefore only
+insert rows and never wait on each other's row lock.
+
+``Product.stock_quantity`` is the snapshot: the stock as of the last
+compaction. Current stock is the snapshot plus the movements not folded
+into it yet (``Product.objects.with_current_stock()`` / ``current_stock``),
+read in one statement from a partial index that only holds those movements.
+
+``compact`` (``manage.py compact_stock``, run periodically) folds pending
+movements into the snapshot. It claims them by stamping a compaction id
+and adds up exactly the rows it stamped, so compactions running at the
+same time cannot fold a movement twice, and movements committed while one
+runs are left for the next. Movements are kept after folding, as history.
+
+Stock is counted per product across the organization; ``branch_id`` on a
+movement records where it happened. A transfer is a pair of movements
+between branches that cancels out in the product's stock.
+"""
+import uuid
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from .catalog import invalidate
+from .models import Product, StockMovement
+
+SNAPSHOT_UPDATE_BATCH_SIZE = 500
+COMPACT_BATCH_SIZE = 5000
+
+
+def current_stock(product_ids):
+    """``{product id: current stock}`` for the given products"""
+    return dict(
+        Product.objects.filter(id__in=product_ids).with_current_stock().values_list('id', 'current_stock')
+    )
+
+
+def record(organization_id, movements):
+    """Append unsaved ``StockMovement`` rows; the catalog is invalidated on commit"""
+    movements = [movement for movement in movements if movement.quantity]
+    if not movements:
+        return []
+    StockMovement.objects.bulk_create(movements)
+    transaction.on_commit(lambda: invalidate(organization_id))
+    return movements
+
+
+def set_stock(organization_id, counts, branch_id='', note=''):
+    """
+    Record adjustments that bring each product's current stock to the
+    counted quantity (``{product id: count}``), e.g. after a stock take
+    """
+    stock = current_stock(list(counts))
+    return record(organization_id, [
+        StockMovement(
+            organization_id=organization_id, product_id=product_id, kind='adjustment',
+            quantity=count - stock[product_id], branch_id=branch_id, note=note,
+        )
+        for product_id, count in counts.items() if product_id in stock
+    ])
+
+
+def transfer(organization_id, product_id, quantity, from_branch, to_branch, note='', order=None):
+    """Record ``quantity`` units moving between two branches"""
+    return record(organization_id, [
+        StockMovement(
+            organization_id=organization_id, product_id=product_id, kind='transfer',
+            quantity=-quantity, branch_id=from_branch, note=note, order=order,
+        ),
+        StockMovement(
+            organization_id=organization_id, product_id=product_id, kind='transfer',
+            quantity=quantity, branch_id=to_branch, note=note, order=order,
+        ),
+    ])
+
+
+def apply_to_snapshot(deltas, batch_size=SNAPSHOT_UPDATE_BATCH_SIZE):
+    """One ``UPDATE ... SET stock_quantity = stock_quantity + CASE ...`` per batch"""
+    product_ids = list(deltas)
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        Product.objects.filter(id__in=batch).update(
+            stock_quantity=F('stock_quantity') + Case(
+                *[When(id=product_id, then=Value(deltas[product_id])) for product_id in batch],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+
+
+def compact(organization_id=None, batch_size=COMPACT_BATCH_SIZE):
+    """Fold pending movements into ``Product.stock_quantity``; returns how many were folded"""
+    folded = 0
+    while True:
+        with transaction.atomic():
+            pending = StockMovement.objects.filter(compaction__isnull=True)
+            if organization_id:
+                pending = pending.filter(organization_id=organization_id)
+            ids = list(pending.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return folded
+            token = uuid.uuid4()
+            claimed = StockMovement.objects.filter(id__in=ids, compaction__isnull=True).update(compaction=token)
+            totals = StockMovement.objects.filter(compaction=token).values('product_id').annotate(
+                total=Sum('quantity')
+            ).values_list('product_id', 'total')
+            apply_to_snapshot({product_id: total for product_id, total in totals if total})
+        folded += claimed
+        if len(ids) < batch_size:
+            return folded
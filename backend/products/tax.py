@@ -0,0 +1,210 @@
+"""
+Tax engine: GST rates and invoice line pricing.
+
+A line's rate is, in order of precedence: the organization's
+``HsnTaxRate`` for the product's HSN code, the product's own
+``tax_rate``, the ``HsnTaxRate`` for an ``hsn_code`` sent on the line
+(lines for products not in the catalog), and ``DEFAULT_TAX_RATE``.
+
+Each organization's rates are compiled once into a ``RateTable``: the
+distinct rates in integer hundredths of a percent, and product id (in the
+canonical string form the API returns and clients send back) or HSN code
+-> index into them, so pricing a line is a dict lookup without parsing.
+Tables are kept in a per-process LRU, versioned per organization in the
+shared cache (``core.versions``) like the product lookup cache
+(``products.catalog``) but under a version of their own, so the stock
+changes that retire cached lookups do not recompile rates. Call
+``invalidate`` after writing products or ``HsnTaxRate`` rows.
+
+``price_lines`` prices an invoice in one pass, in integer paise and
+thousandths of a unit (``core.money``). Each line's taxable value and tax
+are rounded half up to the paisa; on an intra-state supply the tax is CGST
+and SGST at half the rate each, rounded separately, and on an inter-state
+supply it is all IGST.
+"""
+import threading
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.conf import settings
+
+from core import versions
+from core.money import Money, div_round, parse_minor
+from .models import HsnTaxRate, Product
+
+# Line quantities are counted in thousandths (OrderItem.quantity has 3 places)
+QUANTITY_PLACES = 3
+_QUANTITY_SCALE = 10 ** QUANTITY_PLACES
+# Rates are held in hundredths of a percent: tax = taxable * rate / 10000
+_RATE_SCALE = 10000
+_COMPILE_CHUNK_SIZE = 5000
+
+
+def _version_key(organization_id):
+    return f'tax-rates-version:{organization_id}'
+
+
+def rates_version(organization_id):
+    return versions.current(_version_key(organization_id))
+
+
+def invalidate(organization_id):
+    """Bump the organization's rate version; call after product or HSN rate writes"""
+    versions.bump(_version_key(organization_id))
+
+
+def canonical_id(value):
+    """A product id in canonical ``str(UUID)`` form, or ``None`` when it is not a UUID"""
+    if value is None or value == '':
+        return None
+    try:
+        return str(value if isinstance(value, uuid.UUID) else uuid.UUID(str(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateTable:
+    """
+    One organization's rates. ``rates`` holds (percent, hundredths of a
+    percent) per distinct rate; the maps hold indexes into it.
+    """
+    __slots__ = ('rates', 'by_product', 'by_hsn', 'default')
+
+    def __init__(self, rates, by_product, by_hsn, default):
+        self.rates = rates
+        self.by_product = by_product
+        self.by_hsn = by_hsn
+        self.default = default
+
+    @classmethod
+    def compile(cls, organization_id):
+        """Two queries: the organization's HSN rates and every product's code and rate"""
+        indexes = {}
+
+        def intern(percent):
+            index = indexes.get(percent)
+            if index is None:
+                index = indexes[percent] = len(indexes)
+            return index
+
+        default = intern(Decimal(settings.DEFAULT_TAX_RATE))
+        by_hsn = {
+            code: intern(rate)
+            for code, rate in HsnTaxRate.objects.filter(organization_id=organization_id).values_list('hsn_code', 'rate')
+        }
+        by_product = {}
+        products = Product.objects.filter(organization_id=organization_id).values_list('id', 'hsn_code', 'tax_rate')
+        for product_id, hsn_code, rate in products.iterator(chunk_size=_COMPILE_CHUNK_SIZE):
+            index = by_hsn.get(hsn_code) if hsn_code else None
+            by_product[str(product_id)] = intern(rate) if index is None else index
+        rates = tuple((percent.quantize(Decimal('0.01')), parse_minor(percent)) for percent in indexes)
+        return cls(rates, by_product, by_hsn, default)
+
+    def rate(self, product_id=None, hsn_code=''):
+        """The percentage for a product (canonical id), or for an HSN code when the product is unknown"""
+        index = self.by_product.get(product_id)
+        if index is None:
+            index = self.by_hsn.get(hsn_code, self.default)
+        return self.rates[index][0]
+
+
+class RateTableCache:
+    """Thread-safe LRU of compiled rate tables with per-organization versioning"""
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_max_size(self):
+        if self.max_size is not None:
+            return self.max_size
+        return getattr(settings, 'TAX_RATE_TABLE_CACHE_SIZE', 100)
+
+    def get(self, organization_id):
+        version = rates_version(organization_id)
+        with self._lock:
+            entry = self._entries.get(organization_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(organization_id)
+                return entry[1]
+
+        # Compiled under the version read above: a write meanwhile retires it on the next call
+        table = RateTable.compile(organization_id)
+        max_size = self.get_max_size()
+        with self._lock:
+            self._entries[organization_id] = (version, table)
+            self._entries.move_to_end(organization_id)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+        return table
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+rate_tables = RateTableCache()
+
+
+def rate_table(organization_id):
+    return rate_tables.get(organization_id)
+
+
+def price_lines(table, items_data, inter_state=False):
+    """
+    Price every line of an invoice in one pass. Returns (lines, totals):
+    each line is its item dict with ``product_id`` in canonical form
+    (``None`` if not a UUID), ``tax_rate`` (a percentage) and the amounts
+    as integers: ``quantity`` in thousandths, ``unit_price``,
+    ``discount_amount``, ``tax_amount`` and ``total`` in paise. ``totals``
+    has ``subtotal``, ``tax_amount``, ``cgst_amount``, ``sgst_amount``,
+    ``igst_amount`` and ``total`` as ``Money``.
+    """
+    rates, by_product, by_hsn, default = table.rates, table.by_product, table.by_hsn, table.default
+    subtotal = tax_total = half_total = 0
+    lines = []
+    for item in items_data:
+        product_id = item.get('product_id')
+        index = by_product.get(product_id) if type(product_id) is str else None
+        if index is None:
+            # Not a known id as sent: normalize it (uppercase, no dashes, ...) and look again
+            product_id = canonical_id(product_id)
+            index = by_product.get(product_id)
+            if index is None:
+                index = by_hsn.get(item.get('hsn_code') or '', default)
+        percent, rate = rates[index]
+
+        quantity = parse_minor(item.get('quantity', 1), QUANTITY_PLACES)
+        unit_price = parse_minor(item.get('unit_price', 0))
+        discount = parse_minor(item.get('discount_amount', 0))
+        taxable = div_round(quantity * unit_price, _QUANTITY_SCALE) - discount
+        if inter_state:
+            tax = div_round(taxable * rate, _RATE_SCALE)
+        else:
+            half_tax = div_round(taxable * rate, _RATE_SCALE * 2)
+            half_total += half_tax
+            tax = half_tax + half_tax
+
+        subtotal += taxable
+        tax_total += tax
+        lines.append({
+            **item,
+            'product_id': product_id,
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'discount_amount': discount,
+            'tax_rate': percent,
+            'tax_amount': tax,
+            'total': taxable + tax,
+        })
+
+    return lines, {
+        'subtotal': Money(subtotal),
+        'tax_amount': Money(tax_total),
+        'cgst_amount': Money(half_total),
+        'sgst_amount': Money(half_total),
+        'igst_amount': Money(tax_total if inter_state else 0),
+        'total': Money(subtotal + tax_total),
+    }
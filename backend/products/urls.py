@@ -1,11 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet, CategoryViewSet
+from .async_views import AsyncProductListView
+from .views import ProductViewSet, CategoryViewSet, HsnTaxRateViewSet
 
 router = DefaultRouter()
 router.register(r'list', ProductViewSet, basename='product')
 router.register(r'categories', CategoryViewSet, basename='category')
+router.register(r'hsn-rates', HsnTaxRateViewSet, basename='hsn-rate')
 
 urlpatterns = [
+    path('list/async/', AsyncProductListView.as_view(), name='product-list-async'),
     path('', include(router.urls)),
 ]
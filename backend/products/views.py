@@ -1,6 +1,20 @@
-from rest_framework import viewsets, permissions
-from .models import Product, Category
-from .serializers import ProductSerializer, CategorySerializer
+import os
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .bulk import FORMATS, ProductImporter, export_lines
+from . import pricing, stock, tax
+from .catalog import invalidate, resolve_codes
+from .models import Product, Category, HsnTaxRate, StockMovement
+from .serializers import (
+    ProductSerializer, CategorySerializer, HsnTaxRateSerializer, ProductLookupSerializer,
+    StockChangeSerializer, StockMovementSerializer
+)
+
+# Product fields the compiled tax rate tables depend on (products.tax)
+TAX_FIELDS = frozenset({'tax_rate', 'hsn_code'})
 
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.none()
@@ -13,13 +27,166 @@ class CategoryViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(organization_id=self.request.user.organization_id)
 
+class HsnTaxRateViewSet(viewsets.ModelViewSet):
+    """The organization's GST rate per HSN code; overrides the rate set on its products"""
+    queryset = HsnTaxRate.objects.none()
+    serializer_class = HsnTaxRateSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return HsnTaxRate.objects.filter(organization_id=self.request.user.organization_id).order_by('hsn_code')
+
+    def perform_create(self, serializer):
+        serializer.save(organization_id=self.request.user.organization_id)
+        self._invalidate_rates()
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self._invalidate_rates()
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        self._invalidate_rates()
+
+    def _invalidate_rates(self):
+        organization_id = self.request.user.organization_id
+        transaction.on_commit(lambda: tax.invalidate(organization_id))
+
 class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.none()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Product.objects.filter(organization_id=self.request.user.organization_id)
+        return Product.objects.filter(
+            organization_id=self.request.user.organization_id
+        ).with_current_stock().order_by('-created_at', '-id')
 
     def perform_create(self, serializer):
         serializer.save(organization_id=self.request.user.organization_id)
+        self._invalidate_catalog()
+
+    def perform_update(self, serializer):
+        # A new stock_quantity is a count: recorded as the adjustment that reaches it
+        count = serializer.validated_data.pop('stock_quantity', None)
+        rates_changed = not TAX_FIELDS.isdisjoint(serializer.validated_data)
+        if count is None:
+            serializer.save()
+        else:
+            with transaction.atomic():
+                product = serializer.save()
+                stock.set_stock(product.organization_id, {product.id: count}, note='Stock count')
+                product.current_stock = count
+        self._invalidate_catalog(rates=rates_changed)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        self._invalidate_catalog()
+
+    def _invalidate_catalog(self, rates=True):
+        organization_id = self.request.user.organization_id
+        transaction.on_commit(lambda: invalidate(organization_id))
+        transaction.on_commit(lambda: pricing.invalidate(organization_id))
+        if rates:
+            transaction.on_commit(lambda: tax.invalidate(organization_id))
+
+    @action(detail=True, methods=['get', 'post'])
+    def movements(self, request, pk=None):
+        """
+        GET: the product's stock ledger, newest first.
+        POST: record an adjustment (signed quantity) or a transfer between branches.
+        """
+        product = self.get_object()
+        if request.method == 'GET':
+            queryset = product.stock_movements.order_by('-created_at', '-id')
+            page = self.paginate_queryset(queryset)
+            return self.get_paginated_response(StockMovementSerializer(page, many=True).data)
+
+        serializer = StockChangeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        with transaction.atomic():
+            if data['kind'] == 'transfer':
+                movements = stock.transfer(
+                    product.organization_id, product.id, data['quantity'],
+                    data['branch_id'], data['to_branch_id'], note=data['note'],
+                )
+            else:
+                movements = stock.record(product.organization_id, [StockMovement(
+                    organization_id=product.organization_id, product=product, kind='adjustment',
+                    quantity=data['quantity'], branch_id=data['branch_id'], note=data['note'],
+                )])
+        return Response({
+            'movements': StockMovementSerializer(movements, many=True).data,
+            'stock_quantity': stock.current_stock([product.id])[product.id],
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get', 'post'])
+    def lookup(self, request):
+        """
+        Resolve scanned barcodes/SKUs.
+        GET ?code=... returns one product; POST {"codes": [...]} resolves a batch.
+        """
+        organization_id = request.user.organization_id
+        if request.method == 'GET':
+            code = request.query_params.get('code', '').strip()
+            if not code:
+                return Response({'code': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
+            record = resolve_codes(organization_id, [code])[code]
+            if record is None:
+                return Response({'detail': 'Product not found.'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(record)
+
+        serializer = ProductLookupSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        codes = list(dict.fromkeys(serializer.validated_data['codes']))
+        records = resolve_codes(organization_id, codes)
+        return Response({
+            'results': {code: record for code, record in records.items() if record is not None},
+            'missing': [code for code, record in records.items() if record is None],
+        })
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_products(self, request):
+        """
+        Bulk upsert keyed on SKU from CSV or NDJSON. Send the file as multipart
+        field "file", or as the raw request body with ?file_format=csv|ndjson.
+        """
+        if request.content_type.startswith('multipart/form-data'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'file': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
+            default_format = os.path.splitext(upload.name)[1].lstrip('.').lower()
+            stream = upload
+        else:
+            default_format = 'ndjson' if 'ndjson' in request.content_type else 'csv'
+            stream = request.stream or []
+        file_format = request.query_params.get('file_format', default_format)
+        if file_format not in FORMATS:
+            return Response(
+                {'file_format': [f"Must be one of: {', '.join(FORMATS)}."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        importer = ProductImporter(request.user.organization_id)
+        report = importer.run(stream, file_format)
+        if report['created'] or report['updated']:
+            invalidate(request.user.organization_id)
+            pricing.invalidate(request.user.organization_id)
+            tax.invalidate(request.user.organization_id)
+        return Response(report)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the whole catalog as CSV (default) or NDJSON (?file_format=ndjson)"""
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in FORMATS:
+            return Response(
+                {'file_format': [f"Must be one of: {', '.join(FORMATS)}."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        queryset = Product.objects.filter(organization_id=request.user.organization_id)
+        response = StreamingHttpResponse(export_lines(queryset, file_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="products.{file_format}"'
+        return response
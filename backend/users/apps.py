@@ -0,0 +1,31 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save, pre_save
+
+def _user_saving(sender, instance, update_fields=None, **kwargs):
+    from .authentication import new_auth_version
+    if update_fields is None:
+        # Saved with the row, so the change costs no extra query
+        instance.auth_version = new_auth_version()
+
+def _user_changed(sender, instance, update_fields=None, **kwargs):
+    from .authentication import CLAIM_FIELDS, forget, invalidate
+    if update_fields is None:
+        forget(instance.pk)
+    elif update_fields & set(CLAIM_FIELDS):
+        instance.auth_version = invalidate(instance.pk)
+    # Otherwise (e.g. last_login on sign-in) the tokens' claims still hold
+
+def _user_deleted(sender, instance, **kwargs):
+    from .authentication import forget
+    forget(instance.pk)
+
+class UsersConfig(AppConfig):
+    name = 'users'
+
+    def ready(self):
+        from .models import User
+
+        # Tokens carry user claims (users.authentication); retire them on any change
+        pre_save.connect(_user_saving, sender=User, dispatch_uid='auth-user-saving')
+        post_save.connect(_user_changed, sender=User, dispatch_uid='auth-user-save')
+        post_delete.connect(_user_deleted, sender=User, dispatch_uid='auth-user-delete')
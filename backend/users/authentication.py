@@ -0,0 +1,138 @@
+"""
+JWT authentication without a user query per request.
+
+Tokens from the login endpoint carry the fields the API reads off
+``request.user`` (tenant, branch, role and flags; see ``CLAIM_FIELDS``),
+plus the user's auth version at issue time. ``ClaimsJWTAuthentication``
+builds an unsaved ``User`` from those claims instead of loading the row.
+The object has the real primary key, so foreign keys and filters work as
+before. Views that need the full row, such as the profile endpoint, must
+load it themselves.
+
+The auth version is ``User.auth_version``. Any save of a user that may
+touch the claimed fields (profile update, deactivation, role change)
+replaces it with a fresh random value (not an increment, which a save of a
+stale instance could roll back onto an issued version), so tokens issued
+before no longer match and authentication falls back
+to a short-lived cache of user records, then to the database. The version
+is read from a copy in the shared cache; when that copy is missing
+(evicted, cache restarted) it is read from the row again, never assumed.
+Copies and records expire after ``AUTH_USER_CACHE_TTL`` seconds. Bulk
+``QuerySet.update`` calls bypass the signals and must call ``invalidate``
+themselves.
+"""
+import secrets
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+CLAIM = 'usr'
+VERSION_CLAIM = 'uav'
+CLAIM_FIELDS = (
+    'email', 'organization_id', 'branch_id', 'role', 'business_name',
+    'current_branch_id', 'distributor_id', 'is_active', 'is_staff', 'is_superuser',
+)
+
+
+def _version_key(user_id):
+    return f'auth-version:{user_id}'
+
+
+def _record_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def _ttl():
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 300)
+
+
+def auth_version(user_id):
+    """The user's auth version, ``None`` if there is no such user"""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = User.objects.filter(pk=user_id).values_list('auth_version', flat=True).first()
+        if version is not None:
+            cache.add(key, version, _ttl())
+    return version
+
+
+def new_auth_version():
+    return secrets.randbits(62) + 2
+
+
+def forget(user_id):
+    """Drop the cached copies of a user's auth version and record"""
+    keys = [_version_key(user_id), _record_key(user_id)]
+    cache.delete_many(keys)
+    # Again once committed, in case a request read the old row meanwhile
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate(user_id):
+    """Retire the claims in every token issued so far; returns the new version"""
+    version = new_auth_version()
+    User.objects.filter(pk=user_id).update(auth_version=version)
+    forget(user_id)
+    return version
+
+
+def to_claims(user):
+    """The ``CLAIM_FIELDS`` of ``user`` as JSON-ready values"""
+    claims = {}
+    for field in CLAIM_FIELDS:
+        value = getattr(user, field)
+        claims[field] = value if value is None or isinstance(value, (bool, str)) else str(value)
+    return claims
+
+
+def from_claims(user_id, claims):
+    """Unsaved ``User`` carrying the primary key and the claimed fields"""
+    user = User(id=user_id, **{field: claims.get(field) for field in CLAIM_FIELDS if field in claims})
+    user._state.adding = False
+    user._state.db = 'default'
+    return user
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Login serializer that embeds the user's claims in the tokens"""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token[CLAIM] = to_claims(user)
+        token[VERSION_CLAIM] = auth_version(user.pk)
+        return token
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWT authentication that trusts current token claims instead of querying the user"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            return super().get_user(validated_token)
+
+        claims = validated_token.get(CLAIM)
+        if claims is not None:
+            version = auth_version(user_id)
+            if version is not None and validated_token.get(VERSION_CLAIM) == version:
+                return from_claims(user_id, claims)
+
+        record = cache.get(_record_key(user_id))
+        if record is None:
+            user = super().get_user(validated_token)
+            cache.set(_record_key(user_id), to_claims(user), _ttl())
+            return user
+        if not record['is_active']:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return from_claims(user_id, record)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_current_branch_user_distributor_user_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='auth_version',
+            field=models.PositiveBigIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -63,6 +63,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     # Status
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
+    # Replaced on every change to the fields tokens carry (users.authentication)
+    auth_version = models.PositiveBigIntegerField(default=1, editable=False)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
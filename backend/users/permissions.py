@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from core.rbac import has_permission
+
 class IsOwner(permissions.BasePermission):
     """
     Custom permission to only allow Owners to perform the action.
@@ -13,3 +15,16 @@ class IsOwnerOrManager(permissions.BasePermission):
     """
     def has_permission(self, request, view):
         return bool(request.user and request.user.is_authenticated and request.user.role in ['owner', 'manager'])
+
+class HasPermission(permissions.BasePermission):
+    """
+    RBAC check against the user's compiled permission codes (see core.rbac).
+    The view names the code it needs in ``required_permission``, or per
+    action in ``required_permissions``; views that name none are allowed.
+    """
+    def has_permission(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return False
+        required = getattr(view, 'required_permissions', {}).get(getattr(view, 'action', None))
+        required = required or getattr(view, 'required_permission', None)
+        return required is None or has_permission(request.user, required)
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+from .authentication import (
+    ClaimsJWTAuthentication, ClaimsTokenObtainPairSerializer, _version_key, auth_version,
+)
+from .models import User
+
+
+class ClaimsJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='cashier@example.com', password='Pw123456!xx', organization_id='org1', role='cashier',
+        )
+        self.authentication = ClaimsJWTAuthentication()
+
+    def token(self):
+        access = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        return self.authentication.get_validated_token(str(access))
+
+    def authenticate(self, token):
+        with self.assertNumQueries(0):
+            return self.authentication.get_user(token)
+
+    def test_current_claims_need_no_query(self):
+        user = self.authenticate(self.token())
+        self.assertEqual((str(user.pk), user.role), (str(self.user.pk), 'cashier'))
+
+    def test_deactivation_rejects_issued_tokens(self):
+        token = self.token()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(token)
+
+    def test_partial_save_of_claims_rejects_issued_tokens(self):
+        token = self.token()
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(token)
+
+    def test_deactivation_survives_cache_restart(self):
+        token = self.token()
+        self.user.is_active = False
+        self.user.save()
+        cache.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(token)
+
+    def test_role_change_survives_version_eviction(self):
+        token = self.token()
+        self.user.role = 'auditor'
+        self.user.save()
+        cache.delete(_version_key(self.user.pk))
+        self.assertEqual(self.authentication.get_user(token).role, 'auditor')
+
+    def test_missing_version_is_read_from_the_row(self):
+        token = self.token()
+        cache.clear()
+        with self.assertNumQueries(1):
+            user = self.authentication.get_user(token)
+        self.assertEqual(user.role, 'cashier')
+        self.assertEqual(auth_version(self.user.pk), User.objects.get(pk=self.user.pk).auth_version)
+
+    def test_last_login_keeps_tokens_valid(self):
+        token = self.token()
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(self.authenticate(token).role, 'cashier')
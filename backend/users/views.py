@@ -4,12 +4,13 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import get_user_model
 from .serializers import UserSerializer, AddStaffSerializer
-from .permissions import IsOwnerOrManager
+from .permissions import HasPermission, IsOwnerOrManager
 
 User = get_user_model()
 
 class AddStaffView(generics.CreateAPIView):
-    permission_classes = (permissions.IsAuthenticated, IsOwnerOrManager)
+    permission_classes = (permissions.IsAuthenticated, IsOwnerOrManager | HasPermission)
+    required_permission = 'users.add_staff'
     serializer_class = AddStaffSerializer
 
     def create(self, request, *args, **kwargs):
@@ -26,11 +27,13 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
-        return self.request.user
+        # request.user is built from token claims; edits need the stored row
+        return User.objects.get(pk=self.request.user.pk)
 
 class StaffListView(generics.ListAPIView):
     serializer_class = UserSerializer
-    permission_classes = (permissions.IsAuthenticated, IsOwnerOrManager)
+    permission_classes = (permissions.IsAuthenticated, IsOwnerOrManager | HasPermission)
+    required_permission = 'users.view_staff'
     pagination_class = None
 
     def get_queryset(self):